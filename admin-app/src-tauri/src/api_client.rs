@@ -1184,6 +1184,8 @@ pub async fn get_operator_pours(
     timeout_only: bool,
     denied_only: bool,
     sale_mode: Option<&str>,
+    cursor: Option<&str>,
+    limit: Option<u32>,
 ) -> Result<Value, String> {
     let url = build_api_url("operator/pours");
     let mut query: Vec<(&str, String)> = Vec::new();
@@ -1240,6 +1242,14 @@ pub async fn get_operator_pours(
             query.push(("sale_mode", value.to_string()));
         }
     }
+    if let Some(value) = cursor {
+        if !value.trim().is_empty() {
+            query.push(("cursor", value.to_string()));
+        }
+    }
+    if let Some(value) = limit {
+        query.push(("limit", value.to_string()));
+    }
 
     let response = send(CLIENT.get(&url).query(&query).bearer_auth(token), &url).await?;
     if response.status().is_success() {
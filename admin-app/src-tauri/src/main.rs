@@ -454,6 +454,8 @@ async fn get_operator_pours(
     timeout_only: bool,
     denied_only: bool,
     sale_mode: Option<String>,
+    cursor: Option<String>,
+    limit: Option<u32>,
 ) -> Result<serde_json::Value, AppError> {
     api_client::get_operator_pours(
         &token,
@@ -470,6 +472,8 @@ async fn get_operator_pours(
         timeout_only,
         denied_only,
         sale_mode.as_deref(),
+        cursor.as_deref(),
+        limit,
     )
     .await
     .map_err(AppError::from)
@@ -24,6 +24,8 @@ function createOperatorPoursStore() {
     filters: null,
     header: null,
     items: [],
+    hasMore: false,
+    nextCursor: null,
     detail: null,
     loading: false,
     detailLoading: false,
@@ -37,13 +39,25 @@ function createOperatorPoursStore() {
   let journalInFlight = null;
   let detailInFlight = null;
 
-  function applyJournalResponse(response) {
+  let lastFilters = {};
+
+  // Сервер считает шапку по своей странице; при догрузке счётчики складываются по загруженным строкам.
+  function mergeHeaders(loaded, page) {
+    if (!loaded || !page) return page || loaded || null;
+    return Object.fromEntries(
+      Object.entries(page).map(([key, value]) => [key, (Number(loaded[key]) || 0) + (Number(value) || 0)]),
+    );
+  }
+
+  function applyJournalResponse(response, { append = false } = {}) {
     update((state) => ({
       ...state,
       generatedAt: response?.generated_at || null,
       filters: response?.applied_filters || null,
-      header: response?.header || null,
-      items: response?.items || [],
+      header: append ? mergeHeaders(state.header, response?.header) : response?.header || null,
+      items: append ? [...state.items, ...(response?.items || [])] : response?.items || [],
+      hasMore: Boolean(response?.has_more),
+      nextCursor: response?.next_cursor || null,
       loading: false,
       lastFetchedAt: Date.now(),
       error: null,
@@ -67,6 +81,9 @@ function createOperatorPoursStore() {
       return journalInFlight;
     }
 
+    if (!filters.cursor) {
+      lastFilters = { ...filters };
+    }
     update((current) => ({ ...current, loading: true, error: null }));
     try {
       journalInFlight = invoke('get_operator_pours', {
@@ -84,9 +101,11 @@ function createOperatorPoursStore() {
         timeoutOnly: Boolean(filters.timeoutOnly),
         deniedOnly: Boolean(filters.deniedOnly),
         saleMode: filters.saleMode || 'all',
+        cursor: filters.cursor || null,
+        limit: filters.limit ? Number(filters.limit) : null,
       });
       const response = await journalInFlight;
-      applyJournalResponse(response);
+      applyJournalResponse(response, { append: Boolean(filters.cursor) });
       return response;
     } catch (error) {
       const message = toErrorMessage('operatorPoursStore.fetchJournal', error);
@@ -97,6 +116,15 @@ function createOperatorPoursStore() {
     }
   }
 
+  async function fetchNextPage() {
+    const state = get(store);
+    if (!state.hasMore || !state.nextCursor || journalInFlight) {
+      return null;
+    }
+    // Следующая страница обязана идти с теми же фильтрами, что и первая, иначе курсор теряет смысл.
+    return fetchJournal({ ...lastFilters, cursor: state.nextCursor }, { force: true });
+  }
+
   async function fetchDetail(pourRef) {
     const token = ensureToken();
     if (detailInFlight && get(store).detail?.summary?.pour_ref === pourRef) {
@@ -121,9 +149,13 @@ function createOperatorPoursStore() {
   return {
     subscribe,
     fetchJournal,
+    fetchNextPage,
     fetchDetail,
     clearDetail: () => update((state) => ({ ...state, detail: null })),
-    reset: () => set(initialState),
+    reset: () => {
+      lastFilters = {};
+      set(initialState);
+    },
   };
 }
 
@@ -0,0 +1,56 @@
+"""operator search trigram indexes
+
+Revision ID: 0017_operator_search_trgm
+Revises: 0016_guest_visit_card_cons
+Create Date: 2026-10-19 00:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0017_operator_search_trgm"
+down_revision: Union[str, Sequence[str], None] = "0016_guest_visit_card_cons"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Expressions must match the ones built by crud.operator_crud._search_like,
+# otherwise the planner will not pick the indexes for infix LIKE lookups.
+SEARCH_INDEXES = (
+    ("ix_guests_last_name_trgm", "guests", "lower(last_name)"),
+    ("ix_guests_first_name_trgm", "guests", "lower(first_name)"),
+    ("ix_guests_patronymic_trgm", "guests", "lower(patronymic)"),
+    ("ix_guests_phone_number_trgm", "guests", "lower(phone_number)"),
+    ("ix_visits_card_uid_trgm", "visits", "lower(card_uid)"),
+    ("ix_visits_visit_id_trgm", "visits", "lower(CAST(visit_id AS VARCHAR))"),
+    ("ix_cards_card_uid_trgm", "cards", "lower(card_uid)"),
+    ("ix_pours_card_uid_trgm", "pours", "lower(card_uid)"),
+    ("ix_pours_short_id_trgm", "pours", "lower(short_id)"),
+    ("ix_pours_visit_id_trgm", "pours", "lower(CAST(visit_id AS VARCHAR))"),
+)
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def upgrade() -> None:
+    # SQLite has no trigram support; operator search keeps its LIKE scan there.
+    if not _is_postgresql():
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for index_name, table_name, expression in SEARCH_INDEXES:
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} USING gin (({expression}) gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    if not _is_postgresql():
+        return
+
+    for index_name, _table_name, _expression in reversed(SEARCH_INDEXES):
+        op.execute(f"DROP INDEX IF EXISTS {index_name}")
@@ -0,0 +1,65 @@
+"""pour hourly rollups
+
+Revision ID: 0018_pour_hourly_rollups
+Revises: 0017_operator_search_trgm
+Create Date: 2026-10-19 00:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0018_pour_hourly_rollups"
+down_revision: Union[str, Sequence[str], None] = "0017_operator_search_trgm"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _bucket_expression(dialect_name: str) -> str:
+    if dialect_name == "postgresql":
+        return "date_trunc('hour', poured_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'"
+    return "strftime('%Y-%m-%d %H:00:00.000000', poured_at)"
+
+
+def upgrade() -> None:
+    op.create_table(
+        "pour_hourly_rollups",
+        sa.Column("bucket_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("tap_id", sa.Integer(), nullable=False),
+        sa.Column("pours_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("volume_ml", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("amount_total", sa.Numeric(12, 2), nullable=False, server_default="0"),
+        sa.Column("pending_sync_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("reconciled_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("final_volume_ml", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("final_amount_total", sa.Numeric(12, 2), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("bucket_start", "tap_id"),
+    )
+
+    bucket = _bucket_expression(op.get_bind().dialect.name)
+    op.execute(
+        f"""
+        INSERT INTO pour_hourly_rollups (
+            bucket_start, tap_id, pours_count, volume_ml, amount_total,
+            pending_sync_count, reconciled_count, final_volume_ml, final_amount_total
+        )
+        SELECT
+            {bucket},
+            tap_id,
+            COUNT(pour_id),
+            COALESCE(SUM(volume_ml), 0),
+            COALESCE(SUM(amount_charged), 0),
+            COALESCE(SUM(CASE WHEN sync_status = 'pending_sync' THEN 1 ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN sync_status = 'reconciled' THEN 1 ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN sync_status IN ('synced', 'reconciled') THEN volume_ml ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN sync_status IN ('synced', 'reconciled') THEN amount_charged ELSE 0 END), 0)
+        FROM pours
+        GROUP BY {bucket}, tap_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("pour_hourly_rollups")
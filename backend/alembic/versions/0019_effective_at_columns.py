@@ -0,0 +1,62 @@
+"""persisted effective_at on pours and non-sale flows
+
+Revision ID: 0019_effective_at_columns
+Revises: 0018_pour_hourly_rollups
+Create Date: 2026-10-19 00:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0019_effective_at_columns"
+down_revision: Union[str, Sequence[str], None] = "0018_pour_hourly_rollups"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "pours",
+        sa.Column(
+            "effective_at",
+            sa.DateTime(timezone=True),
+            sa.Computed("coalesce(synced_at, reconciled_at, authorized_at, poured_at, created_at)", persisted=True),
+            nullable=True,
+        ),
+    )
+    op.create_index("ix_pours_effective_at", "pours", ["effective_at"], unique=False)
+    op.create_index("ix_pours_sync_status_effective_at", "pours", ["sync_status", "effective_at"], unique=False)
+    op.create_index("ix_pours_tap_id_effective_at", "pours", ["tap_id", "effective_at"], unique=False)
+    op.create_index("ix_pours_tap_id_poured_at", "pours", ["tap_id", "poured_at"], unique=False)
+
+    op.add_column(
+        "non_sale_flows",
+        sa.Column(
+            "effective_at",
+            sa.DateTime(timezone=True),
+            sa.Computed("coalesce(finalized_at, last_seen_at, created_at)", persisted=True),
+            nullable=True,
+        ),
+    )
+    op.create_index("ix_non_sale_flows_effective_at", "non_sale_flows", ["effective_at"], unique=False)
+    op.create_index(
+        "ix_non_sale_flows_tap_id_effective_at",
+        "non_sale_flows",
+        ["tap_id", "effective_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_non_sale_flows_tap_id_effective_at", table_name="non_sale_flows")
+    op.drop_index("ix_non_sale_flows_effective_at", table_name="non_sale_flows")
+    op.drop_column("non_sale_flows", "effective_at")
+
+    op.drop_index("ix_pours_tap_id_poured_at", table_name="pours")
+    op.drop_index("ix_pours_tap_id_effective_at", table_name="pours")
+    op.drop_index("ix_pours_sync_status_effective_at", table_name="pours")
+    op.drop_index("ix_pours_effective_at", table_name="pours")
+    op.drop_column("pours", "effective_at")
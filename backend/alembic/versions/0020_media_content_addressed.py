@@ -0,0 +1,29 @@
+"""content-addressed media storage keys
+
+Revision ID: 0020_media_content_addressed
+Revises: 0019_effective_at_columns
+Create Date: 2026-10-19 00:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0020_media_content_addressed"
+down_revision: Union[str, Sequence[str], None] = "0019_effective_at_columns"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # New uploads are stored as <sha256><ext>; several asset rows may share one file.
+    op.drop_constraint("media_assets_storage_key_key", "media_assets", type_="unique")
+    op.create_index("ix_media_assets_storage_key", "media_assets", ["storage_key"], unique=False)
+
+
+def downgrade() -> None:
+    # Fails while deduplicated rows still share a storage key.
+    op.drop_index("ix_media_assets_storage_key", table_name="media_assets")
+    op.create_unique_constraint("media_assets_storage_key_key", "media_assets", ["storage_key"])
@@ -0,0 +1,93 @@
+"""canonical lowercase card uids
+
+Revision ID: 0021_card_uid_canonical
+Revises: 0020_media_content_addressed
+Create Date: 2026-10-19 00:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0021_card_uid_canonical"
+down_revision: Union[str, Sequence[str], None] = "0020_media_content_addressed"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+CANONICAL_CARD_UID_SQL = "card_uid = lower(trim(card_uid))"
+# cards первой: visits и pours ссылаются на cards.card_uid.
+CARD_UID_TABLES = ("cards", "visits", "pours", "lost_cards", "non_sale_flows")
+
+
+def _assert_no_case_duplicates(bind, table_name: str) -> None:
+    duplicates = bind.execute(
+        sa.text(
+            f"""
+            SELECT lower(trim(card_uid)) AS normalized_uid, count(*) AS row_count
+            FROM {table_name}
+            WHERE card_uid IS NOT NULL
+            GROUP BY lower(trim(card_uid))
+            HAVING count(*) > 1
+            """
+        )
+    ).fetchall()
+    if duplicates:
+        normalized_values = ", ".join(str(row[0]) for row in duplicates[:10])
+        raise RuntimeError(
+            f"Migration blocked: {table_name}.card_uid contains case-only duplicates. "
+            f"Resolve duplicates before applying 0021. Examples: {normalized_values}"
+        )
+
+
+def _card_foreign_keys(bind) -> list[tuple[str, dict]]:
+    inspector = sa.inspect(bind)
+    return [
+        (table_name, foreign_key)
+        for table_name in CARD_UID_TABLES
+        for foreign_key in inspector.get_foreign_keys(table_name)
+        if foreign_key["referred_table"] == "cards"
+    ]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    _assert_no_case_duplicates(bind, "cards")
+    _assert_no_case_duplicates(bind, "lost_cards")
+
+    # Ссылки на cards.card_uid переписываются вместе с ключом, поэтому FK снимаем на время backfill.
+    foreign_keys = _card_foreign_keys(bind)
+    for table_name, foreign_key in foreign_keys:
+        op.drop_constraint(foreign_key["name"], table_name, type_="foreignkey")
+
+    for table_name in CARD_UID_TABLES:
+        op.execute(
+            sa.text(
+                f"""
+                UPDATE {table_name}
+                SET card_uid = lower(trim(card_uid))
+                WHERE card_uid <> lower(trim(card_uid))
+                """
+            )
+        )
+
+    for table_name, foreign_key in foreign_keys:
+        op.create_foreign_key(
+            foreign_key["name"],
+            table_name,
+            "cards",
+            foreign_key["constrained_columns"],
+            foreign_key["referred_columns"],
+        )
+
+    # Существующие B-tree индексы по card_uid (и uq_visits_one_active_per_card для активного визита)
+    # теперь работают для поиска карты напрямую; CHECK не даёт записать UID в другом регистре.
+    for table_name in CARD_UID_TABLES:
+        op.create_check_constraint(f"ck_{table_name}_card_uid_canonical", table_name, CANONICAL_CARD_UID_SQL)
+
+
+def downgrade() -> None:
+    for table_name in reversed(CARD_UID_TABLES):
+        op.drop_constraint(f"ck_{table_name}_card_uid_canonical", table_name, type_="check")
@@ -0,0 +1,75 @@
+"""guest balance ledger and snapshots
+
+Revision ID: 0022_guest_balance_ledger
+Revises: 0021_card_uid_canonical
+Create Date: 2026-10-19 00:00:00
+"""
+
+import uuid
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0022_guest_balance_ledger"
+down_revision: Union[str, Sequence[str], None] = "0021_card_uid_canonical"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    ledger = op.create_table(
+        "guest_balance_ledger",
+        sa.Column("entry_id", sa.UUID(), nullable=False),
+        sa.Column("guest_id", sa.UUID(), nullable=False),
+        sa.Column("sequence", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=20), nullable=False),
+        sa.Column("amount", sa.Numeric(10, 2), nullable=False),
+        sa.Column("contra_account", sa.String(length=40), nullable=False),
+        sa.Column("source_type", sa.String(length=20), nullable=True),
+        sa.Column("source_id", sa.String(length=64), nullable=True),
+        sa.Column("occurred_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.ForeignKeyConstraint(["guest_id"], ["guests.guest_id"]),
+        sa.PrimaryKeyConstraint("entry_id"),
+    )
+    op.create_index(
+        "uq_guest_balance_ledger_guest_sequence", "guest_balance_ledger", ["guest_id", "sequence"], unique=True
+    )
+    op.create_index("ix_guest_balance_ledger_occurred_at", "guest_balance_ledger", ["occurred_at"])
+    op.create_table(
+        "guest_balance_snapshots",
+        sa.Column("guest_id", sa.UUID(), nullable=False),
+        sa.Column("sequence", sa.Integer(), nullable=False),
+        sa.Column("balance", sa.Numeric(12, 2), nullable=False),
+        sa.Column("occurred_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.ForeignKeyConstraint(["guest_id"], ["guests.guest_id"]),
+        sa.PrimaryKeyConstraint("guest_id", "sequence"),
+    )
+
+    # Текущий баланс переносится входящим остатком: история до журнала уже не восстанавливается.
+    guests = op.get_bind().execute(sa.text("SELECT guest_id, balance FROM guests WHERE balance <> 0")).fetchall()
+    if guests:
+        op.bulk_insert(
+            ledger,
+            [
+                {
+                    "entry_id": uuid.uuid4(),
+                    "guest_id": guest_id,
+                    "sequence": 1,
+                    "kind": "opening",
+                    "amount": balance,
+                    "contra_account": "opening_balance",
+                    "source_type": None,
+                    "source_id": None,
+                }
+                for guest_id, balance in guests
+            ],
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("guest_balance_snapshots")
+    op.drop_index("ix_guest_balance_ledger_occurred_at", table_name="guest_balance_ledger")
+    op.drop_index("uq_guest_balance_ledger_guest_sequence", table_name="guest_balance_ledger")
+    op.drop_table("guest_balance_ledger")
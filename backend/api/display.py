@@ -1,6 +1,10 @@
+import time
 import uuid
+from datetime import timedelta
+from typing import Annotated
 
-from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, Response, UploadFile, status
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 
@@ -10,9 +14,10 @@ from crud import display_crud
 from database import get_db
 from media_storage import (
     InvalidMediaAssetError,
-    delete_storage_path,
+    generate_variants,
     normalize_media_kind,
     resolve_storage_path,
+    resolve_variant,
     save_upload,
     storage_path_exists,
 )
@@ -23,31 +28,93 @@ router = APIRouter(
 )
 
 
-@router.get(
-    "/display/taps/{tap_id}/snapshot",
-    response_model=schemas.DisplayTapSnapshot,
-    dependencies=[Depends(security.get_display_reader)],
-)
-def get_display_tap_snapshot(tap_id: int, request: Request, db: Session = Depends(get_db)):
-    snapshot = display_crud.build_display_snapshot(
+def _load_display_snapshot(db: Session, *, tap_id: int, request: Request) -> display_crud.CachedDisplaySnapshot:
+    return display_crud.get_display_snapshot(
         db,
         tap_id=tap_id,
+        cache_scope=str(request.base_url),
         content_url_builder=lambda asset_id: str(request.url_for("get_media_asset_content", asset_id=asset_id)),
     )
-    etag = f'"{snapshot.content_version}"'
+
+
+def _snapshot_response(request: Request, cached: display_crud.CachedDisplaySnapshot) -> Response:
+    etag = f'"{cached.snapshot.content_version}"'
     if display_crud.is_not_modified(
         request.headers.get("if-none-match"),
-        current_content_version=snapshot.content_version,
+        current_content_version=cached.snapshot.content_version,
     ):
         return Response(status_code=304, headers={"ETag": etag})
 
     return Response(
-        content=snapshot.model_dump_json(by_alias=True),
+        content=cached.body,
         media_type="application/json",
         headers={"ETag": etag},
     )
 
 
+@router.get(
+    "/display/taps/{tap_id}/snapshot",
+    response_model=schemas.DisplayTapSnapshot,
+    dependencies=[Depends(security.get_display_reader)],
+)
+def get_display_tap_snapshot(tap_id: int, request: Request, db: Session = Depends(get_db)):
+    return _snapshot_response(request, _load_display_snapshot(db, tap_id=tap_id, request=request))
+
+
+def _load_display_snapshot_and_release(db: Session, *, tap_id: int, request: Request) -> display_crud.CachedDisplaySnapshot:
+    try:
+        return _load_display_snapshot(db, tap_id=tap_id, request=request)
+    finally:
+        # A long-poll must not keep a pooled connection checked out while it waits.
+        db.close()
+
+
+@router.get(
+    "/display/taps/{tap_id}/snapshot/changes",
+    response_model=schemas.DisplayTapSnapshot,
+    dependencies=[Depends(security.get_display_reader)],
+)
+async def wait_display_tap_snapshot(
+    tap_id: int,
+    request: Request,
+    timeout_seconds: float = Query(default=25, ge=0, le=60),
+    db: Session = Depends(get_db),
+):
+    """Long-poll: answer as soon as the snapshot no longer matches If-None-Match, or 304 on timeout."""
+    deadline = time.monotonic() + timeout_seconds
+    while True:
+        # Subscribe before reading so a commit between the read and the wait is not missed.
+        waiter = display_crud.DISPLAY_SNAPSHOT_CACHE.subscribe(tap_id)
+        try:
+            cached = await run_in_threadpool(_load_display_snapshot_and_release, db, tap_id=tap_id, request=request)
+            response = _snapshot_response(request, cached)
+            if response.status_code != 304:
+                return response
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not await waiter.wait(remaining):
+                return response
+        finally:
+            display_crud.DISPLAY_SNAPSHOT_CACHE.unsubscribe(waiter)
+
+
+@router.post(
+    "/display/snapshots",
+    response_model=schemas.DisplaySnapshotBatchResponse,
+    dependencies=[Depends(security.get_display_reader)],
+)
+def get_display_snapshot_batch(
+    payload: schemas.DisplaySnapshotBatchRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    return display_crud.build_display_snapshot_batch(
+        db,
+        payload=payload,
+        cache_scope=str(request.base_url),
+        content_url_builder=lambda asset_id: str(request.url_for("get_media_asset_content", asset_id=asset_id)),
+    )
+
+
 @router.post(
     "/media-assets",
     response_model=schemas.MediaAssetCreateResponse,
@@ -56,6 +123,7 @@ def get_display_tap_snapshot(tap_id: int, request: Request, db: Session = Depend
 )
 def upload_media_asset(
     request: Request,
+    background_tasks: BackgroundTasks,
     kind: str = Form(...),
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
@@ -66,7 +134,6 @@ def upload_media_asset(
             file.file,
             filename=file.filename or f"{asset_id}",
             content_type=file.content_type,
-            asset_id=asset_id,
             kind=kind,
         )
     except InvalidMediaAssetError as exc:
@@ -87,9 +154,17 @@ def upload_media_asset(
         )
     except Exception:
         db.rollback()
-        delete_storage_path(stored["storage_key"])
+        # The file may already back another asset with the same bytes.
+        display_crud.release_storage_key(db, stored["storage_key"])
         raise
 
+    # Декодирование и ресайз занимают секунды на больших фонах; до готовности вариантов дисплеи получают оригинал.
+    background_tasks.add_task(
+        generate_variants,
+        stored["storage_key"],
+        mime_type=stored["mime_type"],
+        width=stored["width"],
+    )
     return display_crud.serialize_created_media_asset(
         asset,
         content_url=str(request.url_for("get_media_asset_content", asset_id=asset.asset_id)),
@@ -108,30 +183,58 @@ def get_media_assets(request: Request, kind: str | None = None, db: Session = De
         except InvalidMediaAssetError as exc:
             raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)) from exc
     assets = display_crud.list_media_assets(db, kind=kind)
+    reference_counts = display_crud.media_asset_reference_counts(db)
     return [
         display_crud.serialize_media_asset(
             asset,
             content_url=str(request.url_for("get_media_asset_content", asset_id=asset.asset_id)),
+            reference_count=reference_counts.get(asset.asset_id, 0),
         )
         for asset in assets
     ]
 
 
+@router.post(
+    "/media-assets/gc",
+    response_model=schemas.MediaGarbageCollectionReport,
+)
+def collect_media_garbage(
+    _permission_guard: Annotated[dict, Depends(security.require_permissions("system_engineering_actions"))],
+    dry_run: bool = True,
+    grace_seconds: int = Query(default=display_crud.DEFAULT_MEDIA_GC_GRACE_SECONDS, ge=0),
+    purge_unreferenced_days: int | None = Query(default=None, ge=1),
+    db: Session = Depends(get_db),
+):
+    return display_crud.collect_media_garbage(
+        db,
+        grace_seconds=grace_seconds,
+        purge_unreferenced_after=timedelta(days=purge_unreferenced_days) if purge_unreferenced_days else None,
+        dry_run=dry_run,
+    )
+
+
 @router.get(
     "/media-assets/{asset_id}/content",
     name="get_media_asset_content",
     dependencies=[Depends(security.get_display_reader)],
 )
-def get_media_asset_content(asset_id: uuid.UUID, request: Request, db: Session = Depends(get_db)):
+def get_media_asset_content(
+    asset_id: uuid.UUID,
+    request: Request,
+    width: int | None = Query(default=None, ge=1, le=8192),
+    db: Session = Depends(get_db),
+):
     asset = display_crud.get_media_asset(db, asset_id)
-    etag = f'"{asset.checksum_sha256}"'
-    if display_crud.is_not_modified(request.headers.get("if-none-match"), current_content_version=asset.checksum_sha256):
+    storage_key, variant_width = resolve_variant(asset.storage_key, width)
+    content_version = asset.checksum_sha256 if variant_width is None else f"{asset.checksum_sha256}-w{variant_width}"
+    etag = f'"{content_version}"'
+    if display_crud.is_not_modified(request.headers.get("if-none-match"), current_content_version=content_version):
         return Response(status_code=304, headers={"ETag": etag})
 
-    if not storage_path_exists(asset.storage_key):
+    if not storage_path_exists(storage_key):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Media asset file is missing")
 
-    path = resolve_storage_path(asset.storage_key)
+    path = resolve_storage_path(storage_key)
     return FileResponse(
         path,
         media_type=asset.mime_type,
@@ -2,7 +2,7 @@ from datetime import date
 from typing import Annotated, List, Optional
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
 import schemas
@@ -125,7 +125,16 @@ def get_guest_history(
     guest_id: uuid.UUID,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=schemas.GUEST_HISTORY_PAGE_DEFAULT_LIMIT, ge=1, le=schemas.GUEST_HISTORY_PAGE_MAX_LIMIT),
     db: Session = Depends(get_db),
     current_user: Annotated[dict, Depends(security.get_current_user)] = None,
 ):
-    return guest_crud.get_guest_history(db=db, guest_id=guest_id, start_date=start_date, end_date=end_date)
+    return guest_crud.get_guest_history(
+        db=db,
+        guest_id=guest_id,
+        start_date=start_date,
+        end_date=end_date,
+        cursor=cursor,
+        limit=limit,
+    )
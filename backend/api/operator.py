@@ -2,6 +2,8 @@ import asyncio
 import uuid
 
 from fastapi import APIRouter, Depends, Query, WebSocket
+from fastapi.responses import Response
+from pydantic import TypeAdapter
 from starlette.websockets import WebSocketDisconnect
 from sqlalchemy.orm import Session
 
@@ -9,6 +11,7 @@ import schemas
 import security
 from crud import operator_crud
 from database import get_db
+from http_caching import body_etag
 from operator_stream import operator_stream_hub
 
 
@@ -18,6 +21,27 @@ router = APIRouter(
 )
 
 
+# Журналы и рабочее место кранов собираются operator_crud из уже провалидированных моделей,
+# поэтому JSON пишется напрямую через pydantic-core, минуя повторную проверку response_model.
+_TAP_CARDS_ADAPTER = TypeAdapter(list[schemas.TapWorkspaceCard])
+_SESSION_ITEMS_ADAPTER = TypeAdapter(list[schemas.OperatorSessionJournalItem])
+_POUR_ITEMS_ADAPTER = TypeAdapter(list[schemas.OperatorPourJournalItem])
+
+
+def _journal_json(journal, items_adapter: TypeAdapter) -> tuple[bytes, bytes]:
+    """Serialized journal and, separately, its items array (the stable part the ETag is taken from)."""
+    items_json = items_adapter.dump_json(journal.items)
+    envelope = journal.model_dump_json(exclude={"items"})
+    return f'{envelope[:-1]},"items":'.encode("utf-8") + items_json + b"}", items_json
+
+
+def _journal_response(journal, items_adapter: TypeAdapter) -> Response:
+    body, items_json = _journal_json(journal, items_adapter)
+    # generated_at меняется на каждый запрос, поэтому версия журнала считается без него.
+    etag = body_etag(journal.model_dump_json(exclude={"items", "generated_at"}).encode("utf-8"), items_json)
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+
 @router.get("/today", response_model=schemas.OperatorTodayModel, summary="Operator-first today overview")
 def read_operator_today(
     current_user: dict = Depends(security.require_permissions("taps_view")),
@@ -31,7 +55,8 @@ def read_operator_taps(
     current_user: dict = Depends(security.require_permissions("taps_view")),
     db: Session = Depends(get_db),
 ):
-    return operator_crud.get_operator_taps(db=db, current_user=current_user)
+    cards = operator_crud.get_operator_taps(db=db, current_user=current_user)
+    return Response(content=_TAP_CARDS_ADAPTER.dump_json(cards), media_type="application/json")
 
 
 @router.get("/taps/{tap_id}", response_model=schemas.TapDrawerModel, summary="Operator tap drawer detail")
@@ -81,11 +106,12 @@ def read_operator_sessions(
         zero_volume_abort_only=zero_volume_abort_only,
         active_only=active_only,
     )
-    return operator_crud.get_operator_sessions(
+    journal = operator_crud.get_operator_sessions(
         db=db,
         filters=parsed_filters,
         current_user=current_user,
     )
+    return _journal_response(journal, _SESSION_ITEMS_ADAPTER)
 
 
 @router.get("/sessions/{visit_id}", response_model=schemas.OperatorSessionDetailModel, summary="Operator session detail")
@@ -116,6 +142,13 @@ def read_operator_pours(
     timeout_only: bool = Query(default=False, alias="timeout_only"),
     denied_only: bool = Query(default=False, alias="denied_only"),
     sale_mode: str = Query(default="all", alias="sale_mode"),
+    cursor: str | None = Query(default=None, alias="cursor"),
+    limit: int = Query(
+        default=schemas.OPERATOR_POUR_PAGE_DEFAULT_LIMIT,
+        ge=1,
+        le=schemas.OPERATOR_POUR_PAGE_MAX_LIMIT,
+        alias="limit",
+    ),
     current_user: dict = Depends(security.require_permissions("sessions_view")),
     db: Session = Depends(get_db),
 ):
@@ -133,12 +166,15 @@ def read_operator_pours(
         timeout_only=timeout_only,
         denied_only=denied_only,
         sale_mode=sale_mode,
+        cursor=cursor,
+        limit=limit,
     )
-    return operator_crud.get_operator_pours(
+    journal = operator_crud.get_operator_pours(
         db=db,
         filters=parsed_filters,
         current_user=current_user,
     )
+    return _journal_response(journal, _POUR_ITEMS_ADAPTER)
 
 
 @router.get("/pours/{pour_ref:path}", response_model=schemas.OperatorPourDetailModel, summary="Operator pour detail")
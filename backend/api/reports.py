@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, Query
@@ -5,7 +6,7 @@ from sqlalchemy.orm import Session
 
 import schemas
 import security
-from crud import flow_accounting_crud
+from crud import flow_accounting_crud, rollup_crud
 from database import get_db
 
 router = APIRouter(
@@ -25,3 +26,29 @@ def get_flow_summary(
     current_user: Annotated[dict, Depends(security.get_current_user)] = None,
 ):
     return flow_accounting_crud.get_flow_summary(db=db, tap_id=tap_id)
+
+
+@router.get(
+    "/pour-rollups/consistency",
+    response_model=schemas.PourRollupConsistencyReport,
+    summary="Compare hourly pour rollups with raw pours",
+)
+def check_pour_rollups(
+    since: datetime | None = Query(default=None),
+    db: Session = Depends(get_db),
+    _permission_guard: Annotated[dict, Depends(security.require_permissions("system_engineering_actions"))] = None,
+):
+    return rollup_crud.verify_pour_rollups(db=db, since=since)
+
+
+@router.post(
+    "/pour-rollups/rebuild",
+    response_model=schemas.PourRollupConsistencyReport,
+    summary="Recompute hourly pour rollups that drifted from raw pours",
+)
+def rebuild_pour_rollups(
+    since: datetime | None = Query(default=None),
+    db: Session = Depends(get_db),
+    _permission_guard: Annotated[dict, Depends(security.require_permissions("system_engineering_actions"))] = None,
+):
+    return rollup_crud.verify_pour_rollups(db=db, since=since, repair=True)
@@ -61,3 +61,10 @@ def get_all_system_states(
         states.append(emergency_state)
 
     return states
+
+
+@router.get("/audit-queue", response_model=schemas.AuditQueueMetrics, summary="Get audit log queue metrics")
+def get_audit_queue_metrics(
+    _permission_guard: Annotated[dict, Depends(security.require_permissions("system_health_view"))],
+):
+    return security.AUDIT_LOG_QUEUE.get_metrics()
@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from crud import audit_crud
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AUDIT_LOG_QUEUE_SIZE = 10000
+DEFAULT_AUDIT_LOG_BATCH_SIZE = 200
+DEFAULT_AUDIT_LOG_FLUSH_INTERVAL_MS = 250
+
+
+def _env_int(name: str, default: int) -> int:
+    raw_value = os.getenv(name, str(default)).strip()
+    try:
+        return max(int(raw_value), 0)
+    except ValueError:
+        return default
+
+
+class AuditLogQueue:
+    """Bounded in-process buffer of audit rows, drained by one writer thread.
+
+    Rows are written with a single multi-row INSERT every ``flush_interval_ms``
+    or as soon as ``batch_size`` rows are waiting. When the queue is full new
+    rows are dropped and counted. With ``flush_interval_ms=0`` (or before
+    ``start()``) each row is written directly by the caller.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        *,
+        max_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        flush_interval_ms: Optional[int] = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self.max_size = max(max_size if max_size is not None else _env_int("AUDIT_LOG_QUEUE_SIZE", DEFAULT_AUDIT_LOG_QUEUE_SIZE), 1)
+        self.batch_size = max(
+            batch_size if batch_size is not None else _env_int("AUDIT_LOG_BATCH_SIZE", DEFAULT_AUDIT_LOG_BATCH_SIZE), 1
+        )
+        self.flush_interval_ms = (
+            flush_interval_ms
+            if flush_interval_ms is not None
+            else _env_int("AUDIT_LOG_FLUSH_INTERVAL_MS", DEFAULT_AUDIT_LOG_FLUSH_INTERVAL_MS)
+        )
+        self._rows: deque[dict[str, Any]] = deque()
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._metrics = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is not None or self.flush_interval_ms <= 0:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the writer and write whatever is still queued."""
+        thread = self._thread
+        if thread is not None:
+            with self._condition:
+                self._stopping = True
+                self._condition.notify_all()
+            thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def submit(
+        self,
+        *,
+        actor_id: str,
+        action: str,
+        target_entity: Optional[str] = None,
+        target_id: Optional[str] = None,
+        details: Optional[dict[str, Any]] = None,
+    ) -> bool:
+        """Queue one audit row; returns ``False`` when it was dropped because the queue is full."""
+        row = {
+            "actor_id": actor_id,
+            "action": action,
+            "target_entity": target_entity,
+            "target_id": target_id,
+            "details": json.dumps(details, ensure_ascii=False) if details else None,
+            # Время фиксируется при постановке в очередь, а не при пакетной записи.
+            "timestamp": datetime.now(timezone.utc),
+        }
+        if not self.running:
+            with self._condition:
+                self._metrics["enqueued"] += 1
+            self._write([row])
+            return True
+
+        with self._condition:
+            if len(self._rows) >= self.max_size:
+                self._metrics["dropped"] += 1
+                dropped = self._metrics["dropped"]
+            else:
+                self._rows.append(row)
+                self._metrics["enqueued"] += 1
+                if len(self._rows) >= self.batch_size:
+                    self._condition.notify()
+                return True
+        if dropped == 1 or dropped % 1000 == 0:
+            logger.warning("Audit log queue is full (%s rows); %s entries dropped so far", self.max_size, dropped)
+        return False
+
+    def flush(self) -> int:
+        """Write every queued row from the calling thread; returns the number of rows taken."""
+        taken = 0
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return taken
+            self._write(batch)
+            taken += len(batch)
+
+    def get_metrics(self) -> dict[str, int]:
+        with self._condition:
+            return {**self._metrics, "depth": len(self._rows), "max_size": self.max_size}
+
+    def _take_batch(self) -> list[dict[str, Any]]:
+        with self._condition:
+            count = min(len(self._rows), self.batch_size)
+            return [self._rows.popleft() for _ in range(count)]
+
+    def _run(self) -> None:
+        interval_seconds = self.flush_interval_ms / 1000.0
+        while True:
+            with self._condition:
+                if not self._stopping and len(self._rows) < self.batch_size:
+                    self._condition.wait(interval_seconds)
+                stopping = self._stopping
+            if stopping:
+                return
+            self.flush()
+
+    def _write(self, rows: list[dict[str, Any]]) -> None:
+        # Один писатель за раз: фоновый поток и flush() при остановке не должны пересекаться.
+        with self._write_lock:
+            db = self._session_factory()
+            try:
+                audit_crud.create_audit_log_entries(db, rows)
+            except Exception:
+                db.rollback()
+                with self._condition:
+                    self._metrics["failed"] += len(rows)
+                logger.error("Failed to write %s audit log entries", len(rows), exc_info=True)
+                return
+            finally:
+                db.close()
+        with self._condition:
+            self._metrics["written"] += len(rows)
+            self._metrics["batches"] += 1
+        logger.debug("Audit log batch of %s entries written", len(rows))
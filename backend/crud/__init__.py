@@ -11,3 +11,4 @@ from . import shift_crud
 from . import shift_report_crud
 from . import lost_card_crud
 from . import operator_crud
+from . import rollup_crud
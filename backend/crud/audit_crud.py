@@ -1,5 +1,6 @@
 # backend/crud/audit_crud.py
 
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 import models
 import json
@@ -42,4 +43,13 @@ def create_audit_log_entry(
         logger.error(f"Ошибка в фоновой задаче аудита: {e}", exc_info=True)
         db.rollback()
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def create_audit_log_entries(db: Session, rows: list[dict]) -> None:
+    """
+    Пакетная запись журнала аудита одним многострочным INSERT и одним коммитом.
+    Используется фоновым писателем очереди аудита (audit_queue.AuditLogQueue).
+    """
+    db.execute(insert(models.AuditLog), rows)
+    db.commit()
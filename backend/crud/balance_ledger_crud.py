@@ -0,0 +1,178 @@
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+import models
+from crud import rollup_crud
+
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_BALANCE_SNAPSHOT_INTERVAL = 50
+CONTRA_SALES = "sales"
+CONTRA_OPENING_BALANCE = "opening_balance"
+
+_entries = models.GuestBalanceLedgerEntry
+_snapshots = models.GuestBalanceSnapshot
+
+
+@dataclass(frozen=True)
+class BalanceDrift:
+    guest_id: uuid.UUID
+    balance: Decimal
+    ledger_balance: Decimal
+
+
+def _get_snapshot_interval() -> int:
+    raw_value = os.getenv("BALANCE_SNAPSHOT_INTERVAL", str(DEFAULT_BALANCE_SNAPSHOT_INTERVAL)).strip()
+    try:
+        return max(int(raw_value), 1)
+    except ValueError:
+        return DEFAULT_BALANCE_SNAPSHOT_INTERVAL
+
+
+def _to_amount(value) -> Decimal:
+    if value is None:
+        return Decimal("0.00")
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return value.quantize(Decimal("0.01"))
+
+
+def payment_contra_account(payment_method: Optional[str]) -> str:
+    return f"payment:{payment_method or 'unknown'}"
+
+
+def _latest_snapshot(db: Session, guest_id: uuid.UUID, *conditions):
+    return db.execute(
+        select(_snapshots.sequence, _snapshots.balance)
+        .where(_snapshots.guest_id == guest_id, *conditions)
+        .order_by(_snapshots.sequence.desc())
+        .limit(1)
+    ).first()
+
+
+def _balance_from(db: Session, guest_id: uuid.UUID, snapshot, *conditions) -> Decimal:
+    """Snapshot balance plus the (at most N) entries after it."""
+    after_snapshot = [_entries.sequence > snapshot.sequence] if snapshot is not None else []
+    tail = db.execute(
+        select(func.coalesce(func.sum(_entries.amount), 0)).where(
+            _entries.guest_id == guest_id, *after_snapshot, *conditions
+        )
+    ).scalar_one()
+    return _to_amount(snapshot.balance if snapshot is not None else 0) + _to_amount(tail)
+
+
+def get_ledger_balance(db: Session, guest_id: uuid.UUID) -> Decimal:
+    return _balance_from(db, guest_id, _latest_snapshot(db, guest_id))
+
+
+def get_guest_balance_at(db: Session, guest_id: uuid.UUID, at: datetime) -> Decimal:
+    """Guest balance as of ``at``: nearest snapshot on the (guest_id, sequence) key plus the entries after it."""
+    bind = db.get_bind()
+    snapshot = _latest_snapshot(db, guest_id, *rollup_crud.timestamp_window_filters(bind, _snapshots.occurred_at, None, at))
+    return _balance_from(
+        db, guest_id, snapshot, *rollup_crud.timestamp_window_filters(bind, _entries.occurred_at, None, at)
+    )
+
+
+def lock_guest(db: Session, guest_id: uuid.UUID) -> Optional[models.Guest]:
+    """Load the guest with a row lock; every balance change takes it before reading ``guest.balance``."""
+    # Без блокировки параллельные списание и пополнение читают один и тот же
+    # max(sequence) и одна из транзакций падает на уникальном ключе журнала.
+    return db.get(models.Guest, guest_id, with_for_update=True, populate_existing=True)
+
+
+def post_balance_entry(
+    db: Session,
+    guest: models.Guest,
+    *,
+    amount: Decimal,
+    kind: str,
+    contra_account: str,
+    source_type: Optional[str] = None,
+    source_id=None,
+) -> models.GuestBalanceLedgerEntry:
+    """Append one posting for a change already applied to ``guest.balance`` in this transaction.
+
+    The caller must hold the guest row lock (see ``lock_guest``).
+    """
+    last_sequence = db.execute(
+        select(func.coalesce(func.max(_entries.sequence), 0)).where(_entries.guest_id == guest.guest_id)
+    ).scalar_one()
+    entry = models.GuestBalanceLedgerEntry(
+        guest_id=guest.guest_id,
+        sequence=int(last_sequence) + 1,
+        kind=kind,
+        amount=amount,
+        contra_account=contra_account,
+        source_type=source_type,
+        source_id=str(source_id) if source_id is not None else None,
+    )
+    db.add(entry)
+    if entry.sequence % _get_snapshot_interval() == 0:
+        db.flush()
+        # Снимок считается по журналу, а не копирует Guest.balance, чтобы расхождение не закреплялось в нём.
+        db.add(
+            models.GuestBalanceSnapshot(
+                guest_id=guest.guest_id,
+                sequence=entry.sequence,
+                balance=get_ledger_balance(db, guest.guest_id),
+            )
+        )
+    return entry
+
+
+def sum_entries_by_kind(db: Session, *, start: datetime, end: datetime) -> dict[str, Decimal]:
+    rows = db.execute(
+        select(_entries.kind, func.coalesce(func.sum(_entries.amount), 0))
+        .where(*rollup_crud.timestamp_window_filters(db.get_bind(), _entries.occurred_at, start, end))
+        .group_by(_entries.kind)
+    ).all()
+    return {kind: _to_amount(total) for kind, total in rows}
+
+
+def verify_balance_ledger(db: Session) -> list[BalanceDrift]:
+    """Compare every Guest.balance with its ledger balance; log and return the guests that drifted."""
+    latest = (
+        select(_snapshots.guest_id, func.max(_snapshots.sequence).label("sequence"))
+        .group_by(_snapshots.guest_id)
+        .subquery()
+    )
+    base = (
+        select(_snapshots.guest_id, _snapshots.sequence, _snapshots.balance)
+        .join(latest, and_(_snapshots.guest_id == latest.c.guest_id, _snapshots.sequence == latest.c.sequence))
+        .subquery()
+    )
+    tail = (
+        select(_entries.guest_id, func.sum(_entries.amount).label("amount"))
+        .outerjoin(base, base.c.guest_id == _entries.guest_id)
+        .where(or_(base.c.sequence.is_(None), _entries.sequence > base.c.sequence))
+        .group_by(_entries.guest_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(models.Guest.guest_id, models.Guest.balance, base.c.balance, tail.c.amount)
+        .outerjoin(base, base.c.guest_id == models.Guest.guest_id)
+        .outerjoin(tail, tail.c.guest_id == models.Guest.guest_id)
+    ).all()
+
+    drifts = []
+    for guest_id, balance, snapshot_balance, tail_amount in rows:
+        ledger_balance = _to_amount(snapshot_balance) + _to_amount(tail_amount)
+        if _to_amount(balance) != ledger_balance:
+            drifts.append(BalanceDrift(guest_id=guest_id, balance=_to_amount(balance), ledger_balance=ledger_balance))
+    if drifts:
+        LOGGER.warning(
+            "Guest balance drifted from the balance ledger for %s guest(s) (e.g. %s)",
+            len(drifts),
+            ", ".join(f"{drift.guest_id}: {drift.balance} != {drift.ledger_balance}" for drift in drifts[:5]),
+        )
+    return drifts
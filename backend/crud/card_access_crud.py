@@ -0,0 +1,243 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+import models
+
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CARD_ACCESS_INDEX_TTL_SECONDS = 600
+_CARD_ACCESS_INVALIDATIONS_KEY = "card_access_invalidations"
+
+
+@dataclass(frozen=True)
+class IndexedVisit:
+    visit_id: uuid.UUID
+    operational_status: str
+    active_tap_id: Optional[int]
+
+
+@dataclass(frozen=True)
+class CardAccess:
+    card_uid: str
+    is_lost: bool
+    active_visit: Optional[IndexedVisit]
+
+
+def _get_index_ttl_seconds() -> float:
+    raw_value = os.getenv("CARD_ACCESS_INDEX_TTL_SECONDS", str(DEFAULT_CARD_ACCESS_INDEX_TTL_SECONDS)).strip()
+    try:
+        return max(float(raw_value), 0.0)
+    except ValueError:
+        return float(DEFAULT_CARD_ACCESS_INDEX_TTL_SECONDS)
+
+
+def _indexed_visit(row) -> IndexedVisit:
+    return IndexedVisit(
+        visit_id=row.visit_id,
+        operational_status=row.operational_status,
+        active_tap_id=row.active_tap_id,
+    )
+
+
+def _active_visit_rows():
+    return select(
+        models.Visit.card_uid,
+        models.Visit.visit_id,
+        models.Visit.operational_status,
+        models.Visit.active_tap_id,
+    ).where(models.Visit.status == "active", models.Visit.card_uid.is_not(None))
+
+
+def _load_all(db: Session) -> tuple[set[str], dict[str, IndexedVisit]]:
+    lost_uids = set(db.execute(select(models.LostCard.card_uid)).scalars())
+    visits = {row.card_uid: _indexed_visit(row) for row in db.execute(_active_visit_rows())}
+    return lost_uids, visits
+
+
+def _load_card(db: Session, card_uid: str) -> tuple[bool, Optional[IndexedVisit]]:
+    is_lost = db.execute(
+        select(models.LostCard.id).where(models.LostCard.card_uid == card_uid).limit(1)
+    ).first() is not None
+    row = db.execute(_active_visit_rows().where(models.Visit.card_uid == card_uid).limit(1)).first()
+    return is_lost, (_indexed_visit(row) if row is not None else None)
+
+
+class CardAccessIndex:
+    """Lost cards and the card -> active visit mapping, answered from memory.
+
+    Both sets are small and change only through visit and lost-card writes; the
+    session hooks below mark touched cards after commit and such cards are
+    re-read from the database on their next lookup. The TTL and the periodic
+    self-check only bound staleness for writes made outside this process.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._lost_uids: set[str] = set()
+        self._visits: dict[str, IndexedVisit] = {}
+        self._loaded_at: Optional[float] = None
+        self._epoch = 0
+        self._sequence = 0
+        # card_uid -> sequence of its latest invalidation
+        self._stale_uids: dict[str, int] = {}
+
+    def _entry(self, card_uid: str) -> CardAccess:
+        return CardAccess(
+            card_uid=card_uid,
+            is_lost=card_uid in self._lost_uids,
+            active_visit=self._visits.get(card_uid),
+        )
+
+    def lookup(self, db: Session, card_uid: str) -> CardAccess:
+        with self._lock:
+            loaded = self._loaded_at is not None and time.monotonic() - self._loaded_at < _get_index_ttl_seconds()
+            if loaded and card_uid not in self._stale_uids:
+                return self._entry(card_uid)
+            epoch, sequence = self._epoch, self._sequence
+
+        if not loaded:
+            lost_uids, visits = _load_all(db)
+            with self._lock:
+                # A clear() during the load means the rows may predate it; keep the index unloaded.
+                if epoch == self._epoch:
+                    self._lost_uids = lost_uids
+                    self._visits = visits
+                    self._loaded_at = time.monotonic()
+                    self._forget_stale(sequence)
+            return CardAccess(card_uid=card_uid, is_lost=card_uid in lost_uids, active_visit=visits.get(card_uid))
+
+        is_lost, active_visit = _load_card(db, card_uid)
+        with self._lock:
+            if epoch == self._epoch and self._stale_uids.get(card_uid, 0) <= sequence:
+                self._stale_uids.pop(card_uid, None)
+                if is_lost:
+                    self._lost_uids.add(card_uid)
+                else:
+                    self._lost_uids.discard(card_uid)
+                if active_visit is not None:
+                    self._visits[card_uid] = active_visit
+                else:
+                    self._visits.pop(card_uid, None)
+        return CardAccess(card_uid=card_uid, is_lost=is_lost, active_visit=active_visit)
+
+    def _forget_stale(self, sequence: int) -> None:
+        # Cards invalidated while the rows were being read stay stale.
+        self._stale_uids = {uid: seen for uid, seen in self._stale_uids.items() if seen > sequence}
+
+    def invalidate(self, card_uids: set[str]) -> None:
+        with self._lock:
+            self._sequence += 1
+            for card_uid in card_uids:
+                self._stale_uids[card_uid] = self._sequence
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._lost_uids = set()
+            self._visits = {}
+            self._loaded_at = None
+            self._stale_uids = {}
+
+    def verify(self, db: Session) -> int:
+        """Compare the loaded index with the database; on drift log it, drop the index and return the count."""
+        with self._lock:
+            if self._loaded_at is None:
+                return 0
+            epoch = self._epoch
+
+        db_lost_uids, db_visits = _load_all(db)
+        with self._lock:
+            if epoch != self._epoch:
+                return 0
+            # Cards touched by recent commits are re-read on their next lookup anyway.
+            mismatched = {
+                uid
+                for uid in (self._lost_uids ^ db_lost_uids) | set(self._visits) | set(db_visits)
+                if uid not in self._stale_uids and (
+                    (uid in self._lost_uids) != (uid in db_lost_uids) or self._visits.get(uid) != db_visits.get(uid)
+                )
+            }
+            if not mismatched:
+                return 0
+            self._epoch += 1
+            self._loaded_at = None
+            self._stale_uids = {}
+        LOGGER.warning(
+            "Card access index drifted from the database for %s card(s) (e.g. %s); index dropped",
+            len(mismatched),
+            ", ".join(sorted(mismatched)[:5]),
+        )
+        return len(mismatched)
+
+
+CARD_ACCESS_INDEX = CardAccessIndex()
+
+
+def get_card_access(db: Session, card_uid: str) -> CardAccess:
+    """Lost flag and active visit for a canonical card UID without a database round trip on a hit."""
+    return CARD_ACCESS_INDEX.lookup(db, card_uid)
+
+
+def load_active_visit(db: Session, access: CardAccess) -> Optional[models.Visit]:
+    """ORM visit behind an indexed entry; when the row no longer matches, the card is re-read on next lookup."""
+    entry = access.active_visit
+    if entry is None:
+        return None
+    visit = db.get(models.Visit, entry.visit_id)
+    if (
+        visit is not None
+        and visit.status == "active"
+        and visit.card_uid == access.card_uid
+        and visit.operational_status == entry.operational_status
+    ):
+        return visit
+    CARD_ACCESS_INDEX.invalidate({access.card_uid})
+    return None
+
+
+def verify_card_access_index(db: Session) -> int:
+    return CARD_ACCESS_INDEX.verify(db)
+
+
+def mark_card_access_stale(db: Session, card_uid: str) -> None:
+    """Invalidate a card on commit for writes the flush hook cannot see (Core UPDATEs)."""
+    db.info.setdefault(_CARD_ACCESS_INVALIDATIONS_KEY, set()).add(card_uid)
+
+
+def _card_uid_values(obj) -> set[str]:
+    history = inspect(obj).attrs.card_uid.history
+    return {value for value in (*history.deleted, *history.unchanged, *history.added) if value is not None}
+
+
+@event.listens_for(Session, "before_flush")
+def _capture_card_access_changes(session: Session, flush_context, instances) -> None:
+    card_uids: set[str] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (models.Visit, models.LostCard)):
+            card_uids |= _card_uid_values(obj)
+    if card_uids:
+        session.info.setdefault(_CARD_ACCESS_INVALIDATIONS_KEY, set()).update(card_uids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_card_access(session: Session) -> None:
+    card_uids = session.info.pop(_CARD_ACCESS_INVALIDATIONS_KEY, None)
+    if card_uids:
+        CARD_ACCESS_INDEX.invalidate(card_uids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _invalidate_rolled_back_card_access(session: Session) -> None:
+    # A lookup inside the failed transaction may have indexed its flushed rows.
+    card_uids = session.info.pop(_CARD_ACCESS_INVALIDATIONS_KEY, None)
+    if card_uids:
+        CARD_ACCESS_INDEX.invalidate(card_uids)
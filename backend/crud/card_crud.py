@@ -3,12 +3,11 @@ from decimal import Decimal, ROUND_HALF_UP
 import uuid
 
 from fastapi import HTTPException, status
-from sqlalchemy import func
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import literal, select
+from sqlalchemy.orm import Session, aliased, joinedload
 
 import models
 import schemas
-from crud import lost_card_crud
 
 
 CARD_STATUS_AVAILABLE = "available"
@@ -27,7 +26,7 @@ LOOKUP_UNKNOWN = "unknown_card"
 
 
 def normalize_card_uid(card_uid: str) -> str:
-    normalized = str(card_uid or "").strip().lower()
+    normalized = models.canonical_card_uid(card_uid or "")
     if not normalized:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Card UID must not be empty")
     return normalized
@@ -47,7 +46,7 @@ def _guest_balance_cents(balance) -> int:
 
 def create_card(db: Session, card: schemas.CardCreate):
     normalized_uid = normalize_card_uid(card.card_uid)
-    db_card_by_uid = _get_card_by_uid_case_insensitive(db, normalized_uid)
+    db_card_by_uid = _get_card_by_uid(db, normalized_uid)
     if db_card_by_uid:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -63,7 +62,7 @@ def create_card(db: Session, card: schemas.CardCreate):
 
 def get_card_by_uid(db: Session, uid: str):
     normalized_uid = normalize_card_uid(uid)
-    return _get_card_by_uid_case_insensitive(db, normalized_uid)
+    return _get_card_by_uid(db, normalized_uid)
 
 
 def get_cards(db: Session, skip: int = 0, limit: int = 100):
@@ -111,63 +110,40 @@ def create_and_assign_card(db: Session, card: schemas.CardCreate, guest_id: uuid
     return db_card
 
 
-def _get_card_by_uid_case_insensitive(db: Session, card_uid: str):
-    normalized_uid = normalize_card_uid(card_uid)
-    return (
-        db.query(models.Card)
-        .filter(func.lower(models.Card.card_uid) == normalized_uid)
-        .first()
-    )
-
-
-def _get_active_visit_by_card_uid_case_insensitive(db: Session, card_uid: str):
-    normalized_uid = normalize_card_uid(card_uid)
-    return (
-        db.query(models.Visit)
-        .options(joinedload(models.Visit.guest))
-        .filter(
-            models.Visit.status == "active",
-            func.lower(models.Visit.card_uid) == normalized_uid,
+def _get_card_by_uid(db: Session, card_uid: str):
+    return db.query(models.Card).filter(models.Card.card_uid == normalize_card_uid(card_uid)).first()
+
+
+def _load_card_resolution(db: Session, card_uid: str):
+    """Card, lost-card record, active visit and the guests they point at, in one round-trip."""
+    requested = select(literal(card_uid).label("card_uid")).subquery()
+    visit_guest = aliased(models.Guest)
+    lost_visit = aliased(models.Visit)
+    lost_visit_guest = aliased(models.Guest)
+    lost_card_guest = aliased(models.Guest)
+    statement = (
+        select(
+            models.Card,
+            models.LostCard,
+            models.Visit,
+            visit_guest,
+            lost_visit_guest,
+            lost_card_guest,
         )
-        .first()
+        .select_from(requested)
+        .outerjoin(models.Card, models.Card.card_uid == requested.c.card_uid)
+        .outerjoin(models.LostCard, models.LostCard.card_uid == requested.c.card_uid)
+        .outerjoin(
+            models.Visit,
+            (models.Visit.card_uid == requested.c.card_uid) & (models.Visit.status == "active"),
+        )
+        .outerjoin(visit_guest, visit_guest.guest_id == models.Visit.guest_id)
+        .outerjoin(lost_visit, lost_visit.visit_id == models.LostCard.visit_id)
+        .outerjoin(lost_visit_guest, lost_visit_guest.guest_id == lost_visit.guest_id)
+        .outerjoin(lost_card_guest, lost_card_guest.guest_id == models.LostCard.guest_id)
+        .limit(1)
     )
-
-
-def _resolve_guest_for_card(
-    db: Session,
-    *,
-    card: models.Card | None,
-    active_visit: models.Visit | None,
-    lost_card: models.LostCard | None,
-):
-    if active_visit and active_visit.guest_id:
-        guest = active_visit.guest
-        if guest:
-            return guest
-        guest = db.query(models.Guest).filter(models.Guest.guest_id == active_visit.guest_id).first()
-        if guest:
-            return guest
-
-    if lost_card:
-        if lost_card.visit_id:
-            lost_visit = (
-                db.query(models.Visit)
-                .options(joinedload(models.Visit.guest))
-                .filter(models.Visit.visit_id == lost_card.visit_id)
-                .first()
-            )
-            if lost_visit and lost_visit.guest:
-                return lost_visit.guest
-            if lost_visit and lost_visit.guest_id:
-                guest = db.query(models.Guest).filter(models.Guest.guest_id == lost_visit.guest_id).first()
-                if guest:
-                    return guest
-        if lost_card.guest_id:
-            guest = db.query(models.Guest).filter(models.Guest.guest_id == lost_card.guest_id).first()
-            if guest:
-                return guest
-
-    return None
+    return db.execute(statement).one()
 
 
 def _lookup_outcome_for(card: models.Card | None, active_visit: models.Visit | None, lost_card: models.LostCard | None) -> str:
@@ -201,10 +177,8 @@ def _allowed_actions_for(outcome: str) -> tuple[str, list[str]]:
 
 def resolve_card(db: Session, card_uid: str):
     requested_uid = normalize_card_uid(card_uid)
-    lost_card = lost_card_crud.get_lost_card_by_uid(db=db, card_uid=requested_uid)
-    card = _get_card_by_uid_case_insensitive(db=db, card_uid=requested_uid)
-    active_visit = _get_active_visit_by_card_uid_case_insensitive(db=db, card_uid=requested_uid)
-    guest = _resolve_guest_for_card(db=db, card=card, active_visit=active_visit, lost_card=lost_card)
+    card, lost_card, active_visit, visit_guest, lost_visit_guest, lost_card_guest = _load_card_resolution(db, requested_uid)
+    guest = visit_guest or lost_visit_guest or lost_card_guest
     lookup_outcome = _lookup_outcome_for(card=card, active_visit=active_visit, lost_card=lost_card)
     recommended_action, allowed_next_actions = _allowed_actions_for(lookup_outcome)
 
@@ -221,7 +195,7 @@ def resolve_card(db: Session, card_uid: str):
 
     active_visit_payload = None
     if active_visit:
-        guest_for_visit = active_visit.guest or guest
+        guest_for_visit = visit_guest or guest
         active_visit_payload = {
             "visit_id": active_visit.visit_id,
             "guest_id": active_visit.guest_id,
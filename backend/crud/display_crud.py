@@ -1,18 +1,31 @@
+import asyncio
 import logging
 import hashlib
 import json
+import os
+import threading
+import time
 import uuid
-from datetime import datetime, timezone
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal, ROUND_HALF_UP
 from typing import Callable, Optional
 
 from fastapi import HTTPException, status
+from sqlalchemy import event, func, inspect, select, union_all
 from sqlalchemy.orm import Session, joinedload
 
 import models
 import schemas
 from crud import system_crud
-from media_storage import normalize_media_kind, storage_path_exists
+from media_storage import (
+    delete_storage_path,
+    list_stored_files,
+    normalize_media_kind,
+    resolve_storage_path,
+    storage_keys_with_variants,
+    storage_path_exists,
+)
 
 
 EMERGENCY_STOP_KEY = "emergency_stop_enabled"
@@ -31,6 +44,11 @@ DISPLAY_MODE_PER_LITER = "per_liter"
 DISPLAY_MODE_AUTO = "auto"
 ALLOWED_PRICE_MODES = {DISPLAY_MODE_PER_100ML, DISPLAY_MODE_PER_LITER, DISPLAY_MODE_AUTO}
 
+DEFAULT_SNAPSHOT_CACHE_TTL_SECONDS = 300
+DEFAULT_MEDIA_GC_GRACE_SECONDS = 3600
+_SNAPSHOT_INVALIDATIONS_KEY = "display_snapshot_invalidations"
+_ALL_TAPS = None
+
 
 def _now_utc() -> datetime:
     return datetime.now(timezone.utc)
@@ -88,6 +106,7 @@ def serialize_media_asset(
     asset: models.MediaAsset,
     *,
     content_url: Optional[str] = None,
+    reference_count: int = 0,
 ) -> schemas.MediaAssetListItem:
     return schemas.MediaAssetListItem(
         asset_id=asset.asset_id,
@@ -100,6 +119,7 @@ def serialize_media_asset(
         checksum_sha256=asset.checksum_sha256,
         content_url=content_url or _asset_url(asset.asset_id),
         created_at=asset.created_at,
+        reference_count=reference_count,
     )
 
 
@@ -167,18 +187,113 @@ def create_media_asset(
     return asset
 
 
+def _display_relation_options() -> tuple:
+    return (
+        joinedload(models.Tap.keg)
+        .joinedload(models.Keg.beverage)
+        .joinedload(models.Beverage.background_asset),
+        joinedload(models.Tap.keg)
+        .joinedload(models.Keg.beverage)
+        .joinedload(models.Beverage.logo_asset),
+        joinedload(models.Tap.display_config).joinedload(models.TapDisplayConfig.override_background_asset),
+    )
+
+
+def _asset_references():
+    return union_all(
+        select(models.Beverage.background_asset_id.label("asset_id")),
+        select(models.Beverage.logo_asset_id.label("asset_id")),
+        select(models.TapDisplayConfig.override_background_asset_id.label("asset_id")),
+    ).subquery()
+
+
+def media_asset_reference_counts(db: Session) -> dict[uuid.UUID, int]:
+    """How many beverages and tap display configs point at each asset (unreferenced assets are absent)."""
+    references = _asset_references()
+    rows = db.execute(
+        select(references.c.asset_id, func.count())
+        .where(references.c.asset_id.is_not(None))
+        .group_by(references.c.asset_id)
+    ).all()
+    return {asset_id: count for asset_id, count in rows}
+
+
+def release_storage_key(db: Session, storage_key: str) -> bool:
+    """Delete the stored file and its variants once no asset row uses ``storage_key`` any more."""
+    in_use = db.query(models.MediaAsset.asset_id).filter(models.MediaAsset.storage_key == storage_key).first()
+    if in_use is not None:
+        return False
+    delete_storage_path(storage_key)
+    return True
+
+
+def collect_media_garbage(
+    db: Session,
+    *,
+    grace_seconds: int = DEFAULT_MEDIA_GC_GRACE_SECONDS,
+    purge_unreferenced_after: Optional[timedelta] = None,
+    dry_run: bool = False,
+) -> schemas.MediaGarbageCollectionReport:
+    """Remove media files no asset row points at.
+
+    Files younger than ``grace_seconds`` are kept so in-flight uploads are not raced. With
+    ``purge_unreferenced_after`` asset rows no beverage or tap config has used for that long
+    are deleted first, which releases their files in the same run.
+    """
+    purged_asset_ids: list[uuid.UUID] = []
+    if purge_unreferenced_after is not None:
+        references = _asset_references()
+        referenced = select(references.c.asset_id).where(references.c.asset_id.is_not(None))
+        candidates = (
+            db.query(models.MediaAsset)
+            .filter(models.MediaAsset.created_at < _now_utc() - purge_unreferenced_after)
+            .filter(models.MediaAsset.asset_id.not_in(referenced))
+            .all()
+        )
+        purged_asset_ids = [asset.asset_id for asset in candidates]
+        if not dry_run:
+            for asset in candidates:
+                db.delete(asset)
+            db.commit()
+
+    purged = set(purged_asset_ids)
+    live_keys = {
+        key
+        for asset_id, storage_key in db.query(models.MediaAsset.asset_id, models.MediaAsset.storage_key).all()
+        if asset_id not in purged
+        for key in storage_keys_with_variants(storage_key)
+    }
+    cutoff = time.time() - max(grace_seconds, 0)
+    deleted_files: list[str] = []
+    freed_bytes = 0
+    for name, byte_size, mtime in list_stored_files():
+        if name in live_keys or mtime > cutoff:
+            continue
+        if not dry_run:
+            resolve_storage_path(name).unlink(missing_ok=True)
+        deleted_files.append(name)
+        freed_bytes += byte_size
+
+    if deleted_files or purged_asset_ids:
+        LOGGER.info(
+            "Media GC dry_run=%s purged_assets=%s deleted_files=%s freed_bytes=%s",
+            dry_run,
+            len(purged_asset_ids),
+            len(deleted_files),
+            freed_bytes,
+        )
+    return schemas.MediaGarbageCollectionReport(
+        dry_run=dry_run,
+        purged_asset_ids=purged_asset_ids,
+        deleted_files=sorted(deleted_files),
+        freed_bytes=freed_bytes,
+    )
+
+
 def _tap_with_display_relations(db: Session, tap_id: int) -> models.Tap:
     tap = (
         db.query(models.Tap)
-        .options(
-            joinedload(models.Tap.keg)
-            .joinedload(models.Keg.beverage)
-            .joinedload(models.Beverage.background_asset),
-            joinedload(models.Tap.keg)
-            .joinedload(models.Keg.beverage)
-            .joinedload(models.Beverage.logo_asset),
-            joinedload(models.Tap.display_config).joinedload(models.TapDisplayConfig.override_background_asset),
-        )
+        .options(*_display_relation_options())
         .filter(models.Tap.tap_id == tap_id)
         .first()
     )
@@ -252,24 +367,34 @@ def _canonical_json(payload: dict) -> str:
     return json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
 
 
-def _resolve_display_tap_status(db: Session, *, tap: models.Tap) -> str:
-    if tap.status != "processing_sync":
-        return tap.status
-
-    active_visit_lock = (
-        db.query(models.Visit.visit_id)
+def _visit_locked_tap_ids(db: Session, taps: list[models.Tap]) -> set[int]:
+    # Only processing_sync taps are affected by the visit lock, so the others are not looked up.
+    syncing_tap_ids = [tap.tap_id for tap in taps if tap.status == "processing_sync"]
+    if not syncing_tap_ids:
+        return set()
+    rows = (
+        db.query(models.Visit.active_tap_id)
         .filter(
             models.Visit.status == "active",
-            models.Visit.active_tap_id == tap.tap_id,
+            models.Visit.active_tap_id.in_(syncing_tap_ids),
         )
-        .first()
+        .distinct()
+        .all()
     )
-    if active_visit_lock:
-        return "active"
+    return {row.active_tap_id for row in rows}
+
 
+def _resolve_display_tap_status(tap: models.Tap, *, locked_tap_ids: set[int]) -> str:
+    if tap.status == "processing_sync" and tap.tap_id in locked_tap_ids:
+        return "active"
     return tap.status
 
 
+def _is_emergency_stop_enabled(db: Session) -> bool:
+    emergency_stop_state = system_crud.get_state(db, EMERGENCY_STOP_KEY, "false")
+    return str(emergency_stop_state.value).strip().lower() == "true"
+
+
 def build_display_snapshot(
     db: Session,
     *,
@@ -277,12 +402,53 @@ def build_display_snapshot(
     content_url_builder: Optional[Callable[[uuid.UUID], str]] = None,
 ) -> schemas.DisplayTapSnapshot:
     tap = _tap_with_display_relations(db, tap_id)
+    return _snapshot_from_tap(
+        tap,
+        tap_status=_resolve_display_tap_status(tap, locked_tap_ids=_visit_locked_tap_ids(db, [tap])),
+        emergency_stop=_is_emergency_stop_enabled(db),
+        content_url_builder=content_url_builder,
+    )
+
+
+def build_display_snapshots(
+    db: Session,
+    *,
+    tap_ids: Optional[list[int]] = None,
+    content_url_builder: Optional[Callable[[uuid.UUID], str]] = None,
+) -> dict[int, schemas.DisplayTapSnapshot]:
+    """Snapshots for ``tap_ids`` (or every tap) from one eager-loaded query; unknown ids are absent."""
+    query = db.query(models.Tap).options(*_display_relation_options())
+    if tap_ids is not None:
+        if not tap_ids:
+            return {}
+        query = query.filter(models.Tap.tap_id.in_(tap_ids))
+    taps = query.order_by(models.Tap.tap_id).all()
+    if not taps:
+        return {}
+
+    locked_tap_ids = _visit_locked_tap_ids(db, taps)
+    emergency_stop = _is_emergency_stop_enabled(db)
+    return {
+        tap.tap_id: _snapshot_from_tap(
+            tap,
+            tap_status=_resolve_display_tap_status(tap, locked_tap_ids=locked_tap_ids),
+            emergency_stop=emergency_stop,
+            content_url_builder=content_url_builder,
+        )
+        for tap in taps
+    }
+
+
+def _snapshot_from_tap(
+    tap: models.Tap,
+    *,
+    tap_status: str,
+    emergency_stop: bool,
+    content_url_builder: Optional[Callable[[uuid.UUID], str]] = None,
+) -> schemas.DisplayTapSnapshot:
     config = tap.display_config
     beverage = tap.keg.beverage if tap.keg and tap.keg.beverage else None
 
-    emergency_stop_state = system_crud.get_state(db, EMERGENCY_STOP_KEY, "false")
-    emergency_stop = str(emergency_stop_state.value).strip().lower() == "true"
-
     display_mode = _resolve_price_mode(
         config.show_price_mode if config else None,
         beverage.price_display_mode_default if beverage else None,
@@ -297,7 +463,7 @@ def build_display_snapshot(
         "tap": {
             "tap_id": tap.tap_id,
             "display_name": tap.display_name,
-            "status": _resolve_display_tap_status(db, tap=tap),
+            "status": tap_status,
             "enabled": config.enabled if config else True,
         },
         "service_flags": {
@@ -361,3 +527,266 @@ def is_not_modified(if_none_match: Optional[str], *, current_content_version: st
     current = _normalize_etag(current_content_version)
     provided_values = {_normalize_etag(value) for value in if_none_match.split(",")}
     return current in provided_values
+
+
+def _get_snapshot_cache_ttl_seconds() -> float:
+    raw_value = os.getenv("DISPLAY_SNAPSHOT_CACHE_TTL_SECONDS", str(DEFAULT_SNAPSHOT_CACHE_TTL_SECONDS)).strip()
+    try:
+        return max(float(raw_value), 0.0)
+    except ValueError:
+        return float(DEFAULT_SNAPSHOT_CACHE_TTL_SECONDS)
+
+
+@dataclass(eq=False)
+class DisplaySnapshotWaiter:
+    tap_id: int
+    loop: asyncio.AbstractEventLoop
+    event: asyncio.Event
+
+    def notify(self) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            # The waiting request's loop is already closed.
+            pass
+
+    async def wait(self, timeout_seconds: float) -> bool:
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout=max(timeout_seconds, 0.0))
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+@dataclass(frozen=True)
+class CachedDisplaySnapshot:
+    version: tuple[int, int]
+    snapshot: schemas.DisplayTapSnapshot
+    body: str
+    expires_at: float
+
+
+class DisplaySnapshotCache:
+    """Per-tap snapshots keyed by a cheap (global, tap) generation pair.
+
+    Generations are bumped after commits that touch snapshot inputs, so a hit
+    never needs the database. The TTL only bounds staleness for changes made
+    outside this process (other workers, files removed from media storage).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._global_generation = 0
+        self._tap_generations: dict[int, int] = {}
+        self._entries: dict[tuple[int, str], CachedDisplaySnapshot] = {}
+        self._waiters: set[DisplaySnapshotWaiter] = set()
+
+    def subscribe(self, tap_id: int) -> DisplaySnapshotWaiter:
+        """Register a long-poll waiter; must be called from the waiting request's event loop."""
+        waiter = DisplaySnapshotWaiter(tap_id=tap_id, loop=asyncio.get_running_loop(), event=asyncio.Event())
+        with self._lock:
+            self._waiters.add(waiter)
+        return waiter
+
+    def unsubscribe(self, waiter: DisplaySnapshotWaiter) -> None:
+        with self._lock:
+            self._waiters.discard(waiter)
+
+    def version(self, tap_id: int) -> tuple[int, int]:
+        with self._lock:
+            return self._global_generation, self._tap_generations.get(tap_id, 0)
+
+    def get(self, tap_id: int, *, scope: str) -> Optional[CachedDisplaySnapshot]:
+        with self._lock:
+            entry = self._entries.get((tap_id, scope))
+            if entry is None:
+                return None
+            current = (self._global_generation, self._tap_generations.get(tap_id, 0))
+            if entry.version != current or entry.expires_at <= time.monotonic():
+                self._entries.pop((tap_id, scope), None)
+                return None
+            return entry
+
+    def store(
+        self,
+        tap_id: int,
+        *,
+        scope: str,
+        version: tuple[int, int],
+        snapshot: schemas.DisplayTapSnapshot,
+    ) -> CachedDisplaySnapshot:
+        entry = CachedDisplaySnapshot(
+            version=version,
+            snapshot=snapshot,
+            body=snapshot.model_dump_json(by_alias=True),
+            expires_at=time.monotonic() + _get_snapshot_cache_ttl_seconds(),
+        )
+        with self._lock:
+            # A commit that landed while the snapshot was being built makes it stale already.
+            if version == (self._global_generation, self._tap_generations.get(tap_id, 0)):
+                self._entries[(tap_id, scope)] = entry
+        return entry
+
+    def invalidate(self, tap_ids: set[Optional[int]]) -> None:
+        with self._lock:
+            if _ALL_TAPS in tap_ids:
+                self._global_generation += 1
+                self._entries.clear()
+                waiters = list(self._waiters)
+            else:
+                for tap_id in tap_ids:
+                    self._tap_generations[tap_id] = self._tap_generations.get(tap_id, 0) + 1
+                    for key in [key for key in self._entries if key[0] == tap_id]:
+                        del self._entries[key]
+                waiters = [waiter for waiter in self._waiters if waiter.tap_id in tap_ids]
+        for waiter in waiters:
+            waiter.notify()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._global_generation += 1
+            self._tap_generations.clear()
+            self._entries.clear()
+            waiters = list(self._waiters)
+        for waiter in waiters:
+            waiter.notify()
+
+
+DISPLAY_SNAPSHOT_CACHE = DisplaySnapshotCache()
+
+
+def get_display_snapshot(
+    db: Session,
+    *,
+    tap_id: int,
+    cache_scope: str,
+    content_url_builder: Optional[Callable[[uuid.UUID], str]] = None,
+) -> CachedDisplaySnapshot:
+    """Return the cached snapshot for ``tap_id`` or build and cache a fresh one.
+
+    ``cache_scope`` separates entries whose asset URLs differ (e.g. per base URL).
+    """
+    cached = DISPLAY_SNAPSHOT_CACHE.get(tap_id, scope=cache_scope)
+    if cached is not None:
+        return cached
+    version = DISPLAY_SNAPSHOT_CACHE.version(tap_id)
+    snapshot = build_display_snapshot(db, tap_id=tap_id, content_url_builder=content_url_builder)
+    return DISPLAY_SNAPSHOT_CACHE.store(tap_id, scope=cache_scope, version=version, snapshot=snapshot)
+
+
+def get_display_snapshots(
+    db: Session,
+    *,
+    tap_ids: Optional[list[int]],
+    cache_scope: str,
+    content_url_builder: Optional[Callable[[uuid.UUID], str]] = None,
+) -> dict[int, CachedDisplaySnapshot]:
+    """Cached snapshots for several taps; misses are built together with one query."""
+    if tap_ids is None:
+        tap_ids = [row.tap_id for row in db.query(models.Tap.tap_id).order_by(models.Tap.tap_id).all()]
+    requested = list(dict.fromkeys(tap_ids))
+
+    resolved: dict[int, CachedDisplaySnapshot] = {}
+    for tap_id in requested:
+        cached = DISPLAY_SNAPSHOT_CACHE.get(tap_id, scope=cache_scope)
+        if cached is not None:
+            resolved[tap_id] = cached
+
+    misses = [tap_id for tap_id in requested if tap_id not in resolved]
+    if misses:
+        versions = {tap_id: DISPLAY_SNAPSHOT_CACHE.version(tap_id) for tap_id in misses}
+        built = build_display_snapshots(db, tap_ids=misses, content_url_builder=content_url_builder)
+        for tap_id, snapshot in built.items():
+            resolved[tap_id] = DISPLAY_SNAPSHOT_CACHE.store(
+                tap_id,
+                scope=cache_scope,
+                version=versions[tap_id],
+                snapshot=snapshot,
+            )
+    return {tap_id: resolved[tap_id] for tap_id in requested if tap_id in resolved}
+
+
+def build_display_snapshot_batch(
+    db: Session,
+    *,
+    payload: schemas.DisplaySnapshotBatchRequest,
+    cache_scope: str,
+    content_url_builder: Optional[Callable[[uuid.UUID], str]] = None,
+) -> schemas.DisplaySnapshotBatchResponse:
+    entries = get_display_snapshots(
+        db,
+        tap_ids=payload.tap_ids,
+        cache_scope=cache_scope,
+        content_url_builder=content_url_builder,
+    )
+    known_versions = {tap_id: _normalize_etag(version) for tap_id, version in payload.known_versions.items()}
+    snapshots = []
+    unchanged_tap_ids = []
+    for tap_id, entry in entries.items():
+        if known_versions.get(tap_id) == entry.snapshot.content_version:
+            unchanged_tap_ids.append(tap_id)
+        else:
+            snapshots.append(entry.snapshot)
+    return schemas.DisplaySnapshotBatchResponse(
+        snapshots=snapshots,
+        unchanged_tap_ids=unchanged_tap_ids,
+        missing_tap_ids=[tap_id for tap_id in (payload.tap_ids or []) if tap_id not in entries],
+        generated_at=_now_utc(),
+    )
+
+
+def _attribute_values(obj, attribute: str) -> set:
+    history = inspect(obj).attrs[attribute].history
+    return {value for value in (*history.deleted, *history.unchanged, *history.added) if value is not None}
+
+
+def _visit_lock_tap_ids(session: Session, visit: models.Visit) -> set:
+    if visit in session.new or visit in session.deleted:
+        return _attribute_values(visit, "active_tap_id")
+    state = inspect(visit)
+    lock_history = state.attrs.active_tap_id.history
+    if not lock_history.has_changes() and not state.attrs.status.history.has_changes():
+        return set()
+    return _attribute_values(visit, "active_tap_id")
+
+
+def mark_display_snapshot_stale(db: Session, tap_id: Optional[int] = _ALL_TAPS) -> None:
+    """Invalidate cached snapshots on commit for writes the flush hook cannot see (Core UPDATEs)."""
+    db.info.setdefault(_SNAPSHOT_INVALIDATIONS_KEY, set()).add(tap_id)
+
+
+def _snapshot_invalidations(session: Session) -> set[Optional[int]]:
+    tap_ids: set[Optional[int]] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (models.Beverage, models.Keg, models.MediaAsset)):
+            tap_ids.add(_ALL_TAPS)
+        elif isinstance(obj, models.SystemState):
+            if obj.key == EMERGENCY_STOP_KEY:
+                tap_ids.add(_ALL_TAPS)
+        elif isinstance(obj, models.Tap):
+            tap_ids |= _attribute_values(obj, "tap_id")
+        elif isinstance(obj, models.TapDisplayConfig):
+            tap_ids |= _attribute_values(obj, "tap_id")
+        elif isinstance(obj, models.Visit):
+            # The visit lock only changes what a processing_sync tap reports as its status.
+            tap_ids |= _visit_lock_tap_ids(session, obj)
+    return tap_ids
+
+
+@event.listens_for(Session, "before_flush")
+def _capture_display_snapshot_changes(session: Session, flush_context, instances) -> None:
+    tap_ids = _snapshot_invalidations(session)
+    if tap_ids:
+        session.info.setdefault(_SNAPSHOT_INVALIDATIONS_KEY, set()).update(tap_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_display_snapshots(session: Session) -> None:
+    tap_ids = session.info.pop(_SNAPSHOT_INVALIDATIONS_KEY, None)
+    if tap_ids:
+        DISPLAY_SNAPSHOT_CACHE.invalidate(tap_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_display_snapshot_changes(session: Session) -> None:
+    session.info.pop(_SNAPSHOT_INVALIDATIONS_KEY, None)
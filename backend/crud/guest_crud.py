@@ -1,9 +1,13 @@
-from datetime import date
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
 from typing import Optional
 import uuid
 
 from fastapi import HTTPException, status
-from sqlalchemy import or_
+from sqlalchemy import Integer, Numeric, Select, String, cast, func, literal, null, or_, select, union_all
 from sqlalchemy.orm import Session, joinedload
 
 import models
@@ -88,6 +92,7 @@ def unassign_card_from_guest(db: Session, guest_id: uuid.UUID, card_uid: str):
     if not db_guest:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Guest not found")
 
+    card_uid = card_crud.normalize_card_uid(card_uid)
     db_card = db.query(models.Card).filter(models.Card.card_uid == card_uid).first()
     if not db_card or db_card.guest_id != guest_id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Card not found or not assigned to this guest")
@@ -104,93 +109,186 @@ def unassign_card_from_guest(db: Session, guest_id: uuid.UUID, card_uid: str):
     return db_guest
 
 
+VISIT_CARD_EVENT_DETAILS = {
+    "visit_card_issue": "Выдача карты на визит",
+    "visit_card_return": "Возврат карты и нормальное закрытие визита",
+    "visit_card_lost": "Карта отмечена как потерянная во время визита",
+    "visit_card_reissue": "Карта перевыпущена внутри активного визита",
+    "visit_service_close": "Визит закрыт сервисным сценарием без возврата карты",
+}
+# При равном времени порядок как в прежней истории: транзакция, налив, событие карты.
+_LEDGER_RANK_TRANSACTION = 2
+_LEDGER_RANK_POUR = 1
+_LEDGER_RANK_CARD_EVENT = 0
+
+
+def _in_period(column, start_date: Optional[date], end_date: Optional[date]) -> list:
+    conditions = []
+    if start_date:
+        conditions.append(column >= start_date)
+    if end_date:
+        conditions.append(column <= end_date)
+    return conditions
+
+
+def _guest_ledger(db: Session, guest_id: uuid.UUID, period) -> Select:
+    """Transactions, pours and visit card events of a guest as one UNION ALL.
+
+    ``period(column)`` returns the time conditions applied to each source on its
+    own timestamp column, so every branch can use its guest / time indexes.
+    """
+    no_text = cast(null(), String)
+    no_volume = cast(null(), Integer)
+    transactions = select(
+        models.Transaction.created_at.label("occurred_at"),
+        literal(_LEDGER_RANK_TRANSACTION).label("rank"),
+        cast(models.Transaction.transaction_id, String).label("ref"),
+        models.Transaction.type.label("kind"),
+        models.Transaction.amount.label("amount"),
+        models.Transaction.payment_method.label("payment_method"),
+        no_text.label("beverage_name"),
+        no_volume.label("volume_ml"),
+    ).where(models.Transaction.guest_id == guest_id, *period(models.Transaction.created_at))
+    pours = (
+        select(
+            models.Pour.poured_at.label("occurred_at"),
+            literal(_LEDGER_RANK_POUR).label("rank"),
+            cast(models.Pour.pour_id, String).label("ref"),
+            literal("pour").label("kind"),
+            (-models.Pour.amount_charged).label("amount"),
+            no_text.label("payment_method"),
+            models.Beverage.name.label("beverage_name"),
+            models.Pour.volume_ml.label("volume_ml"),
+        )
+        .select_from(models.Pour)
+        .outerjoin(models.Keg, models.Keg.keg_id == models.Pour.keg_id)
+        .outerjoin(models.Beverage, models.Beverage.beverage_id == models.Keg.beverage_id)
+        .where(models.Pour.guest_id == guest_id, *period(models.Pour.poured_at))
+    )
+    parts = [transactions, pours]
+
+    # Визитов у гостя на порядки меньше, чем наливов; target_id в аудите строковый.
+    visit_refs = [str(visit_id) for visit_id in db.execute(
+        select(models.Visit.visit_id).where(models.Visit.guest_id == guest_id)
+    ).scalars()]
+    if visit_refs:
+        parts.append(
+            select(
+                models.AuditLog.timestamp.label("occurred_at"),
+                literal(_LEDGER_RANK_CARD_EVENT).label("rank"),
+                cast(models.AuditLog.log_id, String).label("ref"),
+                models.AuditLog.action.label("kind"),
+                cast(literal(0), Numeric(10, 2)).label("amount"),
+                no_text.label("payment_method"),
+                no_text.label("beverage_name"),
+                no_volume.label("volume_ml"),
+            ).where(
+                models.AuditLog.target_entity == "Visit",
+                models.AuditLog.target_id.in_(visit_refs),
+                models.AuditLog.action.in_(list(VISIT_CARD_EVENT_DETAILS)),
+                *period(models.AuditLog.timestamp),
+            )
+        )
+    return union_all(*parts)
+
+
+def _history_details(row) -> str:
+    if row.rank == _LEDGER_RANK_TRANSACTION:
+        return f"Возврат: {row.payment_method}" if row.kind == "refund" else f"Пополнение: {row.payment_method}"
+    if row.rank == _LEDGER_RANK_POUR:
+        return f"Налив: {row.beverage_name or 'Unknown Beverage'} {row.volume_ml} мл"
+    return VISIT_CARD_EVENT_DETAILS.get(row.kind, row.kind)
+
+
+def _encode_history_cursor(occurred_at: datetime, skip: int, balance: Decimal) -> str:
+    raw = json.dumps({"at": occurred_at.isoformat(), "skip": skip, "balance": str(balance)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_history_cursor(cursor: str) -> tuple[datetime, int, Decimal]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        occurred_at = datetime.fromisoformat(str(data["at"]))
+        skip = int(data["skip"])
+        balance = Decimal(str(data["balance"]))
+        if skip < 0:
+            raise ValueError(skip)
+    except (TypeError, ValueError, KeyError, UnicodeError, ArithmeticError, binascii.Error):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid guest history cursor")
+    return occurred_at, skip, balance
+
+
 def get_guest_history(
     db: Session,
     guest_id: uuid.UUID,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = schemas.GUEST_HISTORY_PAGE_DEFAULT_LIMIT,
 ):
-    db_guest = get_guest(db, guest_id=guest_id)
+    """One page of the guest ledger, newest first, with the balance after each entry.
+
+    Ordering, keyset pagination and the running balance are done in SQL over
+    the UNION ALL ledger. The cursor is the timestamp of the last returned row,
+    the number of rows at that timestamp already returned and the balance just
+    before that row, so the next page continues the running balance without
+    re-reading newer history.
+    """
+    db_guest = db.get(models.Guest, guest_id)
     if not db_guest:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Guest not found")
 
+    if cursor:
+        before_at, skip, balance = _decode_history_cursor(cursor)
+    else:
+        before_at, skip, balance = None, 0, db_guest.balance
+        if end_date:
+            # Баланс на конец периода: текущий минус всё, что было позже.
+            later = _guest_ledger(db, guest_id, lambda column: [column > end_date]).subquery()
+            balance -= Decimal(str(db.execute(select(func.coalesce(func.sum(later.c.amount), 0))).scalar_one()))
+
+    def period(column):
+        conditions = _in_period(column, start_date, end_date)
+        if before_at is not None:
+            # Строки с тем же временем, что уже были отданы, пропускаются через OFFSET ниже.
+            conditions.append(column <= before_at)
+        return conditions
+
+    ledger = _guest_ledger(db, guest_id, period).subquery()
+    order = (ledger.c.occurred_at.desc(), ledger.c.rank.desc(), ledger.c.ref.desc())
+    page = select(ledger).order_by(*order).offset(skip).limit(limit + 1).subquery()
+    page_order = (page.c.occurred_at.desc(), page.c.rank.desc(), page.c.ref.desc())
+    newer_total = func.sum(page.c.amount).over(order_by=page_order, rows=(None, 0))
+    rows = db.execute(select(page, newer_total.label("running_total")).order_by(*page_order)).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
     history_items = []
-
-    transactions_query = db.query(models.Transaction).filter(models.Transaction.guest_id == guest_id)
-    if start_date:
-        transactions_query = transactions_query.filter(models.Transaction.created_at >= start_date)
-    if end_date:
-        transactions_query = transactions_query.filter(models.Transaction.created_at <= end_date)
-
-    for tx in transactions_query.all():
-        details = f"Возврат: {tx.payment_method}" if tx.type == "refund" else f"Пополнение: {tx.payment_method}"
+    for row in rows:
+        amount = Decimal(str(row.amount)).quantize(Decimal("0.01"))
+        running_total = Decimal(str(row.running_total)).quantize(Decimal("0.01"))
         history_items.append(
             schemas.HistoryItem(
-                timestamp=tx.created_at,
-                type=tx.type,
-                amount=tx.amount,
-                details=details,
+                timestamp=row.occurred_at,
+                type=row.kind,
+                amount=amount,
+                details=_history_details(row),
+                balance_after=balance - running_total + amount,
             )
         )
 
-    pours_query = (
-        db.query(models.Pour)
-        .filter(models.Pour.guest_id == guest_id)
-        .options(joinedload(models.Pour.keg).joinedload(models.Keg.beverage))
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        tied = sum(1 for row in rows if row.occurred_at == last.occurred_at)
+        if before_at is not None and last.occurred_at == before_at:
+            tied += skip
+        last_item = history_items[-1]
+        next_cursor = _encode_history_cursor(last.occurred_at, tied, last_item.balance_after - last_item.amount)
+    return schemas.GuestHistoryResponse(
+        guest_id=guest_id,
+        history=history_items,
+        has_more=has_more,
+        next_cursor=next_cursor,
     )
-    if start_date:
-        pours_query = pours_query.filter(models.Pour.poured_at >= start_date)
-    if end_date:
-        pours_query = pours_query.filter(models.Pour.poured_at <= end_date)
-
-    for pour in pours_query.all():
-        beverage_name = pour.keg.beverage.name if pour.keg and pour.keg.beverage else "Unknown Beverage"
-        history_items.append(
-            schemas.HistoryItem(
-                timestamp=pour.poured_at,
-                type="pour",
-                amount=-pour.amount_charged,
-                details=f"Налив: {beverage_name} {pour.volume_ml} мл",
-            )
-        )
-
-    visit_ids = [
-        visit_id
-        for (visit_id,) in db.query(models.Visit.visit_id).filter(models.Visit.guest_id == guest_id).all()
-    ]
-    if visit_ids:
-        audit_logs = (
-            db.query(models.AuditLog)
-            .filter(
-                models.AuditLog.target_entity == "Visit",
-                models.AuditLog.target_id.in_([str(visit_id) for visit_id in visit_ids]),
-                models.AuditLog.action.in_([
-                    "visit_card_issue",
-                    "visit_card_return",
-                    "visit_card_lost",
-                    "visit_card_reissue",
-                    "visit_service_close",
-                ]),
-            )
-            .order_by(models.AuditLog.timestamp.desc())
-            .all()
-        )
-        action_details = {
-            "visit_card_issue": "Выдача карты на визит",
-            "visit_card_return": "Возврат карты и нормальное закрытие визита",
-            "visit_card_lost": "Карта отмечена как потерянная во время визита",
-            "visit_card_reissue": "Карта перевыпущена внутри активного визита",
-            "visit_service_close": "Визит закрыт сервисным сценарием без возврата карты",
-        }
-        for log in audit_logs:
-            history_items.append(
-                schemas.HistoryItem(
-                    timestamp=log.timestamp,
-                    type=log.action,
-                    amount=Decimal("0.00"),
-                    details=action_details.get(log.action, log.action),
-                )
-            )
-
-    history_items.sort(key=lambda item: item.timestamp, reverse=True)
-    return schemas.GuestHistoryResponse(guest_id=guest_id, history=history_items)
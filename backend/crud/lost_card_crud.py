@@ -1,7 +1,6 @@
 from datetime import datetime
 import uuid
 
-from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 import models
@@ -9,14 +8,14 @@ from crud import card_crud
 
 
 def _normalize_card_uid(card_uid: str) -> str:
-    return card_uid.strip().lower()
+    return models.canonical_card_uid(card_uid)
 
 
 def get_lost_card_by_uid(db: Session, card_uid: str):
     normalized_uid = _normalize_card_uid(card_uid)
     return (
         db.query(models.LostCard)
-        .filter(func.lower(models.LostCard.card_uid) == normalized_uid)
+        .filter(models.LostCard.card_uid == normalized_uid)
         .first()
     )
 
@@ -26,7 +25,7 @@ def _get_active_visit_by_card_uid(db: Session, card_uid: str):
     return (
         db.query(models.Visit)
         .filter(
-            func.lower(models.Visit.card_uid) == normalized_uid,
+            models.Visit.card_uid == normalized_uid,
             models.Visit.status == "active",
         )
         .first()
@@ -115,32 +114,32 @@ def list_lost_cards(
 ):
     query = db.query(models.LostCard)
     if card_uid:
-        pattern = f"%{card_uid.strip().lower()}%"
-        query = query.filter(func.lower(models.LostCard.card_uid).like(pattern))
+        pattern = f"%{_normalize_card_uid(card_uid)}%"
+        query = query.filter(models.LostCard.card_uid.like(pattern))
     if reported_from:
         query = query.filter(models.LostCard.reported_at >= reported_from)
     if reported_to:
         query = query.filter(models.LostCard.reported_at <= reported_to)
 
     items = query.order_by(models.LostCard.reported_at.desc()).all()
-    normalized_uids = {item.card_uid.lower() for item in items if item.card_uid}
+    card_uids = {item.card_uid for item in items if item.card_uid}
     blocked_visit_uids = {
         card_uid
         for (card_uid,) in (
-            db.query(func.lower(models.Visit.card_uid))
+            db.query(models.Visit.card_uid)
             .filter(
                 models.Visit.status == "active",
                 models.Visit.operational_status == "active_blocked_lost_card",
-                func.lower(models.Visit.card_uid).in_(normalized_uids),
+                models.Visit.card_uid.in_(card_uids),
             )
             .all()
         )
-    } if normalized_uids else set()
+    } if card_uids else set()
 
     return [
         _serialize_lost_card(
             item,
-            requires_visit_recovery=item.card_uid.lower() in blocked_visit_uids,
+            requires_visit_recovery=item.card_uid in blocked_visit_uids,
         )
         for item in items
     ]
@@ -156,7 +155,7 @@ def restore_lost_card(db: Session, card_uid: str):
 
     card = (
         db.query(models.Card)
-        .filter(func.lower(models.Card.card_uid) == _normalize_card_uid(card_uid))
+        .filter(models.Card.card_uid == _normalize_card_uid(card_uid))
         .first()
     )
     if card:
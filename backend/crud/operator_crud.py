@@ -1,21 +1,27 @@
 from __future__ import annotations
 
+import base64
+import binascii
+import heapq
 import json
 from collections import defaultdict
-from datetime import date, datetime, timezone
+from functools import lru_cache
+from itertools import islice
+from datetime import date, datetime, time, timedelta, timezone
 from decimal import Decimal, ROUND_HALF_UP
 from uuid import UUID
 
 from fastapi import HTTPException, status
-from sqlalchemy import String, cast, func, or_
+from sqlalchemy import String, cast, func, or_, select
 from sqlalchemy.orm import Session, joinedload
 
 import models
 import schemas
-from crud import card_crud, flow_accounting_crud, incident_crud, pour_crud, shift_crud, visit_crud
+from crud import card_crud, flow_accounting_crud, incident_crud, pour_crud, rollup_crud, shift_crud, visit_crud
 
 
 SEVERITY_WEIGHT = {"critical": 0, "warning": 1, "info": 2}
+OPERATOR_POUR_SOURCE_BATCH = 100
 
 
 def _utcnow() -> datetime:
@@ -37,12 +43,30 @@ def _minutes_since(value: datetime | None) -> int | None:
     return max(0, int((_utcnow() - value).total_seconds() // 60))
 
 
-def _permissions(current_user: dict | None) -> set[str]:
-    return {
-        str(item).strip()
-        for item in (current_user or {}).get("permissions", [])
-        if str(item).strip()
-    }
+@lru_cache(maxsize=64)
+def _compiled_permissions(raw_permissions: tuple) -> frozenset[str]:
+    return frozenset(str(item).strip() for item in raw_permissions if str(item).strip())
+
+
+def _permissions(current_user: dict | None) -> frozenset[str]:
+    return _compiled_permissions(tuple((current_user or {}).get("permissions") or ()))
+
+
+@lru_cache(maxsize=256)
+def _compiled_action_policy(
+    allowed: bool,
+    permission: str | None,
+    confirm_required: bool,
+    second_approval_required: bool,
+    reason_code_required: bool,
+) -> schemas.OperatorActionPolicy:
+    return schemas.OperatorActionPolicy(
+        allowed=allowed,
+        confirm_required=confirm_required,
+        second_approval_required=second_approval_required,
+        reason_code_required=reason_code_required,
+        disabled_reason=None if allowed else f"Requires permission: {permission}",
+    )
 
 
 def _action_policy(
@@ -53,29 +77,51 @@ def _action_policy(
     second_approval_required: bool = False,
     reason_code_required: bool = False,
 ) -> schemas.OperatorActionPolicy:
-    granted = _permissions(current_user)
-    allowed = True if permission is None else permission in granted
-    disabled_reason = None if allowed else f"Requires permission: {permission}"
-    return schemas.OperatorActionPolicy(
-        allowed=allowed,
+    return _granted_action_policy(
+        _permissions(current_user),
+        permission=permission,
         confirm_required=confirm_required,
         second_approval_required=second_approval_required,
         reason_code_required=reason_code_required,
-        disabled_reason=disabled_reason,
     )
 
 
-def _tap_action_policies(current_user: dict | None) -> schemas.TapActionPolicySet:
+def _granted_action_policy(
+    granted: frozenset[str],
+    *,
+    permission: str | None = None,
+    confirm_required: bool = False,
+    second_approval_required: bool = False,
+    reason_code_required: bool = False,
+) -> schemas.OperatorActionPolicy:
+    return _compiled_action_policy(
+        permission is None or permission in granted,
+        permission,
+        confirm_required,
+        second_approval_required,
+        reason_code_required,
+    )
+
+
+# Политики ниже зависят только от набора прав роли и нескольких флагов контекста,
+# поэтому готовые (frozen) наборы кэшируются и переиспользуются для всех строк ответа.
+@lru_cache(maxsize=64)
+def _compiled_tap_action_policies(granted: frozenset[str]) -> schemas.TapActionPolicySet:
     return schemas.TapActionPolicySet(
-        open=_action_policy(current_user, permission="taps_view"),
-        stop=_action_policy(current_user, permission="taps_control", confirm_required=True, reason_code_required=True),
-        block=_action_policy(current_user, permission="taps_control", confirm_required=True),
-        screen=_action_policy(current_user, permission="display_override"),
-        keg=_action_policy(current_user, permission="taps_control"),
-        history=_action_policy(current_user, permission="sessions_view"),
+        open=_granted_action_policy(granted, permission="taps_view"),
+        stop=_granted_action_policy(granted, permission="taps_control", confirm_required=True, reason_code_required=True),
+        block=_granted_action_policy(granted, permission="taps_control", confirm_required=True),
+        screen=_granted_action_policy(granted, permission="display_override"),
+        keg=_granted_action_policy(granted, permission="taps_control"),
+        history=_granted_action_policy(granted, permission="sessions_view"),
     )
 
 
+def _tap_action_policies(current_user: dict | None) -> schemas.TapActionPolicySet:
+    return _compiled_tap_action_policies(_permissions(current_user))
+
+
+@lru_cache(maxsize=1024)
 def _contextualize_policy(
     policy: schemas.OperatorActionPolicy,
     *,
@@ -210,6 +256,40 @@ def _resolve_operator_search_limit(limit: int | None, *, fallback: int = 5, cap:
     return max(1, min(cap, int(limit)))
 
 
+def _search_pattern(query: str) -> str:
+    return f"%{query.strip().lower()}%"
+
+
+def _search_like(column, pattern: str):
+    # Expressions mirror the pg_trgm GIN indexes from migration 0017 so the
+    # planner can serve infix LIKE lookups from them; SQLite falls back to scans.
+    return func.lower(column).like(pattern)
+
+
+def _guest_search_clause(pattern: str):
+    return or_(
+        _search_like(models.Guest.last_name, pattern),
+        _search_like(models.Guest.first_name, pattern),
+        _search_like(models.Guest.patronymic, pattern),
+        _search_like(models.Guest.phone_number, pattern),
+    )
+
+
+def _matching_guest_ids(pattern: str):
+    return select(models.Guest.guest_id).where(_guest_search_clause(pattern))
+
+
+def _pour_search_clause(pattern: str):
+    # Guest matches go through an id subquery instead of a join so every
+    # branch of the OR stays on a single indexed table (BitmapOr on Postgres).
+    return or_(
+        _search_like(models.Pour.short_id, pattern),
+        _search_like(models.Pour.card_uid, pattern),
+        _search_like(cast(models.Pour.visit_id, String), pattern),
+        models.Pour.guest_id.in_(_matching_guest_ids(pattern)),
+    )
+
+
 def _to_operator_session_item(summary: schemas.SessionHistoryListItem) -> schemas.OperatorSessionJournalItem:
     last_operator_action = summary.operator_actions[-1] if summary.operator_actions else None
     completion_source = _normalize_completion_source(summary) or None
@@ -256,12 +336,26 @@ def _session_action_policies(
     summary: schemas.OperatorSessionJournalItem,
 ) -> schemas.OperatorSessionActionPolicySet:
     is_active = summary.is_active
-    has_card = bool(summary.card_uid)
-    is_blocked_lost = is_active and summary.operational_status == "active_blocked_lost_card"
+    return _compiled_session_action_policies(
+        _permissions(current_user),
+        is_active=is_active,
+        has_card=bool(summary.card_uid),
+        is_blocked_lost=is_active and summary.operational_status == "active_blocked_lost_card",
+    )
+
+
+@lru_cache(maxsize=256)
+def _compiled_session_action_policies(
+    granted: frozenset[str],
+    *,
+    is_active: bool,
+    has_card: bool,
+    is_blocked_lost: bool,
+) -> schemas.OperatorSessionActionPolicySet:
     return schemas.OperatorSessionActionPolicySet(
         close=_contextualize_policy(
-            _action_policy(
-                current_user,
+            _granted_action_policy(
+                granted,
                 permission="sessions_view",
                 confirm_required=True,
                 reason_code_required=True,
@@ -270,8 +364,8 @@ def _session_action_policies(
             disabled_reason="Blocked-lost visits must stay in the Visits recovery workspace until reissue, cancel-lost, or service-close." if is_blocked_lost else "Session is already closed.",
         ),
         force_unlock=_contextualize_policy(
-            _action_policy(
-                current_user,
+            _granted_action_policy(
+                granted,
                 permission="maintenance_actions",
                 confirm_required=True,
                 reason_code_required=True,
@@ -280,8 +374,8 @@ def _session_action_policies(
             disabled_reason="Blocked-lost visits stay in recovery mode until reissue, cancel-lost, or service close." if is_blocked_lost else "Only active sessions can be force-unlocked.",
         ),
         reconcile=_contextualize_policy(
-            _action_policy(
-                current_user,
+            _granted_action_policy(
+                granted,
                 permission="maintenance_actions",
                 confirm_required=True,
                 reason_code_required=True,
@@ -290,8 +384,8 @@ def _session_action_policies(
             disabled_reason="Blocked-lost visits stay in recovery mode until reissue, cancel-lost, or service close." if is_blocked_lost else "Manual reconcile is only available for active sessions.",
         ),
         mark_lost_card=_contextualize_policy(
-            _action_policy(
-                current_user,
+            _granted_action_policy(
+                granted,
                 permission="cards_reissue_manage",
                 confirm_required=True,
                 reason_code_required=True,
@@ -311,42 +405,61 @@ def _card_guest_action_policies(
 ) -> schemas.CardGuestActionPolicySet:
     outcome = str(base_resolution.get("lookup_outcome") or "")
     allowed_next_actions = set(base_resolution.get("allowed_next_actions") or [])
-    has_lookup_uid = bool(base_resolution.get("card_uid"))
-    has_visit_context = outcome in {"active_visit", "active_blocked_lost_card"} or bool((base_resolution.get("lost_card") or {}).get("visit_id"))
+    return _compiled_card_guest_action_policies(
+        _permissions(current_user),
+        has_guest=guest is not None,
+        can_mark_lost="mark_lost" in allowed_next_actions,
+        is_lost_card=outcome == "lost_card",
+        can_reissue="reissue_card_for_visit" in allowed_next_actions,
+        has_lookup_uid=bool(base_resolution.get("card_uid")),
+        has_visit_context=outcome in {"active_visit", "active_blocked_lost_card"} or bool((base_resolution.get("lost_card") or {}).get("visit_id")),
+    )
+
 
+@lru_cache(maxsize=256)
+def _compiled_card_guest_action_policies(
+    granted: frozenset[str],
+    *,
+    has_guest: bool,
+    can_mark_lost: bool,
+    is_lost_card: bool,
+    can_reissue: bool,
+    has_lookup_uid: bool,
+    has_visit_context: bool,
+) -> schemas.CardGuestActionPolicySet:
     return schemas.CardGuestActionPolicySet(
         top_up=_contextualize_policy(
-            _action_policy(current_user, permission="cards_top_up"),
-            allowed=guest is not None,
+            _granted_action_policy(granted, permission="cards_top_up"),
+            allowed=has_guest,
             disabled_reason="Guest context is required to top up balance.",
         ),
         toggle_block=_contextualize_policy(
-            _action_policy(current_user, permission="cards_block_manage", confirm_required=True),
-            allowed=guest is not None,
+            _granted_action_policy(granted, permission="cards_block_manage", confirm_required=True),
+            allowed=has_guest,
             disabled_reason="Guest context is required to change the active status.",
         ),
         mark_lost=_contextualize_policy(
-            _action_policy(current_user, permission="cards_reissue_manage", confirm_required=True),
-            allowed="mark_lost" in allowed_next_actions,
+            _granted_action_policy(granted, permission="cards_reissue_manage", confirm_required=True),
+            allowed=can_mark_lost,
             disabled_reason="Only an active visit with an assigned card can be marked as lost.",
         ),
         restore_lost=_contextualize_policy(
-            _action_policy(current_user, permission="cards_reissue_manage", confirm_required=True),
-            allowed=outcome == "lost_card",
+            _granted_action_policy(granted, permission="cards_reissue_manage", confirm_required=True),
+            allowed=is_lost_card,
             disabled_reason="Only inventory-lost cards outside blocked active visits can be restored.",
         ),
         reissue=_contextualize_policy(
-            _action_policy(current_user, permission="cards_reissue_manage"),
-            allowed="reissue_card_for_visit" in allowed_next_actions,
+            _granted_action_policy(granted, permission="cards_reissue_manage"),
+            allowed=can_reissue,
             disabled_reason="Reissue is only available for blocked-lost active visits.",
         ),
         open_history=_contextualize_policy(
-            _action_policy(current_user, permission="cards_history_view"),
+            _granted_action_policy(granted, permission="cards_history_view"),
             allowed=has_lookup_uid,
             disabled_reason="Card UID is required to open history.",
         ),
         open_visit=_contextualize_policy(
-            _action_policy(current_user, permission="cards_open_active_session"),
+            _granted_action_policy(granted, permission="cards_open_active_session"),
             allowed=has_visit_context,
             disabled_reason="There is no active visit or visit-linked recovery context for this card.",
         ),
@@ -991,14 +1104,7 @@ def _recent_pours_for_lookup(db: Session, *, guest: models.Guest | None, card_ui
             joinedload(models.Pour.tap),
             joinedload(models.Pour.keg).joinedload(models.Keg.beverage),
         )
-        .order_by(
-            func.coalesce(
-                models.Pour.synced_at,
-                models.Pour.reconciled_at,
-                models.Pour.poured_at,
-                models.Pour.created_at,
-            ).desc()
-        )
+        .order_by(models.Pour.effective_at.desc())
     )
     if guest is not None:
         query = query.filter(models.Pour.guest_id == guest.guest_id)
@@ -1231,52 +1337,188 @@ def _resolve_operator_period(
 
 
 def _apply_date_range(query, column, resolved_from: date | None, resolved_to: date | None):
-    if resolved_from is not None:
-        query = query.filter(func.date(column) >= resolved_from)
-    if resolved_to is not None:
-        query = query.filter(func.date(column) <= resolved_to)
-    return query
+    start = datetime.combine(resolved_from, time.min, tzinfo=timezone.utc) if resolved_from is not None else None
+    end = datetime.combine(resolved_to + timedelta(days=1), time.min, tzinfo=timezone.utc) if resolved_to is not None else None
+    return query.filter(
+        *rollup_crud.timestamp_window_filters(query.session.get_bind(), column, start, end, end_inclusive=False)
+    )
 
 
-def _load_visit_detail_map(db: Session, visit_ids: set[UUID]) -> dict[UUID, schemas.OperatorSessionDetailModel]:
-    details: dict[UUID, schemas.OperatorSessionDetailModel] = {}
-    for visit_id in visit_ids:
-        try:
-            details[visit_id] = get_operator_session_detail(db=db, visit_id=visit_id, current_user=None)
-        except HTTPException:
+def _encode_operator_pour_cursor(sort_key: tuple[datetime, str]) -> str:
+    journal_at, pour_ref = sort_key
+    raw = json.dumps({"at": journal_at.isoformat(), "ref": pour_ref}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_operator_pour_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        journal_at = _as_utc(datetime.fromisoformat(str(data["at"])))
+        pour_ref = str(data["ref"])
+    except (TypeError, ValueError, KeyError, UnicodeError, binascii.Error):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid pour journal cursor")
+    return journal_at, pour_ref
+
+
+def _operator_pour_sort_key(entry: tuple[tuple[datetime, str], schemas.OperatorPourJournalItem]) -> tuple[datetime, str]:
+    return entry[0]
+
+
+def _iter_operator_pour_source(query, timestamp_column, build_items, *, before: tuple[datetime, str] | None):
+    """Yield ``(sort_key, item)`` pairs of one source newest-first, strictly after ``before`` in journal order.
+
+    The sort key is ``(timestamp_column, pour_ref)``: the journal is ordered and
+    paged by the column the query filters on, while the item keeps showing the
+    moment the pour actually happened. Rows are read in keyset batches; items
+    sharing the timestamp of the last row in a batch are held back until the
+    next batch so that ties are always emitted in key order.
+    """
+    upper_key = before
+    bound_at = before[0] if before is not None else None
+    batch_size = OPERATOR_POUR_SOURCE_BATCH
+    timestamp_key = timestamp_column.key
+    while True:
+        batch_query = query if bound_at is None else query.filter(timestamp_column <= bound_at)
+        rows = batch_query.order_by(timestamp_column.desc()).limit(batch_size).all()
+        entries = sorted(
+            (
+                ((_as_utc(getattr(row, timestamp_key)), item.pour_ref), item)
+                for row, item in zip(rows, build_items(rows))
+            ),
+            key=_operator_pour_sort_key,
+            reverse=True,
+        )
+        exhausted = len(rows) < batch_size
+        boundary_at = None if exhausted or not entries else entries[-1][0][0]
+        ready = [
+            entry for entry in entries
+            if (upper_key is None or entry[0] < upper_key)
+            and (boundary_at is None or entry[0][0] > boundary_at)
+        ]
+        if not exhausted and not ready:
+            batch_size *= 2
             continue
-    return details
+        yield from ready
+        if exhausted:
+            return
+        upper_key = ready[-1][0]
+        bound_at = boundary_at
 
 
-def _match_visit_for_card_event(
-    db: Session,
-    *,
-    card_uid: str | None,
-    short_id: str | None,
-    occurred_at: datetime | None,
-) -> models.Visit | None:
-    query = db.query(models.Visit).options(joinedload(models.Visit.guest))
-    if card_uid:
-        query = query.filter(models.Visit.card_uid == card_uid)
-    elif short_id:
-        query = query.join(models.Pour, models.Pour.visit_id == models.Visit.visit_id).filter(models.Pour.short_id == short_id)
-    else:
+def _flow_occurred_at(flow: models.NonSaleFlow) -> datetime:
+    return (
+        _as_utc(flow.finalized_at)
+        or _as_utc(flow.last_seen_at)
+        or _as_utc(flow.started_at)
+        or _as_utc(flow.created_at)
+        or _utcnow()
+    )
+
+
+def _match_visits_for_flows(db: Session, flows: list[models.NonSaleFlow]) -> dict[UUID, models.Visit | None]:
+    occurred_at_by_flow = {flow.non_sale_flow_id: _flow_occurred_at(flow) for flow in flows}
+    if not flows:
+        return {}
+    earliest = min(occurred_at_by_flow.values())
+    latest = max(occurred_at_by_flow.values())
+
+    def _visits_query():
+        return (
+            db.query(models.Visit)
+            .options(joinedload(models.Visit.guest))
+            .filter(models.Visit.opened_at <= latest)
+            .filter(or_(models.Visit.closed_at.is_(None), models.Visit.closed_at >= earliest))
+        )
+
+    card_uids = {flow.card_uid for flow in flows if flow.card_uid}
+    visits_by_card_uid: dict[str, list[models.Visit]] = defaultdict(list)
+    if card_uids:
+        for visit in _visits_query().filter(models.Visit.card_uid.in_(card_uids)).all():
+            visits_by_card_uid[visit.card_uid].append(visit)
+
+    short_ids = {flow.short_id for flow in flows if not flow.card_uid and flow.short_id}
+    visits_by_short_id: dict[str, list[models.Visit]] = defaultdict(list)
+    if short_ids:
+        rows = (
+            _visits_query()
+            .join(models.Pour, models.Pour.visit_id == models.Visit.visit_id)
+            .filter(models.Pour.short_id.in_(short_ids))
+            .with_entities(models.Visit, models.Pour.short_id)
+            .all()
+        )
+        for visit, short_id in rows:
+            visits_by_short_id[short_id].append(visit)
+
+    matches: dict[UUID, models.Visit | None] = {}
+    for flow in flows:
+        occurred_at = occurred_at_by_flow[flow.non_sale_flow_id]
+        if flow.card_uid:
+            candidates = visits_by_card_uid.get(flow.card_uid, [])
+        elif flow.short_id:
+            candidates = visits_by_short_id.get(flow.short_id, [])
+        else:
+            candidates = []
+        eligible = [
+            visit for visit in candidates
+            if _as_utc(visit.opened_at) <= occurred_at
+            and (visit.closed_at is None or _as_utc(visit.closed_at) >= occurred_at)
+        ]
+        eligible.sort(key=lambda visit: _as_utc(visit.opened_at), reverse=True)
+        eligible.sort(key=lambda visit: visit.status)
+        matches[flow.non_sale_flow_id] = eligible[0] if eligible else None
+    return matches
+
+
+def _denied_log_visit_id(log: models.AuditLog, details: dict) -> UUID | None:
+    visit_id = details.get("visit_id") or log.target_id
+    if not visit_id:
+        return None
+    try:
+        return UUID(str(visit_id))
+    except (TypeError, ValueError):
         return None
 
-    if occurred_at is not None:
-        query = query.filter(models.Visit.opened_at <= occurred_at)
-        query = query.filter(or_(models.Visit.closed_at.is_(None), models.Visit.closed_at >= occurred_at))
 
-    return query.order_by(
-        models.Visit.status.asc(),
-        models.Visit.opened_at.desc(),
-    ).first()
+def _denied_log_tap_id(details: dict) -> int | None:
+    tap_id_value = details.get("tap_id") or details.get("requested_tap_id")
+    return int(tap_id_value) if tap_id_value not in {None, ""} else None
+
+
+def _load_denied_log_context(
+    db: Session,
+    logs: list[models.AuditLog],
+) -> tuple[dict[UUID, models.Visit], dict[int, models.Tap]]:
+    visit_ids = set()
+    tap_ids = set()
+    for log in logs:
+        details = _safe_details(log.details)
+        visit_id = _denied_log_visit_id(log, details)
+        if visit_id is not None:
+            visit_ids.add(visit_id)
+        tap_id = _denied_log_tap_id(details)
+        if tap_id is not None:
+            tap_ids.add(tap_id)
+
+    visits_by_id = {}
+    if visit_ids:
+        visits_by_id = {
+            visit.visit_id: visit
+            for visit in db.query(models.Visit).options(joinedload(models.Visit.guest)).filter(models.Visit.visit_id.in_(visit_ids)).all()
+        }
+    taps_by_id = {}
+    if tap_ids:
+        taps_by_id = {
+            tap.tap_id: tap
+            for tap in db.query(models.Tap).options(joinedload(models.Tap.keg).joinedload(models.Keg.beverage)).filter(models.Tap.tap_id.in_(tap_ids)).all()
+        }
+    return visits_by_id, taps_by_id
 
 
 def _operator_pour_item_from_pour(
     pour: models.Pour,
     *,
-    visit_detail: schemas.OperatorSessionDetailModel | None = None,
+    visit_summary: schemas.OperatorSessionJournalItem | None = None,
 ) -> schemas.OperatorPourJournalItem:
     guest = pour.guest or (pour.visit.guest if pour.visit and pour.visit.guest else None)
     visit = pour.visit
@@ -1310,12 +1552,12 @@ def _operator_pour_item_from_pour(
         has_problem = True
         completion_reason = completion_reason or "sync_rejected"
 
-    if visit_detail is not None and status_value == "completed":
-        normalized_completion = _normalized_text(visit_detail.summary.completion_source)
+    if visit_summary is not None and status_value == "completed":
+        normalized_completion = _normalized_text(visit_summary.completion_source)
         if normalized_completion == "denied":
             status_value = "denied"
             has_problem = True
-            completion_reason = visit_detail.summary.completion_source
+            completion_reason = visit_summary.completion_source
 
     return schemas.OperatorPourJournalItem(
         pour_ref=_operator_pour_ref("pour", pour.pour_id),
@@ -1343,11 +1585,11 @@ def _operator_pour_item_from_pour(
 
 
 def _operator_pour_item_from_flow(
-    db: Session,
     flow: models.NonSaleFlow,
+    *,
+    matched_visit: models.Visit | None = None,
 ) -> schemas.OperatorPourJournalItem:
-    occurred_at = _as_utc(flow.finalized_at) or _as_utc(flow.last_seen_at) or _as_utc(flow.started_at) or _as_utc(flow.created_at) or _utcnow()
-    matched_visit = _match_visit_for_card_event(db, card_uid=flow.card_uid, short_id=flow.short_id, occurred_at=occurred_at)
+    occurred_at = _flow_occurred_at(flow)
     guest = matched_visit.guest if matched_visit is not None else None
     sync_state = "accounted" if int(flow.accounted_volume_ml or 0) >= int(flow.volume_ml or 0) else "pending_sync"
     return schemas.OperatorPourJournalItem(
@@ -1375,26 +1617,13 @@ def _operator_pour_item_from_flow(
 
 
 def _operator_pour_item_from_denied_log(
-    db: Session,
     log: models.AuditLog,
+    *,
+    visit: models.Visit | None = None,
+    tap: models.Tap | None = None,
 ) -> schemas.OperatorPourJournalItem:
     details = _safe_details(log.details)
-    visit = None
-    visit_id = details.get("visit_id") or log.target_id
-    if visit_id:
-        try:
-            visit = (
-                db.query(models.Visit)
-                .options(joinedload(models.Visit.guest))
-                .filter(models.Visit.visit_id == UUID(str(visit_id)))
-                .first()
-            )
-        except (TypeError, ValueError):
-            visit = None
-
-    tap_id_value = details.get("tap_id") or details.get("requested_tap_id")
-    tap_id = int(tap_id_value) if tap_id_value not in {None, ""} else None
-    tap = db.query(models.Tap).options(joinedload(models.Tap.keg).joinedload(models.Keg.beverage)).filter(models.Tap.tap_id == tap_id).first() if tap_id is not None else None
+    tap_id = _denied_log_tap_id(details)
     guest = visit.guest if visit is not None else None
     completion_reason = "insufficient_funds" if log.action == "insufficient_funds_denied" else log.action
     return schemas.OperatorPourJournalItem(
@@ -1420,72 +1649,147 @@ def _operator_pour_item_from_denied_log(
     )
 
 
-def _filter_operator_pour_items(
-    items: list[schemas.OperatorPourJournalItem],
+def _operator_pour_item_matches(
+    item: schemas.OperatorPourJournalItem,
     *,
     filters: schemas.OperatorPourJournalFilterParams,
-) -> list[schemas.OperatorPourJournalItem]:
-    result = items
-    if filters.guest_query:
-        result = [
-            item for item in result
-            if _matches_operator_search_text(
-                filters.guest_query,
-                item.guest_full_name,
-                item.card_uid,
-                item.short_id,
-                item.visit_id,
-                item.pour_id,
-            )
-        ]
-    if filters.status:
-        normalized_status = _normalized_text(filters.status)
-        result = [item for item in result if _normalized_text(item.status) == normalized_status]
-    if filters.problem_only:
-        result = [item for item in result if item.has_problem]
-    if filters.non_sale_only:
-        result = [item for item in result if item.sale_kind == "non_sale"]
-    if filters.zero_volume_only:
-        result = [item for item in result if item.status == "zero_volume"]
-    if filters.timeout_only:
-        result = [item for item in result if item.status == "timeout"]
-    if filters.denied_only:
-        result = [item for item in result if item.status == "denied"]
-    if filters.sale_mode == "sale":
-        result = [item for item in result if item.sale_kind == "sale"]
-    elif filters.sale_mode == "non_sale":
-        result = [item for item in result if item.sale_kind == "non_sale"]
-    return result
+) -> bool:
+    if filters.tap_id is not None and item.tap_id != filters.tap_id:
+        return False
+    if filters.visit_id is not None and item.visit_id != filters.visit_id:
+        return False
+    if filters.guest_query and not _matches_operator_search_text(
+        filters.guest_query,
+        item.guest_full_name,
+        item.card_uid,
+        item.short_id,
+        item.visit_id,
+        item.pour_id,
+    ):
+        return False
+    if filters.status and _normalized_text(item.status) != _normalized_text(filters.status):
+        return False
+    if filters.problem_only and not item.has_problem:
+        return False
+    if filters.non_sale_only and item.sale_kind != "non_sale":
+        return False
+    if filters.zero_volume_only and item.status != "zero_volume":
+        return False
+    if filters.timeout_only and item.status != "timeout":
+        return False
+    if filters.denied_only and item.status != "denied":
+        return False
+    if filters.sale_mode in {"sale", "non_sale"} and item.sale_kind != filters.sale_mode:
+        return False
+    return True
+
+
+def _operator_pour_sources(filters: schemas.OperatorPourJournalFilterParams) -> set[str]:
+    """Drop journal sources whose items can never pass the requested filters."""
+    sources = {"pour", "non_sale_flow", "denied"}
+    normalized_status = _normalized_text(filters.status)
+    if filters.sale_mode == "sale" or filters.zero_volume_only or filters.timeout_only or filters.denied_only:
+        sources.discard("non_sale_flow")
+    if normalized_status and normalized_status != "non_sale":
+        sources.discard("non_sale_flow")
+    if filters.sale_mode == "non_sale" or filters.non_sale_only or filters.zero_volume_only or filters.timeout_only:
+        sources.discard("denied")
+    if normalized_status and normalized_status != "denied":
+        sources.discard("denied")
+    return sources
 
 
 def _operator_pour_action_policies(
     current_user: dict | None,
     summary: schemas.OperatorPourJournalItem,
+) -> schemas.OperatorPourActionPolicySet:
+    return _compiled_operator_pour_action_policies(
+        _permissions(current_user),
+        has_visit=summary.visit_id is not None,
+        has_guest_context=summary.guest_id is not None or bool(summary.card_uid),
+        has_tap=summary.tap_id is not None,
+        can_reconcile=summary.source_kind == "pour" and summary.visit_id is not None and summary.sync_state in {"pending_sync", "rejected"},
+    )
+
+
+@lru_cache(maxsize=256)
+def _compiled_operator_pour_action_policies(
+    granted: frozenset[str],
+    *,
+    has_visit: bool,
+    has_guest_context: bool,
+    has_tap: bool,
+    can_reconcile: bool,
 ) -> schemas.OperatorPourActionPolicySet:
     return schemas.OperatorPourActionPolicySet(
         open_visit=_contextualize_policy(
-            _action_policy(current_user, permission="sessions_view"),
-            allowed=summary.visit_id is not None,
+            _granted_action_policy(granted, permission="sessions_view"),
+            allowed=has_visit,
             disabled_reason="Visit context is not available for this pour.",
         ),
         open_guest=_contextualize_policy(
-            _action_policy(current_user, permission="cards_lookup"),
-            allowed=summary.guest_id is not None or bool(summary.card_uid),
+            _granted_action_policy(granted, permission="cards_lookup"),
+            allowed=has_guest_context,
             disabled_reason="Guest or card context is not available for this pour.",
         ),
         open_tap=_contextualize_policy(
-            _action_policy(current_user, permission="taps_view"),
-            allowed=summary.tap_id is not None,
+            _granted_action_policy(granted, permission="taps_view"),
+            allowed=has_tap,
             disabled_reason="Tap context is not available for this pour.",
         ),
         reconcile=_contextualize_policy(
-            _action_policy(current_user, permission="maintenance_actions", confirm_required=True, reason_code_required=True),
-            allowed=summary.source_kind == "pour" and summary.visit_id is not None and summary.sync_state in {"pending_sync", "rejected"},
+            _granted_action_policy(granted, permission="maintenance_actions", confirm_required=True, reason_code_required=True),
+            allowed=can_reconcile,
             disabled_reason="Manual reconcile is only available for sale pours waiting for sync review.",
         ),
     )
 
 
+def _operator_pour_items_from_pours(
+    db: Session,
+    pours: list[models.Pour],
+    *,
+    visit_summaries: dict[UUID, schemas.OperatorSessionJournalItem],
+) -> list[schemas.OperatorPourJournalItem]:
+    pending_visits = {
+        pour.visit_id: pour.visit
+        for pour in pours
+        if pour.visit is not None and pour.visit_id not in visit_summaries
+    }
+    visits = list(pending_visits.values())
+    for visit, summary in zip(visits, visit_crud._build_session_history_items(db, visits)):
+        visit_summaries[visit.visit_id] = _to_operator_session_item(summary)
+    return [
+        _operator_pour_item_from_pour(pour, visit_summary=visit_summaries.get(pour.visit_id))
+        for pour in pours
+    ]
+
+
+def _operator_pour_items_from_flows(db: Session, flows: list[models.NonSaleFlow]) -> list[schemas.OperatorPourJournalItem]:
+    matches = _match_visits_for_flows(db, flows)
+    return [
+        _operator_pour_item_from_flow(flow, matched_visit=matches.get(flow.non_sale_flow_id))
+        for flow in flows
+    ]
+
+
+def _operator_pour_items_from_denied_logs(db: Session, logs: list[models.AuditLog]) -> list[schemas.OperatorPourJournalItem]:
+    visits_by_id, taps_by_id = _load_denied_log_context(db, logs)
+    items = []
+    for log in logs:
+        details = _safe_details(log.details)
+        visit_id = _denied_log_visit_id(log, details)
+        tap_id = _denied_log_tap_id(details)
+        items.append(
+            _operator_pour_item_from_denied_log(
+                log,
+                visit=visits_by_id.get(visit_id) if visit_id is not None else None,
+                tap=taps_by_id.get(tap_id) if tap_id is not None else None,
+            )
+        )
+    return items
+
+
 def get_operator_pours(
     db: Session,
     *,
@@ -1498,91 +1802,87 @@ def get_operator_pours(
         date_from=filters.date_from,
         date_to=filters.date_to,
     )
+    before = _decode_operator_pour_cursor(filters.cursor) if filters.cursor else None
+    sources = _operator_pour_sources(filters)
+    streams = []
 
-    pour_query = (
-        db.query(models.Pour)
-        .options(
-            joinedload(models.Pour.guest),
-            joinedload(models.Pour.tap).joinedload(models.Tap.keg).joinedload(models.Keg.beverage),
-            joinedload(models.Pour.keg).joinedload(models.Keg.beverage),
-            joinedload(models.Pour.visit).joinedload(models.Visit.guest),
-        )
-    )
-    pour_query = _apply_date_range(
-        pour_query,
-        func.coalesce(models.Pour.authorized_at, models.Pour.poured_at, models.Pour.created_at),
-        resolved_from,
-        resolved_to,
-    )
-    if filters.tap_id is not None:
-        pour_query = pour_query.filter(models.Pour.tap_id == filters.tap_id)
-    if filters.visit_id is not None:
-        pour_query = pour_query.filter(models.Pour.visit_id == filters.visit_id)
-    if filters.guest_query:
-        pattern = f"%{filters.guest_query.strip().lower()}%"
-        pour_query = pour_query.join(models.Guest, models.Pour.guest_id == models.Guest.guest_id).filter(
-            or_(
-                func.lower(models.Guest.last_name).like(pattern),
-                func.lower(models.Guest.first_name).like(pattern),
-                func.lower(models.Guest.patronymic).like(pattern),
-                func.lower(models.Guest.phone_number).like(pattern),
-                func.lower(models.Pour.card_uid).like(pattern),
-                func.lower(func.coalesce(models.Pour.short_id, "")).like(pattern),
-                cast(models.Pour.visit_id, String).ilike(pattern),
+    if "pour" in sources:
+        pour_journal_at = models.Pour.effective_at
+        pour_query = (
+            db.query(models.Pour)
+            .options(
+                joinedload(models.Pour.guest),
+                joinedload(models.Pour.tap),
+                joinedload(models.Pour.keg).joinedload(models.Keg.beverage),
+                joinedload(models.Pour.visit).joinedload(models.Visit.guest),
             )
         )
-    pours = (
-        pour_query
-        .order_by(func.coalesce(models.Pour.authorized_at, models.Pour.poured_at, models.Pour.created_at).desc())
-        .limit(250)
-        .all()
-    )
-
-    visit_detail_map = _load_visit_detail_map(db, {pour.visit_id for pour in pours if pour.visit_id is not None})
-    items = [
-        _operator_pour_item_from_pour(
-            pour,
-            visit_detail=visit_detail_map.get(pour.visit_id) if pour.visit_id is not None else None,
+        pour_query = _apply_date_range(pour_query, pour_journal_at, resolved_from, resolved_to)
+        if filters.tap_id is not None:
+            pour_query = pour_query.filter(models.Pour.tap_id == filters.tap_id)
+        if filters.visit_id is not None:
+            pour_query = pour_query.filter(models.Pour.visit_id == filters.visit_id)
+        if filters.zero_volume_only or filters.timeout_only:
+            pour_query = pour_query.filter(models.Pour.volume_ml <= 0)
+        if filters.non_sale_only or filters.sale_mode == "non_sale":
+            pour_query = pour_query.filter(models.Pour.amount_charged <= 0, models.Pour.volume_ml > 0)
+        if filters.guest_query:
+            pour_query = pour_query.filter(_pour_search_clause(_search_pattern(filters.guest_query)))
+        visit_summaries: dict[UUID, schemas.OperatorSessionJournalItem] = {}
+        streams.append(
+            _iter_operator_pour_source(
+                pour_query,
+                pour_journal_at,
+                lambda rows: _operator_pour_items_from_pours(db, rows, visit_summaries=visit_summaries),
+                before=before,
+            )
         )
-        for pour in pours
-    ]
 
-    if filters.sale_mode != "sale" or filters.non_sale_only:
+    if "non_sale_flow" in sources:
+        flow_journal_at = models.NonSaleFlow.effective_at
         flow_query = (
             db.query(models.NonSaleFlow)
             .options(
-                joinedload(models.NonSaleFlow.tap).joinedload(models.Tap.keg).joinedload(models.Keg.beverage),
+                joinedload(models.NonSaleFlow.tap),
                 joinedload(models.NonSaleFlow.keg).joinedload(models.Keg.beverage),
             )
         )
-        flow_query = _apply_date_range(
-            flow_query,
-            func.coalesce(models.NonSaleFlow.finalized_at, models.NonSaleFlow.last_seen_at, models.NonSaleFlow.created_at),
-            resolved_from,
-            resolved_to,
-        )
+        flow_query = _apply_date_range(flow_query, flow_journal_at, resolved_from, resolved_to)
         if filters.tap_id is not None:
             flow_query = flow_query.filter(models.NonSaleFlow.tap_id == filters.tap_id)
-        flows = (
-            flow_query
-            .order_by(func.coalesce(models.NonSaleFlow.finalized_at, models.NonSaleFlow.last_seen_at, models.NonSaleFlow.created_at).desc())
-            .limit(150)
-            .all()
+        streams.append(
+            _iter_operator_pour_source(
+                flow_query,
+                flow_journal_at,
+                lambda rows: _operator_pour_items_from_flows(db, rows),
+                before=before,
+            )
         )
-        items.extend(_operator_pour_item_from_flow(db, flow) for flow in flows)
 
-    if filters.sale_mode != "non_sale" and not filters.non_sale_only:
+    if "denied" in sources:
         denied_logs_query = (
             db.query(models.AuditLog)
             .filter(models.AuditLog.target_entity == "Visit")
             .filter(models.AuditLog.action.in_(("insufficient_funds_denied", "card_in_use_on_other_tap")))
         )
         denied_logs_query = _apply_date_range(denied_logs_query, models.AuditLog.timestamp, resolved_from, resolved_to)
-        denied_logs = denied_logs_query.order_by(models.AuditLog.timestamp.desc()).limit(150).all()
-        items.extend(_operator_pour_item_from_denied_log(db, log) for log in denied_logs)
+        if filters.visit_id is not None:
+            denied_logs_query = denied_logs_query.filter(models.AuditLog.target_id == str(filters.visit_id))
+        streams.append(
+            _iter_operator_pour_source(
+                denied_logs_query,
+                models.AuditLog.timestamp,
+                lambda rows: _operator_pour_items_from_denied_logs(db, rows),
+                before=before,
+            )
+        )
 
-    items = _filter_operator_pour_items(items, filters=filters)
-    items.sort(key=lambda item: -int((_as_utc(item.occurred_at) or _utcnow()).timestamp()))
+    merged = heapq.merge(*streams, key=_operator_pour_sort_key, reverse=True)
+    matching = (entry for entry in merged if _operator_pour_item_matches(entry[1], filters=filters))
+    entries = list(islice(matching, filters.limit + 1))
+    has_more = len(entries) > filters.limit
+    entries = entries[:filters.limit]
+    items = [item for _, item in entries]
 
     header = schemas.OperatorPourJournalHeader(
         total_pours=len(items),
@@ -1605,6 +1905,8 @@ def get_operator_pours(
         applied_filters=applied_filters,
         header=header,
         items=items,
+        has_more=has_more,
+        next_cursor=_encode_operator_pour_cursor(entries[-1][0]) if has_more else None,
     )
 
 
@@ -1649,7 +1951,7 @@ def get_operator_pour_detail(
         if pour is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pour not found")
         visit_detail = get_operator_session_detail(db=db, visit_id=pour.visit_id, current_user=current_user) if pour.visit_id is not None else None
-        summary = _operator_pour_item_from_pour(pour, visit_detail=visit_detail)
+        summary = _operator_pour_item_from_pour(pour, visit_summary=visit_detail.summary if visit_detail is not None else None)
         lifecycle = [
             schemas.OperatorPourLifecycleItem(key="authorize", label="Authorize", timestamp=_as_utc(pour.authorized_at), status="done" if pour.authorized_at else "pending", value=pour.card_uid or None),
             schemas.OperatorPourLifecycleItem(key="start", label="Start", timestamp=_as_utc(pour.started_at), status="done" if pour.started_at else ("warning" if summary.status in {"zero_volume", "timeout"} else "pending"), value=_tap_label(tap_id=pour.tap_id, tap=pour.tap)),
@@ -1669,7 +1971,7 @@ def get_operator_pour_detail(
         )
         if flow is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Non-sale flow not found")
-        summary = _operator_pour_item_from_flow(db, flow)
+        summary = _operator_pour_items_from_flows(db, [flow])[0]
         lifecycle = [
             schemas.OperatorPourLifecycleItem(key="reader", label="Card present", timestamp=summary.started_at, status="info", value="yes" if flow.card_present else "no"),
             schemas.OperatorPourLifecycleItem(key="start", label="Start", timestamp=summary.started_at, status="done" if summary.started_at else "warning", value=flow.session_state),
@@ -1681,7 +1983,7 @@ def get_operator_pour_detail(
         log = db.query(models.AuditLog).filter(models.AuditLog.log_id == UUID(entity_id)).first()
         if log is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Denied pour event not found")
-        summary = _operator_pour_item_from_denied_log(db, log)
+        summary = _operator_pour_items_from_denied_logs(db, [log])[0]
         lifecycle = [
             schemas.OperatorPourLifecycleItem(key="authorize", label="Authorize attempt", timestamp=_as_utc(log.timestamp), status="critical", value=summary.card_uid or None),
             schemas.OperatorPourLifecycleItem(key="deny", label="Denied", timestamp=_as_utc(log.timestamp), status="critical", value=summary.completion_reason),
@@ -1710,18 +2012,11 @@ def search_operator_workspace(
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="query must not be empty")
 
     resolved_limit = _resolve_operator_search_limit(limit)
-    pattern = f"%{normalized_query.lower()}%"
+    pattern = _search_pattern(normalized_query)
 
     guest_rows = (
         db.query(models.Guest)
-        .filter(
-            or_(
-                func.lower(models.Guest.last_name).like(pattern),
-                func.lower(models.Guest.first_name).like(pattern),
-                func.lower(models.Guest.patronymic).like(pattern),
-                func.lower(models.Guest.phone_number).like(pattern),
-            )
-        )
+        .filter(_guest_search_clause(pattern))
         .order_by(models.Guest.updated_at.desc(), models.Guest.created_at.desc())
         .limit(resolved_limit)
         .all()
@@ -1743,15 +2038,11 @@ def search_operator_workspace(
     visit_rows = (
         db.query(models.Visit)
         .options(joinedload(models.Visit.guest))
-        .join(models.Guest, models.Visit.guest_id == models.Guest.guest_id)
         .filter(
             or_(
-                func.lower(models.Guest.last_name).like(pattern),
-                func.lower(models.Guest.first_name).like(pattern),
-                func.lower(models.Guest.patronymic).like(pattern),
-                func.lower(models.Guest.phone_number).like(pattern),
-                func.lower(func.coalesce(models.Visit.card_uid, "")).like(pattern),
-                cast(models.Visit.visit_id, String).ilike(pattern),
+                models.Visit.guest_id.in_(_matching_guest_ids(pattern)),
+                _search_like(models.Visit.card_uid, pattern),
+                _search_like(cast(models.Visit.visit_id, String), pattern),
             )
         )
         .order_by(models.Visit.status.asc(), models.Visit.opened_at.desc())
@@ -1759,8 +2050,9 @@ def search_operator_workspace(
         .all()
     )
     visit_items: list[schemas.OperatorSearchResultItem] = []
-    for visit in visit_rows:
-        summary = _to_operator_session_item(visit_crud._build_session_history_item(db, visit, include_narrative=False))
+    visit_summaries = visit_crud._build_session_history_items(db, visit_rows)
+    for visit, visit_summary in zip(visit_rows, visit_summaries):
+        summary = _to_operator_session_item(visit_summary)
         visit_items.append(
             schemas.OperatorSearchResultItem(
                 key=f"visit:{visit.visit_id}",
@@ -1809,7 +2101,7 @@ def search_operator_workspace(
     card_rows = (
         db.query(models.Card, models.LostCard)
         .outerjoin(models.LostCard, models.LostCard.card_uid == models.Card.card_uid)
-        .filter(func.lower(models.Card.card_uid).like(pattern))
+        .filter(_search_like(models.Card.card_uid, pattern))
         .order_by(models.Card.created_at.desc())
         .limit(resolved_limit)
         .all()
@@ -1837,18 +2129,8 @@ def search_operator_workspace(
             joinedload(models.Pour.keg).joinedload(models.Keg.beverage),
             joinedload(models.Pour.visit).joinedload(models.Visit.guest),
         )
-        .join(models.Guest, models.Pour.guest_id == models.Guest.guest_id)
-        .filter(
-            or_(
-                func.lower(func.coalesce(models.Pour.short_id, "")).like(pattern),
-                func.lower(models.Pour.card_uid).like(pattern),
-                cast(models.Pour.visit_id, String).ilike(pattern),
-                func.lower(models.Guest.last_name).like(pattern),
-                func.lower(models.Guest.first_name).like(pattern),
-                func.lower(models.Guest.phone_number).like(pattern),
-            )
-        )
-        .order_by(func.coalesce(models.Pour.authorized_at, models.Pour.poured_at, models.Pour.created_at).desc())
+        .filter(_pour_search_clause(pattern))
+        .order_by(models.Pour.effective_at.desc())
         .limit(resolved_limit)
         .all()
     )
@@ -4,12 +4,12 @@ import json
 import uuid
 
 from fastapi import HTTPException, status
-from sqlalchemy import case, func
+from sqlalchemy import func
 from sqlalchemy.orm import Session, joinedload
 
 import models
 import schemas
-from crud import card_crud, controller_crud, visit_crud
+from crud import balance_ledger_crud, card_crud, controller_crud, rollup_crud, visit_crud
 from pos_adapter import get_pos_adapter
 
 
@@ -197,7 +197,7 @@ def process_pour(db: Session, pour_data: schemas.PourData):
             f"Invalid data: Card UID {normalized_card_uid} or Tap ID {pour_data.tap_id} not found or not fully configured.",
         )
 
-    guest = active_visit.guest
+    guest = balance_ledger_crud.lock_guest(db, active_visit.guest_id)
     keg = tap.keg
     beverage = keg.beverage
 
@@ -435,6 +435,15 @@ def process_pour(db: Session, pour_data: schemas.PourData):
     _clear_active_visit_lock(active_visit=active_visit, tap=tap, keg=keg)
     db.flush()
     db.refresh(pending_pour)
+    balance_ledger_crud.post_balance_entry(
+        db,
+        guest,
+        amount=-amount_to_charge,
+        kind="pour",
+        contra_account=balance_ledger_crud.CONTRA_SALES,
+        source_type="pour",
+        source_id=pending_pour.pour_id,
+    )
     get_pos_adapter().notify_pour(db=db, pour=pending_pour, guest=guest)
 
     return _result("accepted", "pending_updated_to_synced", "Pour processed successfully.")
@@ -448,15 +457,7 @@ def get_pours(db: Session, skip: int = 0, limit: int = 20):
             joinedload(models.Pour.tap),
             joinedload(models.Pour.keg).joinedload(models.Keg.beverage),
         )
-        .order_by(
-            func.coalesce(
-                models.Pour.synced_at,
-                models.Pour.reconciled_at,
-                models.Pour.authorized_at,
-                models.Pour.poured_at,
-                models.Pour.created_at,
-            ).desc()
-        )
+        .order_by(models.Pour.effective_at.desc())
         .offset(skip)
         .limit(limit)
         .all()
@@ -466,11 +467,6 @@ def get_pours(db: Session, skip: int = 0, limit: int = 20):
 FINAL_KPI_SYNC_STATUSES = ("synced", "reconciled")
 
 
-def _is_sqlite(db: Session) -> bool:
-    bind = db.get_bind()
-    return bind is not None and bind.dialect.name == "sqlite"
-
-
 def _start_of_current_day_utc() -> datetime:
     now = datetime.now(timezone.utc)
     return now.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -503,42 +499,19 @@ def get_today_summary(db: Session) -> schemas.TodaySummaryResponse:
         closed_at = None
         fallback_copy = "Смена сейчас закрыта, поэтому KPI показаны только за текущий календарный день (UTC)."
 
-    timestamp_column = func.coalesce(
-        models.Pour.synced_at,
-        models.Pour.reconciled_at,
-        models.Pour.poured_at,
-        models.Pour.created_at,
-    )
+    by_tap_totals = rollup_crud.summarize_pours_by_tap(db, start=window_start, end=window_end)
+    volume_ml = sum(item.final_volume_ml for item in by_tap_totals.values())
+    revenue = sum((item.final_amount_total for item in by_tap_totals.values()), Decimal("0.00"))
+    pending_sync_count = sum(item.pending_sync_count for item in by_tap_totals.values())
 
-    if _is_sqlite(db):
-        window_start_text = window_start.astimezone(timezone.utc).replace(tzinfo=None).strftime("%Y-%m-%d %H:%M:%S")
-        window_end_text = window_end.astimezone(timezone.utc).replace(tzinfo=None).strftime("%Y-%m-%d %H:%M:%S")
-        filters = [
-            func.strftime("%Y-%m-%d %H:%M:%S", timestamp_column) >= window_start_text,
-            func.strftime("%Y-%m-%d %H:%M:%S", timestamp_column) <= window_end_text,
-        ]
-    else:
-        filters = [timestamp_column >= window_start, timestamp_column <= window_end]
-
-    totals = (
-        db.query(
-            func.count(func.distinct(models.Pour.visit_id)).label("sessions_count"),
-            func.coalesce(func.sum(models.Pour.volume_ml), 0).label("volume_ml"),
-            func.coalesce(func.sum(models.Pour.amount_charged), 0).label("revenue"),
-            func.coalesce(
-                func.sum(case((models.Pour.sync_status == "pending_sync", 1), else_=0)),
-                0,
-            ).label("pending_sync_count"),
-        )
-        .filter(*filters)
-        .filter(models.Pour.sync_status.in_(FINAL_KPI_SYNC_STATUSES))
-        .one()
-    )
+    # Distinct visits do not add up across hourly buckets, so this stays a raw count
+    # served by the (sync_status, effective_at) index.
+    filters = rollup_crud.timestamp_window_filters(db.get_bind(), models.Pour.effective_at, window_start, window_end)
 
-    pending_sync_count = (
-        db.query(func.count(models.Pour.pour_id))
+    sessions_count = (
+        db.query(func.count(func.distinct(models.Pour.visit_id)))
         .filter(*filters)
-        .filter(models.Pour.sync_status == "pending_sync")
+        .filter(models.Pour.sync_status.in_(FINAL_KPI_SYNC_STATUSES))
         .scalar()
     )
 
@@ -554,9 +527,9 @@ def get_today_summary(db: Session) -> schemas.TodaySummaryResponse:
         opened_at=opened_at,
         closed_at=closed_at,
         generated_at=generated_at,
-        sessions_count=int(totals.sessions_count or 0),
-        volume_ml=int(totals.volume_ml or 0),
-        revenue=totals.revenue or 0,
+        sessions_count=int(sessions_count or 0),
+        volume_ml=volume_ml,
+        revenue=revenue,
     )
 
 
@@ -569,15 +542,7 @@ def get_live_feed(db: Session, limit: int = 20):
             joinedload(models.Pour.keg).joinedload(models.Keg.beverage),
         )
         .filter(models.Pour.sync_status != "pending_sync", models.Pour.volume_ml > 0)
-        .order_by(
-            func.coalesce(
-                models.Pour.synced_at,
-                models.Pour.reconciled_at,
-                models.Pour.authorized_at,
-                models.Pour.poured_at,
-                models.Pour.created_at,
-            ).desc()
-        )
+        .order_by(models.Pour.effective_at.desc())
         .limit(limit)
         .all()
     )
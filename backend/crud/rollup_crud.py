@@ -0,0 +1,399 @@
+from __future__ import annotations
+
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import String, case, event, func, inspect, select, type_coerce
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+import models
+import schemas
+
+
+ROLLUP_BUCKET = timedelta(hours=1)
+FINAL_ROLLUP_SYNC_STATUSES = ("synced", "reconciled")
+
+_PREVIOUS_CONTRIBUTIONS_KEY = "pour_rollup_previous_contributions"
+_TOUCHED_POURS_KEY = "pour_rollup_touched_pours"
+
+_pours = models.Pour.__table__
+_rollups = models.PourHourlyRollup.__table__
+
+
+@dataclass
+class PourRollupTotals:
+    pours_count: int = 0
+    volume_ml: int = 0
+    amount_total: Decimal = Decimal("0.00")
+    pending_sync_count: int = 0
+    reconciled_count: int = 0
+    final_volume_ml: int = 0
+    final_amount_total: Decimal = Decimal("0.00")
+
+    @classmethod
+    def from_row(cls, row) -> "PourRollupTotals":
+        return cls(
+            pours_count=int(row.pours_count or 0),
+            volume_ml=int(row.volume_ml or 0),
+            amount_total=_to_amount(row.amount_total),
+            pending_sync_count=int(row.pending_sync_count or 0),
+            reconciled_count=int(row.reconciled_count or 0),
+            final_volume_ml=int(row.final_volume_ml or 0),
+            final_amount_total=_to_amount(row.final_amount_total),
+        )
+
+    def add(self, other: "PourRollupTotals") -> None:
+        for field in fields(self):
+            setattr(self, field.name, getattr(self, field.name) + getattr(other, field.name))
+
+    def subtract(self, other: "PourRollupTotals") -> None:
+        for field in fields(self):
+            setattr(self, field.name, getattr(self, field.name) - getattr(other, field.name))
+
+    def as_dict(self) -> dict:
+        return {field.name: getattr(self, field.name) for field in fields(self)}
+
+
+def _to_amount(value) -> Decimal:
+    if value is None:
+        return Decimal("0.00")
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return value.quantize(Decimal("0.01"))
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def bucket_start_for(value: datetime) -> datetime:
+    return _as_utc(value).replace(minute=0, second=0, microsecond=0)
+
+
+def _next_bucket_start(value: datetime) -> datetime:
+    floored = bucket_start_for(value)
+    if floored == _as_utc(value):
+        return floored
+    return floored + ROLLUP_BUCKET
+
+
+def _is_sqlite(bind) -> bool:
+    return bind is not None and bind.dialect.name == "sqlite"
+
+
+def _sqlite_timestamp_text(value: datetime) -> str:
+    return _as_utc(value).replace(tzinfo=None, microsecond=0).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def timestamp_window_filters(
+    bind,
+    column,
+    start: datetime | None,
+    end: datetime | None = None,
+    *,
+    end_inclusive: bool = True,
+):
+    """Range filters on a timestamp column that an index on the bare column can serve."""
+    filters = []
+    if not _is_sqlite(bind):
+        if start is not None:
+            filters.append(column >= _as_utc(start))
+        if end is not None:
+            filters.append(column <= _as_utc(end) if end_inclusive else column < _as_utc(end))
+        return filters
+
+    # SQLite stores timestamps as sortable text, but func.now() values carry no
+    # microseconds. Compare whole seconds against the raw text instead of wrapping
+    # the column in strftime(), which would defeat the index.
+    text_column = type_coerce(column, String)
+    if start is not None:
+        filters.append(text_column >= _sqlite_timestamp_text(start))
+    if end is not None:
+        filters.append(text_column < _sqlite_timestamp_text(end + timedelta(seconds=1) if end_inclusive else end))
+    return filters
+
+
+def _poured_at_filters(bind, start: datetime, end: datetime, *, end_inclusive: bool):
+    return timestamp_window_filters(bind, _pours.c.poured_at, start, end, end_inclusive=end_inclusive)
+
+
+def _aggregate_columns():
+    is_final = _pours.c.sync_status.in_(FINAL_ROLLUP_SYNC_STATUSES)
+    return (
+        func.count(_pours.c.pour_id).label("pours_count"),
+        func.coalesce(func.sum(_pours.c.volume_ml), 0).label("volume_ml"),
+        func.coalesce(func.sum(_pours.c.amount_charged), 0).label("amount_total"),
+        func.coalesce(func.sum(case((_pours.c.sync_status == "pending_sync", 1), else_=0)), 0).label(
+            "pending_sync_count"
+        ),
+        func.coalesce(func.sum(case((_pours.c.sync_status == "reconciled", 1), else_=0)), 0).label(
+            "reconciled_count"
+        ),
+        func.coalesce(func.sum(case((is_final, _pours.c.volume_ml), else_=0)), 0).label("final_volume_ml"),
+        func.coalesce(func.sum(case((is_final, _pours.c.amount_charged), else_=0)), 0).label("final_amount_total"),
+    )
+
+
+def _raw_totals_by_tap(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    *,
+    end_inclusive: bool,
+) -> dict[int, PourRollupTotals]:
+    rows = db.execute(
+        select(_pours.c.tap_id, *_aggregate_columns())
+        .where(*_poured_at_filters(db.get_bind(), start, end, end_inclusive=end_inclusive))
+        .group_by(_pours.c.tap_id)
+    ).all()
+    return {int(row.tap_id): PourRollupTotals.from_row(row) for row in rows}
+
+
+def _pour_contribution(row) -> PourRollupTotals:
+    is_final = row.sync_status in FINAL_ROLLUP_SYNC_STATUSES
+    volume_ml = int(row.volume_ml or 0)
+    amount = _to_amount(row.amount_charged)
+    return PourRollupTotals(
+        pours_count=1,
+        volume_ml=volume_ml,
+        amount_total=amount,
+        pending_sync_count=int(row.sync_status == "pending_sync"),
+        reconciled_count=int(row.sync_status == "reconciled"),
+        final_volume_ml=volume_ml if is_final else 0,
+        final_amount_total=amount if is_final else Decimal("0.00"),
+    )
+
+
+def _load_pour_contributions(
+    connection: Connection,
+    pour_ids,
+    *,
+    lock: bool = False,
+) -> dict[uuid.UUID, tuple[tuple[datetime, int], PourRollupTotals]]:
+    """What each stored pour currently adds to its (bucket_start, tap_id) rollup."""
+    if not pour_ids:
+        return {}
+    query = select(
+        _pours.c.pour_id,
+        _pours.c.tap_id,
+        _pours.c.poured_at,
+        _pours.c.sync_status,
+        _pours.c.volume_ml,
+        _pours.c.amount_charged,
+    ).where(_pours.c.pour_id.in_(list(pour_ids)))
+    if lock:
+        # Старое состояние должно совпадать с тем, что перезапишет этот flush.
+        query = query.with_for_update()
+    return {
+        row.pour_id: ((bucket_start_for(row.poured_at), int(row.tap_id)), _pour_contribution(row))
+        for row in connection.execute(query).all()
+        if row.poured_at is not None
+    }
+
+
+def _rollup_insert(connection: Connection):
+    if connection.dialect.name == "postgresql":
+        return postgresql.insert(_rollups)
+    return sqlite.insert(_rollups)
+
+
+def _apply_bucket_delta(connection: Connection, bucket_start: datetime, tap_id: int, delta: PourRollupTotals) -> None:
+    # Одна атомарная команда: параллельные транзакции по тому же часу крана
+    # складывают свои приращения, а не падают на первичном ключе.
+    statement = _rollup_insert(connection).values(bucket_start=bucket_start, tap_id=tap_id, **delta.as_dict())
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=[_rollups.c.bucket_start, _rollups.c.tap_id],
+            set_={name: _rollups.c[name] + statement.excluded[name] for name in delta.as_dict()},
+        )
+    )
+
+
+def _recompute_bucket(connection: Connection, bucket_start: datetime, tap_id: int) -> None:
+    bucket_end = bucket_start + ROLLUP_BUCKET
+    row = connection.execute(
+        select(*_aggregate_columns()).where(
+            _pours.c.tap_id == tap_id,
+            *_poured_at_filters(connection, bucket_start, bucket_end, end_inclusive=False),
+        )
+    ).one()
+    totals = PourRollupTotals.from_row(row).as_dict()
+    statement = _rollup_insert(connection).values(bucket_start=bucket_start, tap_id=tap_id, **totals)
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=[_rollups.c.bucket_start, _rollups.c.tap_id],
+            set_={name: statement.excluded[name] for name in totals},
+        )
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def _capture_pour_rollup_changes(session: Session, flush_context, instances) -> None:
+    touched = [obj for obj in session.new if isinstance(obj, models.Pour)]
+    touched.extend(obj for obj in session.dirty if isinstance(obj, models.Pour) and session.is_modified(obj))
+    deleted = [obj for obj in session.deleted if isinstance(obj, models.Pour)]
+    if not touched and not deleted:
+        return
+
+    # What the rows contribute before this flush, so moved, re-priced or deleted
+    # pours are subtracted from their previous hour. Keyed by pour_id, so a
+    # repeated capture before the same flush does not subtract twice.
+    persisted_ids = [
+        inspect(obj).identity[0]
+        for obj in [*touched, *deleted]
+        if inspect(obj).identity is not None
+    ]
+    session.info.setdefault(_PREVIOUS_CONTRIBUTIONS_KEY, {}).update(
+        _load_pour_contributions(session.connection(), persisted_ids, lock=True)
+    )
+    session.info.setdefault(_TOUCHED_POURS_KEY, []).extend(touched)
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_pour_rollups(session: Session, flush_context) -> None:
+    touched = session.info.pop(_TOUCHED_POURS_KEY, [])
+    previous = session.info.pop(_PREVIOUS_CONTRIBUTIONS_KEY, {})
+    if not touched and not previous:
+        return
+
+    connection = session.connection()
+    # Identity keys are only assigned after this hook, but primary keys are already populated.
+    touched_ids = {obj.pour_id for obj in touched if obj.pour_id is not None}
+    deltas: dict[tuple[datetime, int], PourRollupTotals] = defaultdict(PourRollupTotals)
+    for bucket, totals in _load_pour_contributions(connection, touched_ids).values():
+        deltas[bucket].add(totals)
+    for bucket, totals in previous.values():
+        deltas[bucket].subtract(totals)
+
+    empty = PourRollupTotals()
+    for (bucket_start, tap_id), delta in sorted(deltas.items()):
+        if delta != empty:
+            _apply_bucket_delta(connection, bucket_start, tap_id, delta)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pour_rollup_changes(session: Session) -> None:
+    # Приращения несостоявшегося flush нельзя переносить на следующий.
+    session.info.pop(_TOUCHED_POURS_KEY, None)
+    session.info.pop(_PREVIOUS_CONTRIBUTIONS_KEY, None)
+
+
+def summarize_pours_by_tap(db: Session, *, start: datetime, end: datetime) -> dict[int, PourRollupTotals]:
+    """Per-tap pour totals for ``start <= poured_at <= end``.
+
+    Whole hours are read from ``pour_hourly_rollups``; only the partial hours at
+    both edges of the window are aggregated from raw pours.
+    """
+    start, end = _as_utc(start), _as_utc(end)
+    if end < start:
+        return {}
+
+    totals: dict[int, PourRollupTotals] = defaultdict(PourRollupTotals)
+
+    def merge(partial: dict[int, PourRollupTotals]) -> None:
+        for tap_id, item in partial.items():
+            totals[tap_id].add(item)
+
+    first_full_bucket = _next_bucket_start(start)
+    tail_bucket = bucket_start_for(end)
+    if first_full_bucket >= tail_bucket:
+        merge(_raw_totals_by_tap(db, start, end, end_inclusive=True))
+        return dict(totals)
+
+    if start < first_full_bucket:
+        merge(_raw_totals_by_tap(db, start, first_full_bucket, end_inclusive=False))
+
+    rollup_rows = db.execute(
+        select(
+            _rollups.c.tap_id,
+            func.sum(_rollups.c.pours_count).label("pours_count"),
+            func.sum(_rollups.c.volume_ml).label("volume_ml"),
+            func.sum(_rollups.c.amount_total).label("amount_total"),
+            func.sum(_rollups.c.pending_sync_count).label("pending_sync_count"),
+            func.sum(_rollups.c.reconciled_count).label("reconciled_count"),
+            func.sum(_rollups.c.final_volume_ml).label("final_volume_ml"),
+            func.sum(_rollups.c.final_amount_total).label("final_amount_total"),
+        )
+        .where(_rollups.c.bucket_start >= first_full_bucket, _rollups.c.bucket_start < tail_bucket)
+        .group_by(_rollups.c.tap_id)
+    ).all()
+    merge({int(row.tap_id): PourRollupTotals.from_row(row) for row in rollup_rows})
+
+    merge(_raw_totals_by_tap(db, tail_bucket, end, end_inclusive=True))
+    return dict(totals)
+
+
+def _raw_bucket_totals(db: Session, since: datetime | None) -> dict[tuple[datetime, int], PourRollupTotals]:
+    bind = db.get_bind()
+    if _is_sqlite(bind):
+        bucket_column = func.strftime("%Y-%m-%d %H:00:00", _pours.c.poured_at)
+    else:
+        bucket_column = func.date_trunc("hour", func.timezone("UTC", _pours.c.poured_at))
+    query = select(bucket_column.label("bucket_start"), _pours.c.tap_id, *_aggregate_columns())
+    if since is not None:
+        query = query.where(*timestamp_window_filters(bind, _pours.c.poured_at, bucket_start_for(since)))
+    rows = db.execute(query.group_by(bucket_column, _pours.c.tap_id)).all()
+
+    result = {}
+    for row in rows:
+        bucket = row.bucket_start
+        if isinstance(bucket, str):
+            bucket = datetime.strptime(bucket, "%Y-%m-%d %H:%M:%S")
+        result[(_as_utc(bucket), int(row.tap_id))] = PourRollupTotals.from_row(row)
+    return result
+
+
+def verify_pour_rollups(
+    db: Session,
+    *,
+    since: datetime | None = None,
+    repair: bool = False,
+) -> schemas.PourRollupConsistencyReport:
+    """Compare stored hourly rollups with a fresh aggregate over raw pours."""
+    expected = _raw_bucket_totals(db, since)
+
+    rollup_query = select(_rollups)
+    if since is not None:
+        rollup_query = rollup_query.where(_rollups.c.bucket_start >= bucket_start_for(since))
+    stored = {
+        (_as_utc(row.bucket_start), int(row.tap_id)): PourRollupTotals.from_row(row)
+        for row in db.execute(rollup_query).all()
+    }
+
+    mismatches: list[schemas.PourRollupMismatch] = []
+    empty = PourRollupTotals()
+    for bucket_start, tap_id in sorted(set(expected) | set(stored)):
+        expected_totals = expected.get((bucket_start, tap_id), empty)
+        stored_totals = stored.get((bucket_start, tap_id), empty)
+        for field_name, expected_value in expected_totals.as_dict().items():
+            stored_value = getattr(stored_totals, field_name)
+            if stored_value != expected_value:
+                mismatches.append(
+                    schemas.PourRollupMismatch(
+                        bucket_start=bucket_start,
+                        tap_id=tap_id,
+                        field=field_name,
+                        expected=str(expected_value),
+                        stored=str(stored_value),
+                    )
+                )
+
+    if repair and mismatches:
+        connection = db.connection()
+        for bucket_start, tap_id in sorted({(item.bucket_start, item.tap_id) for item in mismatches}):
+            _recompute_bucket(connection, bucket_start, tap_id)
+        db.commit()
+
+    return schemas.PourRollupConsistencyReport(
+        checked_buckets=len(set(expected) | set(stored)),
+        consistent=not mismatches,
+        repaired=bool(repair and mismatches),
+        mismatches=mismatches,
+    )
@@ -9,6 +9,7 @@ from sqlalchemy.orm import Session
 
 import models
 import schemas
+from crud import balance_ledger_crud, rollup_crud
 
 
 KEG_PLACEHOLDER_NOTE = "Will be added when keg<->pour linkage is implemented"
@@ -68,25 +69,8 @@ def _resolve_window_end(shift: models.Shift, generated_at: datetime) -> datetime
     return generated_at
 
 
-def _is_sqlite(db: Session) -> bool:
-    bind = db.get_bind()
-    return bind is not None and bind.dialect.name == "sqlite"
-
-
-def _sqlite_timestamp_text(value: datetime) -> str:
-    normalized = value
-    if _is_timezone_aware(normalized):
-        normalized = normalized.astimezone(timezone.utc).replace(tzinfo=None)
-    return normalized.replace(microsecond=0).strftime("%Y-%m-%d %H:%M:%S")
-
-
 def _between_window_filters(db: Session, column, start: datetime, end: datetime):
-    if _is_sqlite(db):
-        return [
-            func.strftime("%Y-%m-%d %H:%M:%S", column) >= _sqlite_timestamp_text(start),
-            func.strftime("%Y-%m-%d %H:%M:%S", column) <= _sqlite_timestamp_text(end),
-        ]
-    return [column >= start, column <= end]
+    return rollup_crud.timestamp_window_filters(db.get_bind(), column, start, end)
 
 
 def _get_mismatch_count(db: Session, shift: models.Shift, window_end: datetime) -> int:
@@ -124,40 +108,10 @@ def build_shift_report_payload(
     else:
         window_end = _resolve_window_end(shift=shift, generated_at=generated_at)
 
-    totals_row = (
-        db.query(
-            func.count(models.Pour.pour_id).label("pours_count"),
-            func.coalesce(func.sum(models.Pour.volume_ml), 0).label("total_volume_ml"),
-            func.coalesce(func.sum(models.Pour.amount_charged), 0).label("total_amount"),
-            func.coalesce(
-                func.sum(case((models.Pour.sync_status == "pending_sync", 1), else_=0)),
-                0,
-            ).label("pending_sync_count"),
-            func.coalesce(
-                func.sum(case((models.Pour.sync_status == "reconciled", 1), else_=0)),
-                0,
-            ).label("reconciled_count"),
-        )
-        .filter(*_between_window_filters(db, models.Pour.poured_at, shift.opened_at, window_end))
-        .one()
-    )
-
-    by_tap_rows = (
-        db.query(
-            models.Pour.tap_id.label("tap_id"),
-            func.count(models.Pour.pour_id).label("pours_count"),
-            func.coalesce(func.sum(models.Pour.volume_ml), 0).label("volume_ml"),
-            func.coalesce(func.sum(models.Pour.amount_charged), 0).label("amount_total"),
-            func.coalesce(
-                func.sum(case((models.Pour.sync_status == "pending_sync", 1), else_=0)),
-                0,
-            ).label("pending_sync_count"),
-        )
-        .filter(*_between_window_filters(db, models.Pour.poured_at, shift.opened_at, window_end))
-        .group_by(models.Pour.tap_id)
-        .order_by(models.Pour.tap_id.asc())
-        .all()
-    )
+    by_tap_totals = rollup_crud.summarize_pours_by_tap(db, start=shift.opened_at, end=window_end)
+    totals = rollup_crud.PourRollupTotals()
+    for tap_totals in by_tap_totals.values():
+        totals.add(tap_totals)
 
     visits_row = (
         db.query(
@@ -173,6 +127,7 @@ def build_shift_report_payload(
     )
 
     mismatch_count = _get_mismatch_count(db=db, shift=shift, window_end=window_end)
+    ledger_totals = balance_ledger_crud.sum_entries_by_kind(db, start=shift.opened_at, end=window_end)
     new_guests_count = _get_new_guests_count(db=db, shift=shift, window_end=window_end)
 
     payload = schemas.ShiftReportPayload(
@@ -184,23 +139,25 @@ def build_shift_report_payload(
             closed_at=shift.closed_at,
         ),
         totals=schemas.ShiftReportTotals(
-            pours_count=int(totals_row.pours_count or 0),
-            total_volume_ml=int(totals_row.total_volume_ml or 0),
-            total_amount_cents=_amount_to_cents(totals_row.total_amount),
+            pours_count=totals.pours_count,
+            total_volume_ml=totals.volume_ml,
+            total_amount_cents=_amount_to_cents(totals.amount_total),
             new_guests_count=new_guests_count,
-            pending_sync_count=int(totals_row.pending_sync_count or 0),
-            reconciled_count=int(totals_row.reconciled_count or 0),
+            pending_sync_count=totals.pending_sync_count,
+            reconciled_count=totals.reconciled_count,
             mismatch_count=mismatch_count,
+            topup_amount_cents=_amount_to_cents(ledger_totals.get("top-up")),
+            refund_amount_cents=_amount_to_cents(-ledger_totals.get("refund", Decimal("0.00"))),
         ),
         by_tap=[
             schemas.ShiftReportByTapItem(
-                tap_id=int(row.tap_id),
-                pours_count=int(row.pours_count or 0),
-                volume_ml=int(row.volume_ml or 0),
-                amount_cents=_amount_to_cents(row.amount_total),
-                pending_sync_count=int(row.pending_sync_count or 0),
+                tap_id=tap_id,
+                pours_count=tap_totals.pours_count,
+                volume_ml=tap_totals.volume_ml,
+                amount_cents=_amount_to_cents(tap_totals.amount_total),
+                pending_sync_count=tap_totals.pending_sync_count,
             )
-            for row in by_tap_rows
+            for tap_id, tap_totals in sorted(by_tap_totals.items())
         ],
         visits=schemas.ShiftReportVisits(
             active_visits_count=int(visits_row.active_visits_count or 0),
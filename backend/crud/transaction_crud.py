@@ -5,12 +5,12 @@ from sqlalchemy.orm import Session
 
 import models
 import schemas
-from crud import guest_crud, visit_crud
+from crud import balance_ledger_crud, visit_crud
 from pos_adapter import get_pos_adapter
 
 
 def create_topup_transaction(db: Session, guest_id: uuid.UUID, topup_data: schemas.TopUpRequest):
-    db_guest = guest_crud.get_guest(db, guest_id=guest_id)
+    db_guest = balance_ledger_crud.lock_guest(db, guest_id)
     if not db_guest:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Guest not found")
 
@@ -27,6 +27,15 @@ def create_topup_transaction(db: Session, guest_id: uuid.UUID, topup_data: schem
 
     db.flush()
     db.refresh(transaction)
+    balance_ledger_crud.post_balance_entry(
+        db,
+        db_guest,
+        amount=transaction.amount,
+        kind=transaction.type,
+        contra_account=balance_ledger_crud.payment_contra_account(transaction.payment_method),
+        source_type="transaction",
+        source_id=transaction.transaction_id,
+    )
     get_pos_adapter().notify_topup(db=db, transaction=transaction, guest=db_guest)
 
     db.commit()
@@ -35,7 +44,7 @@ def create_topup_transaction(db: Session, guest_id: uuid.UUID, topup_data: schem
 
 
 def create_refund_transaction(db: Session, guest_id: uuid.UUID, refund_data: schemas.RefundRequest):
-    db_guest = guest_crud.get_guest(db, guest_id=guest_id)
+    db_guest = balance_ledger_crud.lock_guest(db, guest_id)
     if not db_guest:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Guest not found")
     if db_guest.balance < refund_data.amount:
@@ -55,6 +64,15 @@ def create_refund_transaction(db: Session, guest_id: uuid.UUID, refund_data: sch
 
     db.flush()
     db.refresh(transaction)
+    balance_ledger_crud.post_balance_entry(
+        db,
+        db_guest,
+        amount=transaction.amount,
+        kind=transaction.type,
+        contra_account=balance_ledger_crud.payment_contra_account(transaction.payment_method),
+        source_type="transaction",
+        source_id=transaction.transaction_id,
+    )
     get_pos_adapter().notify_refund(db=db, transaction=transaction, guest=db_guest)
 
     db.commit()
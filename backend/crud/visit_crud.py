@@ -1,16 +1,17 @@
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 import json
 import uuid
+from collections import defaultdict
 from decimal import Decimal, ROUND_HALF_UP
 
 from fastapi import HTTPException, status
 from sqlalchemy import and_, func, or_, update
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager
 
 import models
 import schemas
-from crud import card_crud, display_crud, lost_card_crud, pour_policy, system_crud
+from crud import balance_ledger_crud, card_access_crud, card_crud, display_crud, lost_card_crud, pour_policy, system_crud
 from pos_adapter import get_pos_adapter
 
 
@@ -254,7 +255,7 @@ def get_active_visit_by_guest_id(db: Session, guest_id: uuid.UUID):
 def get_active_visit_by_card_uid(db: Session, card_uid: str):
     normalized_uid = _normalize_card_uid(card_uid)
     return db.query(models.Visit).filter(
-        func.lower(models.Visit.card_uid) == normalized_uid,
+        models.Visit.card_uid == normalized_uid,
         models.Visit.status == "active",
     ).first()
 
@@ -491,9 +492,11 @@ def open_visit(db: Session, guest_id: uuid.UUID, card_uid: str | None = None):
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
 
 
-def authorize_pour_lock(db: Session, card_uid: str, tap_id: int, actor_id: str):
+def authorize_pour_lock(db: Session, card_uid: str, tap_id: int, actor_id: str, *, _retry_stale_index: bool = True):
     normalized_uid = _normalize_card_uid(card_uid)
-    if lost_card_crud.is_lost_card(db=db, card_uid=normalized_uid):
+    # Решения по потерянной карте, активному визиту и блокировке крана принимаются по индексу в памяти.
+    access = card_access_crud.get_card_access(db, normalized_uid)
+    if access.is_lost:
         _add_audit_log(
             db,
             actor_id=actor_id,
@@ -512,30 +515,30 @@ def authorize_pour_lock(db: Session, card_uid: str, tap_id: int, actor_id: str):
             detail={"reason": "lost_card", "message": "Card is marked as lost"},
         )
 
-    active_visit = get_active_visit_by_card_uid(db=db, card_uid=normalized_uid)
-    if not active_visit:
+    indexed_visit = access.active_visit
+    if indexed_visit is None:
         raise _authorize_error(
             status.HTTP_409_CONFLICT,
             reason="no_active_visit",
             message=f"No active visit for Card {normalized_uid}.",
         )
-    if active_visit.operational_status != VISIT_OP_ACTIVE_ASSIGNED:
+    if indexed_visit.operational_status != VISIT_OP_ACTIVE_ASSIGNED:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail={"reason": "visit_not_authorizable", "message": "Visit is not in an authorizable state"},
         )
 
-    if active_visit.active_tap_id is not None and active_visit.active_tap_id != tap_id:
+    if indexed_visit.active_tap_id is not None and indexed_visit.active_tap_id != tap_id:
         _add_audit_log(
             db,
             actor_id=actor_id,
             action="card_in_use_on_other_tap",
             target_entity="Visit",
-            target_id=str(active_visit.visit_id),
+            target_id=str(indexed_visit.visit_id),
             details={
                 "card_uid": normalized_uid,
                 "requested_tap_id": tap_id,
-                "active_tap_id": active_visit.active_tap_id,
+                "active_tap_id": indexed_visit.active_tap_id,
                 "event": "authorize_conflict",
             },
         )
@@ -543,8 +546,19 @@ def authorize_pour_lock(db: Session, card_uid: str, tap_id: int, actor_id: str):
         raise _authorize_error(
             status.HTTP_409_CONFLICT,
             reason="card_in_use_on_other_tap",
-            message=f"Card already in use on Tap {active_visit.active_tap_id}",
-            context={"active_tap_id": active_visit.active_tap_id, "requested_tap_id": tap_id},
+            message=f"Card already in use on Tap {indexed_visit.active_tap_id}",
+            context={"active_tap_id": indexed_visit.active_tap_id, "requested_tap_id": tap_id},
+        )
+
+    active_visit = card_access_crud.load_active_visit(db, access)
+    if active_visit is None:
+        # Индекс разошёлся со строкой визита (запись вне процесса): карта уже помечена, повторяем по свежим данным.
+        if _retry_stale_index:
+            return authorize_pour_lock(db, card_uid, tap_id, actor_id, _retry_stale_index=False)
+        raise _authorize_error(
+            status.HTTP_409_CONFLICT,
+            reason="no_active_visit",
+            message=f"No active visit for Card {normalized_uid}.",
         )
 
     tap = db.query(models.Tap).filter(models.Tap.tap_id == tap_id).first()
@@ -655,6 +669,8 @@ def authorize_pour_lock(db: Session, card_uid: str, tap_id: int, actor_id: str):
         )
         .values(active_tap_id=tap_id, lock_set_at=func.now())
     )
+    display_crud.mark_display_snapshot_stale(db, tap_id)
+    card_access_crud.mark_card_access_stale(db, normalized_uid)
 
     if lock_attempt.rowcount == 0:
         current = get_visit(db, active_visit.visit_id)
@@ -732,16 +748,123 @@ def _operator_action_label(action: str, details: dict) -> tuple[str, str | None]
     return mapping.get(action, action), detail_text
 
 
-def _build_session_history_item(db: Session, visit: models.Visit, include_narrative: bool = False):
+def _as_utc(value: datetime | None) -> datetime | None:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _non_sale_flow_window(visit: models.Visit) -> tuple[datetime, datetime | None]:
+    lower = visit.opened_at - timedelta(hours=1)
+    upper = visit.closed_at + timedelta(hours=1) if visit.closed_at is not None else None
+    return lower, upper
+
+
+def _query_visit_non_sale_flows(db: Session, visit: models.Visit, short_ids: list[str]) -> list[models.NonSaleFlow]:
+    flow_filters = []
+    if visit.card_uid:
+        flow_filters.append(models.NonSaleFlow.card_uid == visit.card_uid)
+    if short_ids:
+        flow_filters.append(models.NonSaleFlow.short_id.in_(short_ids))
+    if not flow_filters:
+        return []
+    lower, upper = _non_sale_flow_window(visit)
+    non_sale_query = db.query(models.NonSaleFlow).filter(or_(*flow_filters))
+    non_sale_query = non_sale_query.filter(models.NonSaleFlow.last_seen_at >= lower)
+    if upper is not None:
+        non_sale_query = non_sale_query.filter(models.NonSaleFlow.last_seen_at <= upper)
+    return non_sale_query.all()
+
+
+def _non_sale_flow_matches_visit(flow: models.NonSaleFlow, visit: models.Visit, short_ids: set[str]) -> bool:
+    if not ((visit.card_uid and flow.card_uid == visit.card_uid) or (flow.short_id and flow.short_id in short_ids)):
+        return False
+    lower, upper = _non_sale_flow_window(visit)
+    last_seen_at = _as_utc(flow.last_seen_at)
+    if last_seen_at < _as_utc(lower):
+        return False
+    return upper is None or last_seen_at <= _as_utc(upper)
+
+
+def _load_session_history_sources(db: Session, visits: list[models.Visit]) -> tuple[dict, dict, dict]:
+    """Load pours, visit audit logs and non-sale flows for many visits with one query per source."""
+    pours_by_visit: dict[uuid.UUID, list[models.Pour]] = {visit.visit_id: [] for visit in visits}
+    audit_logs_by_visit: dict[uuid.UUID, list[models.AuditLog]] = {visit.visit_id: [] for visit in visits}
+    flows_by_visit: dict[uuid.UUID, list[models.NonSaleFlow]] = {visit.visit_id: [] for visit in visits}
+    if not visits:
+        return pours_by_visit, audit_logs_by_visit, flows_by_visit
+
+    visit_ids = list(pours_by_visit)
+    for pour in db.query(models.Pour).filter(models.Pour.visit_id.in_(visit_ids)).all():
+        pours_by_visit[pour.visit_id].append(pour)
+
+    visit_id_by_target = {str(visit_id): visit_id for visit_id in visit_ids}
+    audit_logs = db.query(models.AuditLog).filter(
+        models.AuditLog.target_entity == 'Visit',
+        models.AuditLog.target_id.in_(list(visit_id_by_target)),
+    ).order_by(models.AuditLog.timestamp.asc()).all()
+    for log in audit_logs:
+        audit_logs_by_visit[visit_id_by_target[log.target_id]].append(log)
+
+    short_ids_by_visit = {
+        visit_id: {pour.short_id for pour in pours if pour.short_id}
+        for visit_id, pours in pours_by_visit.items()
+    }
+    card_uids = {visit.card_uid for visit in visits if visit.card_uid}
+    short_ids = set().union(*short_ids_by_visit.values())
+    flow_filters = []
+    if card_uids:
+        flow_filters.append(models.NonSaleFlow.card_uid.in_(card_uids))
+    if short_ids:
+        flow_filters.append(models.NonSaleFlow.short_id.in_(short_ids))
+    if flow_filters:
+        windows = [_non_sale_flow_window(visit) for visit in visits]
+        flow_query = db.query(models.NonSaleFlow).filter(or_(*flow_filters))
+        flow_query = flow_query.filter(models.NonSaleFlow.last_seen_at >= min((lower for lower, _upper in windows), key=_as_utc))
+        if all(upper is not None for _lower, upper in windows):
+            flow_query = flow_query.filter(models.NonSaleFlow.last_seen_at <= max((upper for _lower, upper in windows), key=_as_utc))
+        flows = flow_query.all()
+        flow_position = {flow.non_sale_flow_id: position for position, flow in enumerate(flows)}
+        flows_by_card_uid: dict[str, list[models.NonSaleFlow]] = defaultdict(list)
+        flows_by_short_id: dict[str, list[models.NonSaleFlow]] = defaultdict(list)
+        for flow in flows:
+            if flow.card_uid:
+                flows_by_card_uid[flow.card_uid].append(flow)
+            if flow.short_id:
+                flows_by_short_id[flow.short_id].append(flow)
+        for visit in visits:
+            visit_short_ids = short_ids_by_visit[visit.visit_id]
+            candidates = {flow.non_sale_flow_id: flow for flow in flows_by_card_uid.get(visit.card_uid, [])}
+            for short_id in visit_short_ids:
+                candidates.update((flow.non_sale_flow_id, flow) for flow in flows_by_short_id.get(short_id, []))
+            flows_by_visit[visit.visit_id] = sorted(
+                (flow for flow in candidates.values() if _non_sale_flow_matches_visit(flow, visit, visit_short_ids)),
+                key=lambda flow: flow_position[flow.non_sale_flow_id],
+            )
+    return pours_by_visit, audit_logs_by_visit, flows_by_visit
+
+
+def _build_session_history_item(
+    db: Session,
+    visit: models.Visit,
+    include_narrative: bool = False,
+    *,
+    pours: list[models.Pour] | None = None,
+    audit_logs: list[models.AuditLog] | None = None,
+    non_sale_flows: list[models.NonSaleFlow] | None = None,
+):
     guest = visit.guest
     full_name = ' '.join([part for part in [guest.last_name, guest.first_name, guest.patronymic] if part]) if guest else '—'
-    pours = list(sorted(visit.pours, key=lambda item: item.authorized_at or item.poured_at or item.created_at or visit.opened_at))
+    pours = list(sorted(visit.pours if pours is None else pours, key=lambda item: item.authorized_at or item.poured_at or item.created_at or visit.opened_at))
     pour_tap_ids = sorted({int(p.tap_id) for p in pours if p.tap_id is not None})
     tap_ids = set(pour_tap_ids)
-    audit_logs = db.query(models.AuditLog).filter(
-        models.AuditLog.target_entity == 'Visit',
-        models.AuditLog.target_id == str(visit.visit_id),
-    ).order_by(models.AuditLog.timestamp.asc()).all()
+    if audit_logs is None:
+        audit_logs = db.query(models.AuditLog).filter(
+            models.AuditLog.target_entity == 'Visit',
+            models.AuditLog.target_id == str(visit.visit_id),
+        ).order_by(models.AuditLog.timestamp.asc()).all()
     operator_actions = []
     incident_actions = []
     last_operator_action_at = None
@@ -763,19 +886,8 @@ def _build_session_history_item(db: Session, visit: models.Visit, include_narrat
             contains_tail_pour = True
             last_sync_at = log.timestamp
 
-    short_ids = [p.short_id for p in pours if p.short_id]
-    flow_filters = []
-    if visit.card_uid:
-        flow_filters.append(models.NonSaleFlow.card_uid == visit.card_uid)
-    if short_ids:
-        flow_filters.append(models.NonSaleFlow.short_id.in_(short_ids))
-    non_sale_flows = []
-    if flow_filters:
-        non_sale_query = db.query(models.NonSaleFlow).filter(or_(*flow_filters))
-        non_sale_query = non_sale_query.filter(models.NonSaleFlow.last_seen_at >= visit.opened_at - timedelta(hours=1))
-        if visit.closed_at is not None:
-            non_sale_query = non_sale_query.filter(models.NonSaleFlow.last_seen_at <= visit.closed_at + timedelta(hours=1))
-        non_sale_flows = non_sale_query.all()
+    if non_sale_flows is None:
+        non_sale_flows = _query_visit_non_sale_flows(db, visit, [p.short_id for p in pours if p.short_id])
     contains_non_sale_flow = len(non_sale_flows) > 0
 
     sync_statuses = {p.sync_status for p in pours}
@@ -873,6 +985,20 @@ def _build_session_history_item(db: Session, visit: models.Visit, include_narrat
     return item(**payload)
 
 
+def _build_session_history_items(db: Session, visits: list[models.Visit]) -> list[schemas.SessionHistoryListItem]:
+    pours_by_visit, audit_logs_by_visit, flows_by_visit = _load_session_history_sources(db, visits)
+    return [
+        _build_session_history_item(
+            db,
+            visit,
+            pours=pours_by_visit[visit.visit_id],
+            audit_logs=audit_logs_by_visit[visit.visit_id],
+            non_sale_flows=flows_by_visit[visit.visit_id],
+        )
+        for visit in visits
+    ]
+
+
 def get_session_history(db: Session, *, date_from=None, date_to=None, tap_id=None, status=None, card_uid=None, incident_only=False, unsynced_only=False):
     query = db.query(models.Visit).join(models.Guest).order_by(models.Visit.opened_at.desc())
     if date_from:
@@ -880,11 +1006,11 @@ def get_session_history(db: Session, *, date_from=None, date_to=None, tap_id=Non
     if date_to:
         query = query.filter(func.date(models.Visit.opened_at) <= date_to)
     if card_uid:
-        query = query.filter(models.Visit.card_uid.ilike(f'%{card_uid.strip()}%'))
+        query = query.filter(models.Visit.card_uid.like(f'%{models.canonical_card_uid(card_uid)}%'))
     if status in {'active','closed'}:
         query = query.filter(models.Visit.status == status)
-    visits = query.all()
-    items = [_build_session_history_item(db, visit) for visit in visits]
+    visits = query.options(contains_eager(models.Visit.guest)).all()
+    items = _build_session_history_items(db, visits)
     if tap_id is not None:
         items = [item for item in items if tap_id in item.taps or item.primary_tap_id == tap_id]
     if status == 'aborted':
@@ -1326,7 +1452,7 @@ def reconcile_pour(
     if not tap or not tap.keg_id:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Tap is not configured with keg")
 
-    guest = db.query(models.Guest).filter(models.Guest.guest_id == visit.guest_id).first()
+    guest = balance_ledger_crud.lock_guest(db, visit.guest_id)
     if not guest:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Guest not found")
 
@@ -1385,6 +1511,15 @@ def reconcile_pour(
         tap.status = "active"
     db.flush()
     db.refresh(finalized_pour)
+    balance_ledger_crud.post_balance_entry(
+        db,
+        guest,
+        amount=-amount,
+        kind="pour",
+        contra_account=balance_ledger_crud.CONTRA_SALES,
+        source_type="pour",
+        source_id=finalized_pour.pour_id,
+    )
     get_pos_adapter().notify_pour(db=db, pour=finalized_pour, guest=guest)
 
     _add_audit_log(
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+import argparse
+import cProfile
+import pstats
+import statistics
+import time
+from datetime import date, timedelta
+
+from crud import operator_crud
+from database import Base, SessionLocal, engine
+from dev_benchmark_pour_queries import _cleanup, _seed
+import schemas
+import security
+
+
+SCRIPT_NAME = "dev_benchmark_operator_policies"
+POLICY_FUNCTIONS = {
+    "_tap_action_policies",
+    "_session_action_policies",
+    "_card_guest_action_policies",
+    "_operator_pour_action_policies",
+    "_action_policy",
+}
+COMPILED_CACHES = (
+    operator_crud._compiled_permissions,
+    operator_crud._compiled_action_policy,
+    operator_crud._contextualize_policy,
+    operator_crud._compiled_tap_action_policies,
+    operator_crud._compiled_session_action_policies,
+    operator_crud._compiled_card_guest_action_policies,
+    operator_crud._compiled_operator_pour_action_policies,
+)
+
+
+def _clear_compiled_policies() -> None:
+    for cached in COMPILED_CACHES:
+        cached.cache_clear()
+
+
+def _policy_ms(profile: cProfile.Profile) -> float:
+    # Точки входа не вызывают друг друга, поэтому их cumtime можно складывать.
+    stats = pstats.Stats(profile).stats
+    return 1000 * sum(
+        cumtime
+        for (_filename, _line, name), (_cc, _nc, _tt, cumtime, _callers) in stats.items()
+        if name in POLICY_FUNCTIONS
+    )
+
+
+def _profile_endpoint(db, label: str, callback, repeat: int) -> list:
+    total_samples = []
+    policy_samples = []
+    result = None
+    for _ in range(repeat):
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        result = callback()
+        profile.disable()
+        total_samples.append((time.perf_counter() - started) * 1000)
+        policy_samples.append(_policy_ms(profile))
+        db.expire_all()
+    total_ms = statistics.median(total_samples)
+    policy_ms = statistics.median(policy_samples)
+    print(
+        f"[{SCRIPT_NAME}] dialect={engine.dialect.name} {label} items={len(result.items)} "
+        f"total_ms={total_ms:.1f} policy_ms={policy_ms:.2f} policy_share={policy_ms / total_ms * 100 if total_ms else 0.0:.1f}% (profiled)"
+    )
+    return result.items
+
+
+def _measure_row_policies(label: str, build, items: list, repeat: int) -> None:
+    """Per-row policy sets as the detail drawers build them: recompiled per row (cold) vs compiled templates."""
+    results = {}
+    for mode in ("cold", "compiled"):
+        samples = []
+        for _ in range(repeat):
+            _clear_compiled_policies()
+            started = time.perf_counter()
+            for item in items:
+                if mode == "cold":
+                    _clear_compiled_policies()
+                build(item)
+            samples.append((time.perf_counter() - started) * 1000)
+        results[mode] = statistics.median(samples)
+        print(f"[{SCRIPT_NAME}] {label}[{mode}] rows={len(items)} median_ms={results[mode]:.2f}")
+    if results["compiled"]:
+        print(f"[{SCRIPT_NAME}] {label} speedup={results['cold'] / results['compiled']:.1f}x")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Profile operator journal endpoints and report time spent building per-row action policies."
+    )
+    parser.add_argument("--pours", type=int, default=5_000, help="Number of synthetic pours to seed.")
+    parser.add_argument("--days", type=int, default=2, help="Spread pours over this many days.")
+    parser.add_argument("--limit", type=int, default=250, help="Journal page size.")
+    parser.add_argument("--repeat", type=int, default=5, help="Profiled runs per endpoint and mode.")
+    parser.add_argument("--role", default="shift_lead", choices=sorted(security.ROLE_PERMISSIONS), help="Role of the requesting user.")
+    parser.add_argument(
+        "--create-schema",
+        action="store_true",
+        help="Create tables from models first (scratch SQLite databases only; Postgres should be migrated).",
+    )
+    parser.add_argument("--keep", action="store_true", help="Keep seeded rows instead of deleting them afterwards.")
+    args = parser.parse_args()
+
+    if args.create_schema:
+        Base.metadata.create_all(bind=engine)
+
+    current_user = {
+        "username": "benchmark",
+        "role": args.role,
+        "permissions": sorted(security.ROLE_PERMISSIONS[args.role]),
+    }
+    date_to = date.today()
+    date_from = date_to - timedelta(days=max(1, args.days))
+
+    db = SessionLocal()
+    try:
+        _seed(db, args.pours, max(1, args.days))
+        pours = lambda: operator_crud.get_operator_pours(
+            db,
+            filters=schemas.OperatorPourJournalFilterParams(
+                period_preset="range", date_from=date_from, date_to=date_to, limit=args.limit
+            ),
+            current_user=current_user,
+        )
+        sessions = lambda: operator_crud.get_operator_sessions(
+            db,
+            filters=schemas.OperatorSessionJournalFilterParams(period_preset="range", date_from=date_from, date_to=date_to),
+            current_user=current_user,
+        )
+        pour_items = _profile_endpoint(db, "get_operator_pours", pours, args.repeat)
+        session_items = _profile_endpoint(db, "get_operator_sessions", sessions, args.repeat)
+        _measure_row_policies(
+            "pour_row_policies",
+            lambda item: operator_crud._operator_pour_action_policies(current_user, item),
+            pour_items,
+            args.repeat,
+        )
+        _measure_row_policies(
+            "session_row_policies",
+            lambda item: operator_crud._session_action_policies(current_user, item),
+            session_items,
+            args.repeat,
+        )
+    finally:
+        if not args.keep:
+            _cleanup(db)
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+import argparse
+import statistics
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import insert, text
+
+from crud import operator_crud
+from database import Base, SessionLocal, engine
+import models
+
+
+SCRIPT_NAME = "dev_benchmark_operator_search"
+BENCH_PREFIX = "BENCH"
+INSERT_CHUNK = 5000
+DEFAULT_QUERIES = ("ivan", "bench-4242", "+7990004", "card-0099", "zzz-no-match")
+
+
+def _chunks(rows: list[dict], size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _seed(db, guest_count: int, visit_every: int) -> None:
+    now = datetime.now(timezone.utc)
+    guests: list[dict] = []
+    cards: list[dict] = []
+    visits: list[dict] = []
+    for index in range(guest_count):
+        guest_id = uuid.uuid4()
+        guests.append(
+            {
+                "guest_id": guest_id,
+                "last_name": f"{BENCH_PREFIX}-{index:06d}",
+                "first_name": "Ivan" if index % 7 == 0 else "Petr",
+                "patronymic": None,
+                "phone_number": f"+799{index:08d}",
+                "date_of_birth": date(1990, 1, 1),
+                "id_document": f"{BENCH_PREFIX}-DOC-{index}",
+                "balance": Decimal("0.00"),
+                "is_active": True,
+            }
+        )
+        if index % visit_every:
+            continue
+        card_uid = f"{BENCH_PREFIX}-CARD-{index:06d}".lower()
+        cards.append({"card_uid": card_uid, "status": "returned_to_pool"})
+        visits.append(
+            {
+                "visit_id": uuid.uuid4(),
+                "guest_id": guest_id,
+                "card_uid": card_uid,
+                "status": "closed",
+                "operational_status": "closed_ok",
+                "opened_at": now - timedelta(days=1, minutes=index % 600),
+                "closed_at": now - timedelta(days=1),
+                "closed_reason": "guest_checkout",
+            }
+        )
+
+    for table, rows in ((models.Guest, guests), (models.Card, cards), (models.Visit, visits)):
+        for chunk in _chunks(rows, INSERT_CHUNK):
+            db.execute(insert(table), chunk)
+    db.commit()
+    print(f"[{SCRIPT_NAME}] seeded guests={len(guests)} visits={len(visits)}")
+
+
+def _cleanup(db) -> None:
+    pattern = f"{BENCH_PREFIX}-%"
+    card_pattern = f"{BENCH_PREFIX.lower()}-%"
+    db.query(models.Visit).filter(models.Visit.card_uid.like(card_pattern)).delete(synchronize_session=False)
+    db.query(models.Card).filter(models.Card.card_uid.like(card_pattern)).delete(synchronize_session=False)
+    db.query(models.Guest).filter(models.Guest.last_name.like(pattern)).delete(synchronize_session=False)
+    db.commit()
+
+
+def _time_search(db, query: str, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operator_crud.search_operator_workspace(db, query=query, current_user=None, limit=8)
+        samples.append((time.perf_counter() - started) * 1000)
+        db.expire_all()
+    return samples
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Seed synthetic guests and time operator quick search against DATABASE_URL."
+    )
+    parser.add_argument("--guests", type=int, default=100_000, help="Number of synthetic guests to seed.")
+    parser.add_argument("--visit-every", type=int, default=10, help="Seed one closed visit per N guests.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query.")
+    parser.add_argument("--query", action="append", help="Search query to time; may be passed several times.")
+    parser.add_argument(
+        "--create-schema",
+        action="store_true",
+        help="Create tables from models first (scratch SQLite databases only; Postgres should be migrated).",
+    )
+    parser.add_argument("--keep", action="store_true", help="Keep seeded rows instead of deleting them afterwards.")
+    args = parser.parse_args()
+
+    if args.create_schema:
+        Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        _seed(db, args.guests, max(1, args.visit_every))
+        if engine.dialect.name == "postgresql":
+            db.execute(text("ANALYZE guests"))
+            db.execute(text("ANALYZE visits"))
+            db.execute(text("ANALYZE cards"))
+            db.commit()
+
+        for query in args.query or DEFAULT_QUERIES:
+            samples = _time_search(db, query, max(1, args.repeat))
+            print(
+                f"[{SCRIPT_NAME}] dialect={engine.dialect.name} query={query!r} "
+                f"median_ms={statistics.median(samples):.1f} max_ms={max(samples):.1f}"
+            )
+    finally:
+        if not args.keep:
+            _cleanup(db)
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import statistics
+import time
+from datetime import date, timedelta
+
+from pydantic import TypeAdapter
+
+from api import operator as operator_api
+from crud import operator_crud
+from database import Base, SessionLocal, engine
+from dev_benchmark_pour_queries import TAP_COUNT, _cleanup, _seed
+import schemas
+import security
+
+
+SCRIPT_NAME = "dev_benchmark_operator_serialization"
+DEFAULT_SIZES = (100, 1_000, 10_000)
+
+
+def _response_model_bytes(adapter: TypeAdapter, value) -> bytes:
+    # То, что делает FastAPI для response_model: dump в dict, повторная валидация, сериализация, json.dumps.
+    if isinstance(value, list):
+        content = [item.model_dump() for item in value]
+    else:
+        content = value.model_dump()
+    validated = adapter.validate_python(content)
+    return json.dumps(
+        adapter.dump_python(validated, mode="json"),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _direct_bytes(value, items_adapter: TypeAdapter) -> bytes:
+    if isinstance(value, list):
+        return items_adapter.dump_json(value)
+    return operator_api._journal_json(value, items_adapter)[0]
+
+
+def _measure(label: str, callback, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        callback()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def _compare(label: str, size: int, value, model_adapter: TypeAdapter, items_adapter: TypeAdapter, repeat: int) -> None:
+    legacy = _response_model_bytes(model_adapter, value)
+    direct = _direct_bytes(value, items_adapter)
+    if json.loads(legacy) != json.loads(direct):
+        raise SystemExit(f"[{SCRIPT_NAME}] {label} size={size}: direct JSON differs from response_model output")
+    legacy_ms = _measure(label, lambda: _response_model_bytes(model_adapter, value), repeat)
+    direct_ms = _measure(label, lambda: _direct_bytes(value, items_adapter), repeat)
+    print(
+        f"[{SCRIPT_NAME}] {label} items={size} bytes={len(direct)} "
+        f"response_model_ms={legacy_ms:.1f} direct_ms={direct_ms:.1f} speedup={legacy_ms / direct_ms if direct_ms else 0.0:.1f}x"
+    )
+
+
+def _replicate(items: list, size: int) -> list:
+    return [items[index % len(items)] for index in range(size)]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Compare response_model serialization with direct JSON for the operator pour, session and tap payloads."
+    )
+    parser.add_argument("--pours", type=int, default=2_000, help="Number of synthetic pours to seed for sample rows.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Payload sizes in items.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per size and path.")
+    parser.add_argument(
+        "--create-schema",
+        action="store_true",
+        help="Create tables from models first (scratch SQLite databases only; Postgres should be migrated).",
+    )
+    parser.add_argument("--keep", action="store_true", help="Keep seeded rows instead of deleting them afterwards.")
+    args = parser.parse_args()
+
+    if args.create_schema:
+        Base.metadata.create_all(bind=engine)
+
+    current_user = {
+        "username": "benchmark",
+        "role": "engineer_owner",
+        "permissions": sorted(security.ROLE_PERMISSIONS["engineer_owner"]),
+    }
+    date_to = date.today()
+    date_from = date_to - timedelta(days=2)
+
+    db = SessionLocal()
+    try:
+        _seed(db, args.pours, 2)
+        pours = operator_crud.get_operator_pours(
+            db,
+            filters=schemas.OperatorPourJournalFilterParams(
+                period_preset="range", date_from=date_from, date_to=date_to, limit=schemas.OPERATOR_POUR_PAGE_MAX_LIMIT
+            ),
+            current_user=current_user,
+        )
+        sessions = operator_crud.get_operator_sessions(
+            db,
+            filters=schemas.OperatorSessionJournalFilterParams(period_preset="range", date_from=date_from, date_to=date_to),
+            current_user=current_user,
+        )
+        taps = operator_crud.get_operator_taps(db, current_user=current_user)
+        print(
+            f"[{SCRIPT_NAME}] sample rows pours={len(pours.items)} sessions={len(sessions.items)} "
+            f"taps={len(taps)} (seeded taps={TAP_COUNT}); rows are repeated up to each size"
+        )
+        if not (pours.items and sessions.items and taps):
+            raise SystemExit(f"[{SCRIPT_NAME}] seeding produced no sample rows")
+
+        for size in args.sizes:
+            _compare(
+                "pours",
+                size,
+                pours.model_copy(update={"items": _replicate(pours.items, size)}),
+                TypeAdapter(schemas.OperatorPourJournalModel),
+                operator_api._POUR_ITEMS_ADAPTER,
+                args.repeat,
+            )
+            _compare(
+                "sessions",
+                size,
+                sessions.model_copy(update={"items": _replicate(sessions.items, size)}),
+                TypeAdapter(schemas.OperatorSessionJournalModel),
+                operator_api._SESSION_ITEMS_ADAPTER,
+                args.repeat,
+            )
+            _compare(
+                "taps",
+                size,
+                _replicate(taps, size),
+                operator_api._TAP_CARDS_ADAPTER,
+                operator_api._TAP_CARDS_ADAPTER,
+                args.repeat,
+            )
+    finally:
+        if not args.keep:
+            _cleanup(db)
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+import argparse
+import statistics
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import func, insert, text
+
+from crud import operator_crud, pour_crud, rollup_crud
+from database import Base, SessionLocal, engine
+import models
+import schemas
+
+
+SCRIPT_NAME = "dev_benchmark_pour_queries"
+BENCH_PREFIX = "BENCHPQ"
+INSERT_CHUNK = 5000
+TAP_COUNT = 8
+POURS_PER_VISIT = 8
+TAP_ID_BASE = 900
+LEGACY_POUR_TIMESTAMP = func.coalesce(
+    models.Pour.synced_at,
+    models.Pour.reconciled_at,
+    models.Pour.authorized_at,
+    models.Pour.poured_at,
+    models.Pour.created_at,
+)
+
+
+def _chunks(rows: list[dict], size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _seed(db, pour_count: int, days: int) -> None:
+    now = datetime.now(timezone.utc)
+    beverage = models.Beverage(name=f"{BENCH_PREFIX} Lager", sell_price_per_liter=Decimal("500.00"))
+    db.add(beverage)
+    db.flush()
+
+    keg_ids = []
+    for index in range(TAP_COUNT):
+        keg = models.Keg(
+            beverage_id=beverage.beverage_id,
+            initial_volume_ml=10_000_000,
+            current_volume_ml=10_000_000,
+            purchase_price=Decimal("1000.00"),
+            status="in_use",
+        )
+        db.add(keg)
+        db.flush()
+        db.add(models.Tap(tap_id=TAP_ID_BASE + index, display_name=f"{BENCH_PREFIX} Tap {index}", status="active", keg_id=keg.keg_id))
+        keg_ids.append(keg.keg_id)
+    db.flush()
+
+    span_seconds = days * 24 * 3600
+    visit_count = max(1, pour_count // POURS_PER_VISIT)
+    guests: list[dict] = []
+    cards: list[dict] = []
+    visits: list[dict] = []
+    for index in range(visit_count):
+        guest_id = uuid.uuid4()
+        card_uid = f"{BENCH_PREFIX}-CARD-{index:07d}".lower()
+        opened_at = now - timedelta(seconds=(index * 7919) % span_seconds)
+        guests.append(
+            {
+                "guest_id": guest_id,
+                "last_name": f"{BENCH_PREFIX}-{index:07d}",
+                "first_name": "Guest",
+                "patronymic": None,
+                "phone_number": f"+798{index:08d}",
+                "date_of_birth": date(1990, 1, 1),
+                "id_document": f"{BENCH_PREFIX}-DOC-{index}",
+                "balance": Decimal("0.00"),
+                "is_active": True,
+            }
+        )
+        cards.append({"card_uid": card_uid, "status": "returned_to_pool"})
+        visits.append(
+            {
+                "visit_id": uuid.uuid4(),
+                "guest_id": guest_id,
+                "card_uid": card_uid,
+                "status": "closed",
+                "operational_status": "closed_ok",
+                "opened_at": opened_at,
+                "closed_at": opened_at + timedelta(hours=2),
+                "closed_reason": "guest_checkout",
+            }
+        )
+
+    statuses = ("synced", "synced", "synced", "reconciled", "pending_sync", "rejected")
+    pours: list[dict] = []
+    for index in range(pour_count):
+        visit = visits[(index // POURS_PER_VISIT) % visit_count]
+        tap_index = index % TAP_COUNT
+        sync_status = statuses[index % len(statuses)]
+        poured_at = visit["opened_at"] + timedelta(minutes=index % POURS_PER_VISIT * 10)
+        pours.append(
+            {
+                "pour_id": uuid.uuid4(),
+                "client_tx_id": f"{BENCH_PREFIX}-{index}",
+                "guest_id": visit["guest_id"],
+                "card_uid": visit["card_uid"],
+                "visit_id": visit["visit_id"],
+                "tap_id": TAP_ID_BASE + tap_index,
+                "keg_id": keg_ids[tap_index],
+                "volume_ml": 0 if sync_status == "rejected" else 300,
+                "amount_charged": Decimal("0.00") if sync_status == "rejected" else Decimal("150.00"),
+                "price_per_ml_at_pour": Decimal("0.5000"),
+                "sync_status": sync_status,
+                "is_manual_reconcile": sync_status == "reconciled",
+                "poured_at": poured_at,
+                "authorized_at": poured_at - timedelta(seconds=20),
+                "synced_at": poured_at if sync_status == "synced" else None,
+                "reconciled_at": poured_at if sync_status == "reconciled" else None,
+            }
+        )
+
+    for table, rows in ((models.Guest, guests), (models.Card, cards), (models.Visit, visits), (models.Pour, pours)):
+        for chunk in _chunks(rows, INSERT_CHUNK):
+            db.execute(insert(table.__table__), chunk)
+    db.commit()
+    # Core-вставка обходит flush-хуки, поэтому часовые агрегаты пересобираем явно.
+    rollup_crud.verify_pour_rollups(db, repair=True)
+    print(f"[{SCRIPT_NAME}] seeded pours={pour_count} visits={visit_count} taps={TAP_COUNT} days={days}")
+
+
+def _cleanup(db) -> None:
+    db.query(models.Pour).filter(models.Pour.client_tx_id.like(f"{BENCH_PREFIX}-%")).delete(synchronize_session=False)
+    db.query(models.PourHourlyRollup).filter(models.PourHourlyRollup.tap_id >= TAP_ID_BASE).delete(synchronize_session=False)
+    db.query(models.Visit).filter(models.Visit.card_uid.like(f"{BENCH_PREFIX.lower()}-%")).delete(synchronize_session=False)
+    db.query(models.Card).filter(models.Card.card_uid.like(f"{BENCH_PREFIX.lower()}-%")).delete(synchronize_session=False)
+    db.query(models.Guest).filter(models.Guest.last_name.like(f"{BENCH_PREFIX}-%")).delete(synchronize_session=False)
+    db.query(models.Tap).filter(models.Tap.tap_id >= TAP_ID_BASE).delete(synchronize_session=False)
+    db.query(models.Keg).filter(models.Keg.beverage.has(models.Beverage.name == f"{BENCH_PREFIX} Lager")).delete(
+        synchronize_session=False
+    )
+    db.query(models.Beverage).filter(models.Beverage.name == f"{BENCH_PREFIX} Lager").delete(synchronize_session=False)
+    db.commit()
+
+
+def _measure(db, label: str, callback, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        callback()
+        samples.append((time.perf_counter() - started) * 1000)
+        db.expire_all()
+    median = statistics.median(samples)
+    print(f"[{SCRIPT_NAME}] dialect={engine.dialect.name} {label} median_ms={median:.1f} max_ms={max(samples):.1f}")
+    return median
+
+
+def _compare(db, label: str, legacy, indexed, repeat: int) -> None:
+    legacy_ms = _measure(db, f"{label}[coalesce]", legacy, repeat)
+    indexed_ms = _measure(db, f"{label}[effective_at]", indexed, repeat)
+    if indexed_ms:
+        print(f"[{SCRIPT_NAME}] {label} speedup={legacy_ms / indexed_ms:.1f}x")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Seed synthetic pours and compare coalesce() timestamp queries with the effective_at index."
+    )
+    parser.add_argument("--pours", type=int, default=200_000, help="Number of synthetic pours to seed.")
+    parser.add_argument("--days", type=int, default=30, help="Spread pours over this many days.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query.")
+    parser.add_argument(
+        "--create-schema",
+        action="store_true",
+        help="Create tables from models first (scratch SQLite databases only; Postgres should be migrated).",
+    )
+    parser.add_argument("--keep", action="store_true", help="Keep seeded rows instead of deleting them afterwards.")
+    args = parser.parse_args()
+
+    if args.create_schema:
+        Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        _seed(db, args.pours, max(1, args.days))
+        db.execute(text("ANALYZE"))
+        db.commit()
+
+        window_start = datetime.now(timezone.utc) - timedelta(hours=6)
+        window_end = datetime.now(timezone.utc)
+        bind = db.get_bind()
+
+        _compare(
+            db,
+            "latest_pours",
+            lambda: db.query(models.Pour.pour_id).order_by(LEGACY_POUR_TIMESTAMP.desc()).limit(20).all(),
+            lambda: db.query(models.Pour.pour_id).order_by(models.Pour.effective_at.desc()).limit(20).all(),
+            args.repeat,
+        )
+        _compare(
+            db,
+            "final_pours_in_window",
+            lambda: db.query(func.count(func.distinct(models.Pour.visit_id)))
+            .filter(LEGACY_POUR_TIMESTAMP >= window_start, LEGACY_POUR_TIMESTAMP <= window_end)
+            .filter(models.Pour.sync_status.in_(pour_crud.FINAL_KPI_SYNC_STATUSES))
+            .scalar(),
+            lambda: db.query(func.count(func.distinct(models.Pour.visit_id)))
+            .filter(*rollup_crud.timestamp_window_filters(bind, models.Pour.effective_at, window_start, window_end))
+            .filter(models.Pour.sync_status.in_(pour_crud.FINAL_KPI_SYNC_STATUSES))
+            .scalar(),
+            args.repeat,
+        )
+        _compare(
+            db,
+            "tap_journal_page",
+            lambda: db.query(models.Pour.pour_id)
+            .filter(models.Pour.tap_id == TAP_ID_BASE + 1)
+            .order_by(LEGACY_POUR_TIMESTAMP.desc())
+            .limit(100)
+            .all(),
+            lambda: db.query(models.Pour.pour_id)
+            .filter(models.Pour.tap_id == TAP_ID_BASE + 1)
+            .order_by(models.Pour.effective_at.desc())
+            .limit(100)
+            .all(),
+            args.repeat,
+        )
+
+        _measure(db, "get_pours", lambda: pour_crud.get_pours(db, limit=20), args.repeat)
+        _measure(db, "get_live_feed", lambda: pour_crud.get_live_feed(db, limit=20), args.repeat)
+        _measure(db, "get_today_summary", lambda: pour_crud.get_today_summary(db), args.repeat)
+        _measure(
+            db,
+            "get_operator_pours",
+            lambda: operator_crud.get_operator_pours(
+                db,
+                filters=schemas.OperatorPourJournalFilterParams(period_preset="today"),
+                current_user=None,
+            ),
+            args.repeat,
+        )
+    finally:
+        if not args.keep:
+            _cleanup(db)
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+
+SCRIPT_NAME = "dev_measure_operator_http_savings"
+DEFAULT_PATH_PREFIX = "/api/operator/"
+
+
+def _load_session_paths(har_path: str, path_prefix: str) -> list[str]:
+    """GET paths (with query) of a HAR export, in the order the admin-app requested them."""
+    with open(har_path, encoding="utf-8") as handle:
+        entries = json.load(handle)["log"]["entries"]
+    paths = []
+    for entry in sorted(entries, key=lambda item: item.get("startedDateTime", "")):
+        request = entry["request"]
+        if request["method"].upper() != "GET":
+            continue
+        parsed = urllib.parse.urlsplit(request["url"])
+        if not parsed.path.startswith(path_prefix):
+            continue
+        paths.append(parsed.path + (f"?{parsed.query}" if parsed.query else ""))
+    return paths
+
+
+def _fetch(url: str, headers: dict[str, str]) -> tuple[int, bytes, dict[str, str]]:
+    # urllib не распаковывает gzip, поэтому len(body) — это байты на проводе.
+    request = urllib.request.Request(url, headers=headers, method="GET")
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.read(), {key.lower(): value for key, value in response.headers.items()}
+    except urllib.error.HTTPError as exc:
+        return exc.code, exc.read(), {key.lower(): value for key, value in exc.headers.items()}
+
+
+def _login(base_url: str, username: str, password: str) -> str:
+    body = urllib.parse.urlencode({"username": username, "password": password}).encode("utf-8")
+    request = urllib.request.Request(f"{base_url}/api/token", data=body, method="POST")
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())["access_token"]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Replay the operator GET requests of a recorded admin-app session (HAR export) against a running backend "
+            "and compare transferred bytes without and with gzip + If-None-Match."
+        )
+    )
+    parser.add_argument("har", help="HAR file exported from the browser devtools while using the admin-app.")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="Backend base URL.")
+    parser.add_argument("--token", help="Bearer token; when omitted the script logs in with --username/--password.")
+    parser.add_argument("--username", default="operator")
+    parser.add_argument("--password", default="fake_password")
+    parser.add_argument("--path-prefix", default=DEFAULT_PATH_PREFIX, help="Only replay GET requests under this path.")
+    args = parser.parse_args()
+
+    base_url = args.base_url.rstrip("/")
+    paths = _load_session_paths(args.har, args.path_prefix)
+    if not paths:
+        print(f"[{SCRIPT_NAME}] no GET {args.path_prefix}* requests in {args.har}")
+        return 1
+
+    token = args.token or _login(base_url, args.username, args.password)
+    auth = {"Authorization": f"Bearer {token}"}
+    etags: dict[str, str] = {}
+    per_path = defaultdict(lambda: {"requests": 0, "plain": 0, "wire": 0, "not_modified": 0})
+    for path in paths:
+        url = f"{base_url}{path}"
+        _status, plain_body, _headers = _fetch(url, {**auth, "Accept-Encoding": "identity"})
+        conditional_headers = {**auth, "Accept-Encoding": "gzip"}
+        if path in etags:
+            conditional_headers["If-None-Match"] = etags[path]
+        status, wire_body, headers = _fetch(url, conditional_headers)
+        if headers.get("etag"):
+            etags[path] = headers["etag"]
+
+        stats = per_path[urllib.parse.urlsplit(path).path]
+        stats["requests"] += 1
+        stats["plain"] += len(plain_body)
+        stats["wire"] += len(wire_body)
+        stats["not_modified"] += int(status == 304)
+
+    for path, stats in sorted(per_path.items(), key=lambda item: -item[1]["plain"]):
+        print(
+            f"[{SCRIPT_NAME}] {path} requests={stats['requests']} not_modified={stats['not_modified']} "
+            f"plain_bytes={stats['plain']} wire_bytes={stats['wire']}"
+        )
+    plain_total = sum(stats["plain"] for stats in per_path.values())
+    wire_total = sum(stats["wire"] for stats in per_path.values())
+    not_modified_total = sum(stats["not_modified"] for stats in per_path.values())
+    saved = (1 - wire_total / plain_total) * 100 if plain_total else 0.0
+    print(
+        f"[{SCRIPT_NAME}] total requests={len(paths)} not_modified={not_modified_total} "
+        f"plain_bytes={plain_total} wire_bytes={wire_total} saved={saved:.1f}%"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -8,7 +8,12 @@ import os
 print(f"[entrypoint] DATABASE_URL={redact_database_url(os.getenv('DATABASE_URL'))}")
 PY
 
-python -m alembic upgrade head
+# Без работы для alembic не поднимаем его вовсе: ревизия сверяется со встроенной головой миграций.
+if python startup_checks.py --check-head; then
+  echo "[entrypoint] database already at migration head; skipping alembic upgrade"
+else
+  python -m alembic upgrade head
+fi
 
 if [ "$#" -eq 0 ]; then
   set -- uvicorn main:app --host 0.0.0.0 --port 8000 --reload
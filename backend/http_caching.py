@@ -0,0 +1,119 @@
+import hashlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+DEFAULT_CONDITIONAL_PATH_PREFIXES = ("/api/operator/",)
+
+
+def body_etag(*parts: bytes) -> str:
+    # Weak: GZipMiddleware may re-encode the same representation on the way out.
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _opaque_tag(value: str) -> str:
+    value = value.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    return value.strip('"')
+
+
+def if_none_match_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    current = _opaque_tag(etag)
+    return any(_opaque_tag(candidate) == current for candidate in if_none_match.split(","))
+
+
+def _not_modified_start(message: Message) -> Message:
+    headers = MutableHeaders(raw=list(message["headers"]))
+    for name in ("Content-Length", "Content-Type"):
+        if name in headers:
+            del headers[name]
+    return {**message, "status": 304, "headers": headers.raw}
+
+
+class ConditionalGetMiddleware:
+    """ETag / 304 for JSON GET responses under the configured path prefixes.
+
+    By default the ETag is a hash of the serialized body, so any endpoint gets
+    conditional GET without knowing its own resource version. Endpoints whose
+    body carries volatile fields (``generated_at``) set their own ETag from the
+    stable part; it is honoured as is and such bodies are never buffered.
+    """
+
+    def __init__(self, app: ASGIApp, *, path_prefixes: tuple[str, ...] = DEFAULT_CONDITIONAL_PATH_PREFIXES) -> None:
+        self.app = app
+        self.path_prefixes = tuple(path_prefixes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or not scope["path"].startswith(self.path_prefixes)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start_message: Message | None = None
+        chunks: list[bytes] = []
+        passthrough = False
+        not_modified = False
+
+        async def buffered_send(message: Message) -> None:
+            nonlocal start_message, passthrough, not_modified
+            if not_modified:
+                if message["type"] == "http.response.body" and not message.get("more_body", False):
+                    await send({"type": "http.response.body", "body": b""})
+                return
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+                if message["status"] != 200 or media_type != "application/json":
+                    passthrough = True
+                    await send(message)
+                    return
+                if "etag" in headers:
+                    response_headers = MutableHeaders(raw=message["headers"])
+                    response_headers.setdefault("Cache-Control", "private, no-cache")
+                    if if_none_match_matches(if_none_match, headers["etag"]):
+                        not_modified = True
+                        await send(_not_modified_start(message))
+                        return
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            etag = body_etag(body)
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers["ETag"] = etag
+            # Клиент обязан перепроверять документ, но может обойтись 304 без тела.
+            headers.setdefault("Cache-Control", "private, no-cache")
+            if if_none_match_matches(if_none_match, etag):
+                await send(_not_modified_start(start_message))
+                await send({"type": "http.response.body", "body": b""})
+                return
+            headers["Content-Length"] = str(len(body))
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, buffered_send)
@@ -1,10 +1,13 @@
+import asyncio
 import logging
 import os
-from contextlib import asynccontextmanager
-from typing import Annotated
+from contextlib import asynccontextmanager, suppress
+from typing import Annotated, Callable
 
 from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
@@ -28,8 +31,9 @@ from api import (
     taps,
     visits,
 )
-from crud import pour_crud
-from database import DATABASE_URL, engine, get_db
+from crud import balance_ledger_crud, card_access_crud, display_crud, pour_crud
+from database import DATABASE_URL, SessionLocal, engine, get_db
+from http_caching import ConditionalGetMiddleware
 from operator_stream import operator_stream_hub
 from runtime_diagnostics import get_alembic_revision, get_db_identity, get_request_id
 from startup_checks import verify_database_ready
@@ -63,12 +67,94 @@ def _cors_allowed_origins() -> list[str]:
     ]
 
 
+DEFAULT_GZIP_MINIMUM_SIZE = 1024
+
+
+def _gzip_minimum_size() -> int:
+    raw_value = os.getenv("GZIP_MINIMUM_SIZE", str(DEFAULT_GZIP_MINIMUM_SIZE)).strip()
+    try:
+        return max(int(raw_value), 0)
+    except ValueError:
+        return DEFAULT_GZIP_MINIMUM_SIZE
+
+
+DEFAULT_MEDIA_GC_INTERVAL_SECONDS = 6 * 3600
+DEFAULT_CARD_ACCESS_CHECK_INTERVAL_SECONDS = 300
+DEFAULT_BALANCE_LEDGER_CHECK_INTERVAL_SECONDS = 3600
+
+
+def _interval_seconds(env_var: str, default: int) -> int:
+    raw_value = os.getenv(env_var, str(default)).strip()
+    try:
+        return max(int(raw_value), 0)
+    except ValueError:
+        return default
+
+
+def _run_with_session(job: Callable[[Session], object]) -> None:
+    db = SessionLocal()
+    try:
+        job(db)
+    finally:
+        db.close()
+
+
+async def _periodic_job_loop(name: str, interval_seconds: int, job: Callable[[Session], object]) -> None:
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await run_in_threadpool(_run_with_session, job)
+        except Exception:
+            logging.exception("%s failed", name)
+
+
+def _start_periodic_job(
+    name: str, env_var: str, default: int, job: Callable[[Session], object]
+) -> asyncio.Task | None:
+    """Run ``job(db)`` every ``env_var`` seconds in the threadpool; 0 disables it."""
+    interval_seconds = _interval_seconds(env_var, default)
+    if not interval_seconds:
+        return None
+    return asyncio.create_task(_periodic_job_loop(name, interval_seconds, job))
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     security.validate_security_configuration()
+    security.install_reload_signal_handler(asyncio.get_running_loop())
     verify_database_ready(engine, DATABASE_URL)
+    security.AUDIT_LOG_QUEUE.start()
+    periodic_tasks = [
+        _start_periodic_job(
+            "Media garbage collection",
+            "MEDIA_GC_INTERVAL_SECONDS",
+            DEFAULT_MEDIA_GC_INTERVAL_SECONDS,
+            display_crud.collect_media_garbage,
+        ),
+        _start_periodic_job(
+            "Card access index self-check",
+            "CARD_ACCESS_CHECK_INTERVAL_SECONDS",
+            DEFAULT_CARD_ACCESS_CHECK_INTERVAL_SECONDS,
+            card_access_crud.verify_card_access_index,
+        ),
+        _start_periodic_job(
+            "Balance ledger verification",
+            "BALANCE_LEDGER_CHECK_INTERVAL_SECONDS",
+            DEFAULT_BALANCE_LEDGER_CHECK_INTERVAL_SECONDS,
+            balance_ledger_crud.verify_balance_ledger,
+        ),
+    ]
     logging.info("Application startup complete.")
     yield
+    for task in periodic_tasks:
+        if task is None:
+            continue
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    security.remove_reload_signal_handler(asyncio.get_running_loop())
+    # Дописываем накопленные записи аудита до остановки процесса.
+    await run_in_threadpool(security.AUDIT_LOG_QUEUE.stop)
     logging.info("Application shutdown.")
 
 
@@ -81,6 +167,9 @@ app = FastAPI(
 )
 
 
+# Последний добавленный middleware внешний: ETag считается по несжатому телу, GZip сжимает уже готовый ответ.
+app.add_middleware(ConditionalGetMiddleware)
+app.add_middleware(GZipMiddleware, minimum_size=_gzip_minimum_size())
 app.add_middleware(
     CORSMiddleware,
     allow_origins=_cors_allowed_origins(),
@@ -121,7 +210,7 @@ async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm,
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc)) from exc
 
     user = security.get_user(form_data.username)
-    if not user or form_data.password != user.get("hashed_password"):
+    if not user or not security.constant_time_equals(form_data.password, user.get("hashed_password")):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect username or password")
 
     role = user.get("role", "operator")
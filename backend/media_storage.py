@@ -1,13 +1,18 @@
 import hashlib
+import logging
+import mmap
 import os
 import tempfile
-import uuid
 from pathlib import Path
 from typing import BinaryIO
 
 
 DEFAULT_MEDIA_ROOT = Path(__file__).resolve().parent / "storage" / "media-assets"
 DEFAULT_MEDIA_UPLOAD_MAX_BYTES = 5 * 1024 * 1024
+# 8K UHD (7680x4320) with headroom; a few MB of PNG can otherwise declare gigapixels.
+DEFAULT_MEDIA_UPLOAD_MAX_PIXELS = 40_000_000
+DEFAULT_MEDIA_VARIANT_WIDTHS = "720,1080"
+UPLOAD_CHUNK_BYTES = 64 * 1024
 ALLOWED_MEDIA_KINDS = {"background", "logo"}
 ALLOWED_MEDIA_FORMATS = {
     "image/png": {".png"},
@@ -21,6 +26,9 @@ JPEG_START_MARKERS = {
 }
 
 
+LOGGER = logging.getLogger("media_storage")
+
+
 class InvalidMediaAssetError(ValueError):
     pass
 
@@ -41,6 +49,31 @@ def get_upload_max_bytes() -> int:
     return max(value, 1)
 
 
+def get_upload_max_pixels() -> int:
+    raw_value = os.getenv("MEDIA_UPLOAD_MAX_PIXELS", str(DEFAULT_MEDIA_UPLOAD_MAX_PIXELS)).strip()
+    try:
+        value = int(raw_value)
+    except ValueError as exc:
+        raise RuntimeError("MEDIA_UPLOAD_MAX_PIXELS must be an integer") from exc
+    return max(value, 1)
+
+
+def get_variant_widths() -> tuple[int, ...]:
+    raw_value = os.getenv("MEDIA_VARIANT_WIDTHS", DEFAULT_MEDIA_VARIANT_WIDTHS)
+    widths = set()
+    for item in raw_value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            width = int(item)
+        except ValueError as exc:
+            raise RuntimeError("MEDIA_VARIANT_WIDTHS must be a comma-separated list of integers") from exc
+        if width > 0:
+            widths.add(width)
+    return tuple(sorted(widths))
+
+
 def normalize_media_kind(kind: str) -> str:
     normalized = (kind or "").strip().lower()
     if normalized not in ALLOWED_MEDIA_KINDS:
@@ -56,7 +89,7 @@ def _normalize_content_type(content_type: str | None) -> str:
     return normalized
 
 
-def _detect_png(payload: bytes) -> tuple[str, str, int, int] | None:
+def _detect_png(payload) -> tuple[str, str, int, int] | None:
     if len(payload) < 24 or payload[:8] != b"\x89PNG\r\n\x1a\n":
         return None
     width = int.from_bytes(payload[16:20], "big")
@@ -66,7 +99,7 @@ def _detect_png(payload: bytes) -> tuple[str, str, int, int] | None:
     return "image/png", ".png", width, height
 
 
-def _detect_jpeg(payload: bytes) -> tuple[str, str, int, int] | None:
+def _detect_jpeg(payload) -> tuple[str, str, int, int] | None:
     if len(payload) < 4 or payload[0:2] != b"\xff\xd8":
         return None
 
@@ -106,7 +139,8 @@ def _detect_jpeg(payload: bytes) -> tuple[str, str, int, int] | None:
     raise InvalidMediaAssetError("Could not read JPEG dimensions.")
 
 
-def _detect_media_format(payload: bytes) -> tuple[str, str, int, int]:
+def _detect_media_format(payload) -> tuple[str, str, int, int]:
+    """Sniff format and dimensions from ``bytes`` or a read-only ``mmap`` of the upload."""
     for detector in (_detect_png, _detect_jpeg):
         detected = detector(payload)
         if detected is not None:
@@ -114,14 +148,36 @@ def _detect_media_format(payload: bytes) -> tuple[str, str, int, int]:
     raise InvalidMediaAssetError("Unsupported media format. Only PNG and JPEG are allowed.")
 
 
-def _read_upload_bytes(file_obj: BinaryIO) -> bytes:
+def _stream_upload_to_temp(file_obj: BinaryIO, media_root: Path) -> tuple[Path, int, str]:
+    """Copy the upload to a temp file in ``media_root`` chunk by chunk, hashing as it goes."""
     max_bytes = get_upload_max_bytes()
-    payload = file_obj.read(max_bytes + 1)
-    if not payload:
-        raise InvalidMediaAssetError("Uploaded file is empty.")
-    if len(payload) > max_bytes:
-        raise InvalidMediaAssetError(f"Uploaded file exceeds {max_bytes} bytes.")
-    return payload
+    digest = hashlib.sha256()
+    byte_size = 0
+    with tempfile.NamedTemporaryFile(dir=str(media_root), delete=False) as temp_file:
+        temp_path = Path(temp_file.name)
+        try:
+            while True:
+                chunk = file_obj.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                byte_size += len(chunk)
+                if byte_size > max_bytes:
+                    raise InvalidMediaAssetError(f"Uploaded file exceeds {max_bytes} bytes.")
+                digest.update(chunk)
+                temp_file.write(chunk)
+            if byte_size == 0:
+                raise InvalidMediaAssetError("Uploaded file is empty.")
+        except BaseException:
+            temp_file.close()
+            temp_path.unlink(missing_ok=True)
+            raise
+    return temp_path, byte_size, digest.hexdigest()
+
+
+def _detect_file_format(path: Path) -> tuple[str, str, int, int]:
+    # mmap keeps the byte-oriented detectors while only paging in the headers they touch.
+    with path.open("rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as payload:
+        return _detect_media_format(payload)
 
 
 def validate_upload(
@@ -131,21 +187,34 @@ def validate_upload(
     content_type: str | None,
     kind: str,
 ) -> dict:
-    normalized_kind = normalize_media_kind(kind)
-    payload = _read_upload_bytes(file_obj)
-    detected_mime_type, extension, width, height = _detect_media_format(payload)
-    declared_mime_type = _normalize_content_type(content_type)
-    allowed_extensions = ALLOWED_MEDIA_FORMATS[detected_mime_type]
-    provided_extension = Path(filename or "").suffix.lower()
+    """Validate an upload without holding it in memory.
 
-    if declared_mime_type != detected_mime_type:
-        raise InvalidMediaAssetError(
-            f"MIME type mismatch. Declared {declared_mime_type}, detected {detected_mime_type}."
-        )
-
-    if provided_extension not in allowed_extensions:
-        allowed_list = ", ".join(sorted(allowed_extensions))
-        raise InvalidMediaAssetError(f"Unsupported file extension. Allowed extensions: {allowed_list}.")
+    The returned ``temp_path`` belongs to the caller: move it into place or unlink it.
+    """
+    normalized_kind = normalize_media_kind(kind)
+    temp_path, byte_size, checksum = _stream_upload_to_temp(file_obj, get_media_root())
+    try:
+        detected_mime_type, extension, width, height = _detect_file_format(temp_path)
+        declared_mime_type = _normalize_content_type(content_type)
+        allowed_extensions = ALLOWED_MEDIA_FORMATS[detected_mime_type]
+        provided_extension = Path(filename or "").suffix.lower()
+
+        if declared_mime_type != detected_mime_type:
+            raise InvalidMediaAssetError(
+                f"MIME type mismatch. Declared {declared_mime_type}, detected {detected_mime_type}."
+            )
+
+        if provided_extension not in allowed_extensions:
+            allowed_list = ", ".join(sorted(allowed_extensions))
+            raise InvalidMediaAssetError(f"Unsupported file extension. Allowed extensions: {allowed_list}.")
+
+        # Проверяется по заголовку, до любого декодирования: ни бэкенд, ни дисплеи не должны распаковывать такое.
+        max_pixels = get_upload_max_pixels()
+        if width * height > max_pixels:
+            raise InvalidMediaAssetError(f"Image is {width}x{height}; at most {max_pixels} pixels are allowed.")
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
 
     return {
         "kind": normalized_kind,
@@ -153,13 +222,17 @@ def validate_upload(
         "extension": extension,
         "width": width,
         "height": height,
-        "byte_size": len(payload),
-        "checksum_sha256": hashlib.sha256(payload).hexdigest(),
-        "payload": payload,
+        "byte_size": byte_size,
+        "checksum_sha256": checksum,
+        "temp_path": temp_path,
     }
 
 
-def save_upload(file_obj: BinaryIO, *, filename: str, content_type: str | None, asset_id: uuid.UUID, kind: str) -> dict:
+def save_upload(file_obj: BinaryIO, *, filename: str, content_type: str | None, kind: str) -> dict:
+    """Store the upload under its checksum; identical bytes reuse the existing file.
+
+    Display variants are not generated here: the caller schedules ``generate_variants``.
+    """
     media_root = get_media_root()
     validated = validate_upload(
         file_obj,
@@ -167,20 +240,94 @@ def save_upload(file_obj: BinaryIO, *, filename: str, content_type: str | None,
         content_type=content_type,
         kind=kind,
     )
-    storage_key = f"{asset_id}{validated['extension']}"
+    storage_key = f"{validated['checksum_sha256']}{validated['extension']}"
     target_path = media_root / storage_key
+    temp_path = validated.pop("temp_path")
+    # Повторная загрузка осиротевшего файла продлевает ему grace-период сборщика:
+    # иначе GC удалит его раньше, чем закоммитится строка ассета.
+    deduplicated = _touch_stored_file(storage_key)
+    if deduplicated:
+        temp_path.unlink(missing_ok=True)
+        for variant_key in storage_keys_with_variants(storage_key)[1:]:
+            _touch_stored_file(variant_key)
+    else:
+        os.replace(temp_path, target_path)
 
-    with tempfile.NamedTemporaryFile(dir=str(media_root), delete=False) as temp_file:
-        temp_file.write(validated["payload"])
-        temp_path = Path(temp_file.name)
-    os.replace(temp_path, target_path)
-
-    validated.pop("payload", None)
     validated["storage_key"] = storage_key
     validated["path"] = target_path
+    validated["deduplicated"] = deduplicated
     return validated
 
 
+def _touch_stored_file(storage_key: str) -> bool:
+    try:
+        os.utime(resolve_storage_path(storage_key))
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def variant_storage_key(storage_key: str, width: int) -> str:
+    path = Path(storage_key)
+    return f"{path.stem}-w{width}{path.suffix}"
+
+
+def generate_variants(storage_key: str, *, mime_type: str, width: int) -> list[int]:
+    """Write missing downscaled copies for every configured width below ``width``; return the stored widths.
+
+    Best effort: without Pillow, or on a decode error, displays keep getting the original.
+    Runs after the upload response; ``width`` x height was already capped by ``validate_upload``.
+    """
+    target_widths = [
+        target
+        for target in get_variant_widths()
+        if target < width and not storage_path_exists(variant_storage_key(storage_key, target))
+    ]
+    if not target_widths:
+        return _stored_variant_widths(storage_key)
+    try:
+        from PIL import Image
+    except ImportError:
+        LOGGER.info("Pillow is not installed; skipping media variants for storage_key=%s", storage_key)
+        return _stored_variant_widths(storage_key)
+
+    media_root = get_media_root()
+    source_path = media_root / storage_key
+    image_format = "JPEG" if mime_type == "image/jpeg" else "PNG"
+    try:
+        with Image.open(source_path) as source:
+            source.load()
+            for target_width in target_widths:
+                target_height = max(round(source.height * target_width / source.width), 1)
+                resized = source.resize((target_width, target_height), Image.Resampling.LANCZOS)
+                if image_format == "JPEG" and resized.mode not in {"RGB", "L"}:
+                    resized = resized.convert("RGB")
+                with tempfile.NamedTemporaryFile(dir=str(media_root), delete=False) as temp_file:
+                    temp_path = Path(temp_file.name)
+                    resized.save(temp_file, format=image_format, **({"quality": 85} if image_format == "JPEG" else {"optimize": True}))
+                os.replace(temp_path, media_root / variant_storage_key(storage_key, target_width))
+    except (OSError, ValueError, Image.DecompressionBombError):
+        LOGGER.warning("Failed to generate media variants for storage_key=%s", storage_key, exc_info=True)
+    return _stored_variant_widths(storage_key)
+
+
+def _stored_variant_widths(storage_key: str) -> list[int]:
+    return [width for width in get_variant_widths() if storage_path_exists(variant_storage_key(storage_key, width))]
+
+
+def resolve_variant(storage_key: str, requested_width: int | None) -> tuple[str, int | None]:
+    """Pick the smallest stored variant at least ``requested_width`` wide, else the original."""
+    if requested_width is None:
+        return storage_key, None
+    for width in get_variant_widths():
+        if width < requested_width:
+            continue
+        candidate = variant_storage_key(storage_key, width)
+        if storage_path_exists(candidate):
+            return candidate, width
+    return storage_key, None
+
+
 def resolve_storage_path(storage_key: str) -> Path:
     return get_media_root() / storage_key
 
@@ -189,7 +336,25 @@ def storage_path_exists(storage_key: str) -> bool:
     return resolve_storage_path(storage_key).exists()
 
 
+def storage_keys_with_variants(storage_key: str) -> list[str]:
+    return [storage_key, *(variant_storage_key(storage_key, width) for width in get_variant_widths())]
+
+
 def delete_storage_path(storage_key: str) -> None:
-    path = resolve_storage_path(storage_key)
-    if path.exists():
-        path.unlink()
+    for key in storage_keys_with_variants(storage_key):
+        path = resolve_storage_path(key)
+        if path.exists():
+            path.unlink()
+
+
+def list_stored_files() -> list[tuple[str, int, float]]:
+    """``(name, byte_size, mtime)`` for every regular file in the media root, temp files included."""
+    stored = []
+    for path in get_media_root().iterdir():
+        try:
+            stat_result = path.stat()
+        except FileNotFoundError:
+            continue
+        if path.is_file():
+            stored.append((path.name, stat_result.st_size, stat_result.st_mtime))
+    return stored
@@ -0,0 +1,29 @@
+# Generated by `python startup_checks.py --write-migration-head` (also run in the Docker build).
+# Do not edit by hand; regenerate after adding a migration.
+
+ALEMBIC_HEADS = ('0022_guest_balance_ledger',)
+
+MIGRATION_FILES = (
+    '0001_m1_baseline.py',
+    '0002_m2_visit_model_invariants.py',
+    '0003_m35_open_visit_without_card.py',
+    '0004_m4_offline_sync_reconcile.py',
+    '0005_m4_system_states_guard.py',
+    '0006_m5_shift_operational_mode.py',
+    '0007_m5_shift_reports_v1.py',
+    '0008_m6_lost_cards_registry.py',
+    '0009_m6_db_time_duration.py',
+    '0010_m5_db_time_source.py',
+    '0011_m6_insufficient_funds_clamp.py',
+    '0012_m6_rejected_pour_terminal_state.py',
+    '0013_flow_accounting.py',
+    '0014_tap_display_system.py',
+    '0015_incident_state_overlay.py',
+    '0016_guest_visit_card_consolidation.py',
+    '0017_operator_search_trgm.py',
+    '0018_pour_hourly_rollups.py',
+    '0019_effective_at_columns.py',
+    '0020_media_content_addressed.py',
+    '0021_card_uid_canonical.py',
+    '0022_guest_balance_ledger.py',
+)
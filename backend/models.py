@@ -6,12 +6,29 @@ from datetime import timedelta
 # --- ИЗМЕНЕНИЕ: Импортируем универсальный UUID вместо специфичного для PostgreSQL ---
 from sqlalchemy import (
     Column, Integer, String, Date, DateTime, Boolean, 
-    ForeignKey, text, Numeric, UUID, Text, Index, CheckConstraint, JSON
+    ForeignKey, text, Numeric, UUID, Text, Index, CheckConstraint, JSON, Computed
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
 from database import Base
 
+
+# UID карты хранится в каноническом виде (trim + lower), поэтому поиск идёт
+# обычным равенством по B-tree индексу, без lower() в запросе.
+CANONICAL_CARD_UID_SQL = "card_uid = lower(trim(card_uid))"
+
+
+def canonical_card_uid(value):
+    if value is None:
+        return None
+    return str(value).strip().lower()
+
+
+class CanonicalCardUidMixin:
+    @validates("card_uid")
+    def _canonicalize_card_uid(self, key, value):
+        return canonical_card_uid(value)
+
 # --- ПРИНЦИП 1: Разделение сущностей "Справочник" vs "Экземпляр" ---
 # Мы отделяем описание напитка от конкретной кеги.
 # Это позволяет нам легко управлять ассортиментом и анализировать продажи по напиткам.
@@ -109,7 +126,8 @@ class MediaAsset(Base):
 
     asset_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     kind = Column(String(32), nullable=False, index=True)
-    storage_key = Column(String(255), nullable=False, unique=True)
+    # Ключ файла = sha256 содержимого, одинаковые загрузки разделяют один файл
+    storage_key = Column(String(255), nullable=False, index=True)
     original_filename = Column(String(255), nullable=False)
     mime_type = Column(String(100), nullable=False)
     byte_size = Column(Integer, nullable=False)
@@ -165,12 +183,15 @@ class Guest(Base):
     pours = relationship("Pour", back_populates="guest")
 
 
-class Card(Base):
+class Card(CanonicalCardUidMixin, Base):
     """
     RFID-КАРТА.
     Физический носитель из пула, временно назначаемый на визит.
     """
     __tablename__ = "cards"
+    __table_args__ = (
+        CheckConstraint(CANONICAL_CARD_UID_SQL, name="ck_cards_card_uid_canonical"),
+    )
 
     card_uid = Column(String(50), primary_key=True, comment="Уникальный идентификатор, читаемый с карты")
     # Legacy compatibility field only. Operational ownership now lives on Visit.card_uid.
@@ -193,12 +214,15 @@ class Card(Base):
     pours = relationship("Pour", back_populates="card")
 
 
-class Visit(Base):
+class Visit(CanonicalCardUidMixin, Base):
     """
     ВИЗИТ ГОСТЯ.
     Операционная сессия в рамках одного посещения.
     """
     __tablename__ = "visits"
+    __table_args__ = (
+        CheckConstraint(CANONICAL_CARD_UID_SQL, name="ck_visits_card_uid_canonical"),
+    )
 
     visit_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     guest_id = Column(UUID(as_uuid=True), ForeignKey("guests.guest_id"), nullable=False, index=True)
@@ -227,8 +251,11 @@ class Visit(Base):
     pours = relationship("Pour", back_populates="visit")
 
 
-class LostCard(Base):
+class LostCard(CanonicalCardUidMixin, Base):
     __tablename__ = "lost_cards"
+    __table_args__ = (
+        CheckConstraint(CANONICAL_CARD_UID_SQL, name="ck_lost_cards_card_uid_canonical"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     card_uid = Column(String(50), nullable=False, unique=True, index=True)
@@ -275,12 +302,36 @@ class ShiftReport(Base):
     payload = Column(JSON, nullable=False)
 
 
-class Pour(Base):
+class PourHourlyRollup(Base):
+    """
+    ПОЧАСОВОЙ АГРЕГАТ НАЛИВОВ ПО КРАНУ.
+    Обновляется приращениями в той же транзакции, что и изменение наливов (см. crud.rollup_crud).
+    """
+    __tablename__ = "pour_hourly_rollups"
+
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    tap_id = Column(Integer, primary_key=True)
+    pours_count = Column(Integer, nullable=False, default=0)
+    volume_ml = Column(Integer, nullable=False, default=0)
+    amount_total = Column(Numeric(12, 2), nullable=False, default=0)
+    pending_sync_count = Column(Integer, nullable=False, default=0)
+    reconciled_count = Column(Integer, nullable=False, default=0)
+    final_volume_ml = Column(Integer, nullable=False, default=0)
+    final_amount_total = Column(Numeric(12, 2), nullable=False, default=0)
+
+
+class Pour(CanonicalCardUidMixin, Base):
     """
     ТРАНЗАКЦИЯ НАЛИВА.
     Неизменяемая запись о каждом факте налива.
     """
     __tablename__ = "pours"
+    __table_args__ = (
+        CheckConstraint(CANONICAL_CARD_UID_SQL, name="ck_pours_card_uid_canonical"),
+        Index("ix_pours_sync_status_effective_at", "sync_status", "effective_at"),
+        Index("ix_pours_tap_id_effective_at", "tap_id", "effective_at"),
+        Index("ix_pours_tap_id_poured_at", "tap_id", "poured_at"),
+    )
 
     # --- ИЗМЕНЕНИЕ: Генерация UUID теперь выполняется кодом Python ---
     pour_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -309,6 +360,12 @@ class Pour(Base):
     synced_at = Column(DateTime(timezone=True), nullable=True)
     reconciled_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Момент, по которому налив сортируется и попадает в окна отчётов; пересчитывается самой БД.
+    effective_at = Column(
+        DateTime(timezone=True),
+        Computed("coalesce(synced_at, reconciled_at, authorized_at, poured_at, created_at)", persisted=True),
+        index=True,
+    )
 
     # Связи "многие к одному"
     guest = relationship("Guest", back_populates="pours")
@@ -335,11 +392,13 @@ class Pour(Base):
         return ended_at - timedelta(milliseconds=self.duration_ms)
 
 
-class NonSaleFlow(Base):
+class NonSaleFlow(CanonicalCardUidMixin, Base):
     __tablename__ = "non_sale_flows"
     __table_args__ = (
+        CheckConstraint(CANONICAL_CARD_UID_SQL, name="ck_non_sale_flows_card_uid_canonical"),
         CheckConstraint("volume_ml >= 0", name="ck_non_sale_flows_volume_non_negative"),
         CheckConstraint("accounted_volume_ml >= 0", name="ck_non_sale_flows_accounted_volume_non_negative"),
+        Index("ix_non_sale_flows_tap_id_effective_at", "tap_id", "effective_at"),
     )
 
     non_sale_flow_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -364,6 +423,11 @@ class NonSaleFlow(Base):
     finalized_at = Column(DateTime(timezone=True), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    effective_at = Column(
+        DateTime(timezone=True),
+        Computed("coalesce(finalized_at, last_seen_at, created_at)", persisted=True),
+        index=True,
+    )
 
     tap = relationship("Tap", back_populates="non_sale_flows")
     keg = relationship("Keg", back_populates="non_sale_flows")
@@ -389,6 +453,43 @@ class Transaction(Base):
     visit = relationship("Visit")
 
 
+class GuestBalanceLedgerEntry(Base):
+    """
+    ЖУРНАЛ ДВИЖЕНИЙ ПО БАЛАНСУ ГОСТЯ.
+    Только добавление. Каждая строка — проводка между счётом гостя и contra_account
+    (способ оплаты, выручка, входящий остаток); amount со знаком со стороны гостя.
+    Guest.balance остаётся рабочим значением, журнал — его проверяемой историей (см. crud.balance_ledger_crud).
+    """
+    __tablename__ = "guest_balance_ledger"
+    __table_args__ = (
+        Index("uq_guest_balance_ledger_guest_sequence", "guest_id", "sequence", unique=True),
+        Index("ix_guest_balance_ledger_occurred_at", "occurred_at"),
+    )
+
+    entry_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    guest_id = Column(UUID(as_uuid=True), ForeignKey("guests.guest_id"), nullable=False)
+    sequence = Column(Integer, nullable=False, comment="Порядковый номер проводки внутри гостя, с 1")
+    kind = Column(String(20), nullable=False, comment="opening, top-up, refund, pour")
+    amount = Column(Numeric(10, 2), nullable=False)
+    contra_account = Column(String(40), nullable=False, comment="e.g. payment:cash, sales, opening_balance")
+    source_type = Column(String(20), nullable=True, comment="transaction | pour")
+    source_id = Column(String(64), nullable=True)
+    occurred_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class GuestBalanceSnapshot(Base):
+    """
+    СНИМОК БАЛАНСА ПО ЖУРНАЛУ.
+    Пишется каждые N проводок гостя: баланс после проводки с номером sequence.
+    """
+    __tablename__ = "guest_balance_snapshots"
+
+    guest_id = Column(UUID(as_uuid=True), ForeignKey("guests.guest_id"), primary_key=True)
+    sequence = Column(Integer, primary_key=True)
+    balance = Column(Numeric(12, 2), nullable=False)
+    occurred_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
 # --- СИСТЕМНЫЕ МОДЕЛИ ---
 
 class AuditLog(Base):
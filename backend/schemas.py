@@ -11,6 +11,10 @@ HEX_COLOR_PATTERN = re.compile(r"^#[0-9A-Fa-f]{6}$")
 DISPLAY_TEXT_THEMES = {"light", "dark"}
 DISPLAY_PRICE_MODES = {"per_100ml", "per_liter", "auto"}
 DISPLAY_MEDIA_KINDS = {"background", "logo"}
+OPERATOR_POUR_PAGE_DEFAULT_LIMIT = 250
+OPERATOR_POUR_PAGE_MAX_LIMIT = 500
+GUEST_HISTORY_PAGE_DEFAULT_LIMIT = 100
+GUEST_HISTORY_PAGE_MAX_LIMIT = 500
 
 
 def _normalize_optional_string(value: Optional[str]) -> Optional[str]:
@@ -169,6 +173,7 @@ class MediaAssetListItem(BaseModel):
     checksum_sha256: str
     content_url: str
     created_at: datetime
+    reference_count: int = 0
 
     @field_validator("kind")
     @classmethod
@@ -177,6 +182,13 @@ class MediaAssetListItem(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+
+class MediaGarbageCollectionReport(BaseModel):
+    dry_run: bool
+    purged_asset_ids: List[uuid.UUID]
+    deleted_files: List[str]
+    freed_bytes: int
+
 # --- Схемы для Кег (Keg) ---
 class KegBase(BaseModel):
     initial_volume_ml: int = Field(..., json_schema_extra={'example': 50000})
@@ -337,6 +349,18 @@ class DisplayTapSnapshot(BaseModel):
     generated_at: datetime
     model_config = ConfigDict(populate_by_name=True)
 
+
+class DisplaySnapshotBatchRequest(BaseModel):
+    tap_ids: Optional[list[int]] = Field(default=None, max_length=256)
+    known_versions: dict[int, str] = Field(default_factory=dict)
+
+
+class DisplaySnapshotBatchResponse(BaseModel):
+    snapshots: list[DisplayTapSnapshot]
+    unchanged_tap_ids: list[int]
+    missing_tap_ids: list[int]
+    generated_at: datetime
+
 # --- Схемы для Карт (Card) ---
 class CardCreate(BaseModel):
     card_uid: str = Field(..., json_schema_extra={'example': "04AB7815CD6B80"})
@@ -430,6 +454,8 @@ class ShiftReportTotals(BaseModel):
     pending_sync_count: int
     reconciled_count: int
     mismatch_count: int
+    topup_amount_cents: int = 0
+    refund_amount_cents: int = 0
 
 
 class ShiftReportByTapItem(BaseModel):
@@ -722,6 +748,8 @@ class OperatorSessionJournalItem(SessionHistoryListItem):
 
 
 class OperatorSessionActionPolicySet(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     close: "OperatorActionPolicy"
     force_unlock: "OperatorActionPolicy"
     reconcile: "OperatorActionPolicy"
@@ -780,10 +808,13 @@ class HistoryItem(BaseModel):
     type: str = Field(..., json_schema_extra={'example': "pour | top-up"})
     amount: Decimal = Field(..., description="Положительное для пополнений, отрицательное для наливов")
     details: str = Field(..., json_schema_extra={'example': "Налив: Guinness 500 мл | Пополнение: Наличные"})
+    balance_after: Optional[Decimal] = Field(default=None, description="Баланс гостя сразу после операции")
 
 class GuestHistoryResponse(BaseModel):
     guest_id: uuid.UUID
     history: List[HistoryItem] = []
+    has_more: bool = False
+    next_cursor: Optional[str] = None
 
 # --- Схемы для Финансовых Транзакций (Transaction) ---
 class TransactionBase(BaseModel):
@@ -886,6 +917,21 @@ class FlowSummaryResponse(BaseModel):
     by_tap: list[TapFlowSummaryItem] = []
 
 
+class PourRollupMismatch(BaseModel):
+    bucket_start: datetime
+    tap_id: int
+    field: str
+    expected: str
+    stored: str
+
+
+class PourRollupConsistencyReport(BaseModel):
+    checked_buckets: int
+    consistent: bool
+    repaired: bool = False
+    mismatches: list[PourRollupMismatch] = []
+
+
 class TodaySummaryResponse(BaseModel):
     period: Literal["day", "shift"]
     summary_complete: bool
@@ -1022,6 +1068,16 @@ class SystemStateItem(BaseModel):
     value: str
 
 
+class AuditQueueMetrics(BaseModel):
+    depth: int
+    max_size: int
+    enqueued: int
+    written: int
+    dropped: int
+    failed: int
+    batches: int
+
+
 class IncidentListItem(BaseModel):
     incident_id: str
     priority: Literal["low", "medium", "high", "critical"]
@@ -1126,6 +1182,9 @@ class SystemOperationalSummary(BaseModel):
     subsystems: list[SystemSubsystemSummary] = []
 
 class OperatorActionPolicy(BaseModel):
+    # Наборы политик компилируются один раз на роль и разделяются между ответами.
+    model_config = ConfigDict(frozen=True)
+
     allowed: bool = True
     confirm_required: bool = False
     second_approval_required: bool = False
@@ -1134,6 +1193,8 @@ class OperatorActionPolicy(BaseModel):
 
 
 class CardGuestActionPolicySet(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     top_up: OperatorActionPolicy
     toggle_block: OperatorActionPolicy
     mark_lost: OperatorActionPolicy
@@ -1191,6 +1252,8 @@ class OperatorSubsystemStatus(BaseModel):
 
 
 class TapActionPolicySet(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     open: OperatorActionPolicy
     stop: OperatorActionPolicy
     block: OperatorActionPolicy
@@ -1335,6 +1398,8 @@ class OperatorPourJournalFilterParams(BaseModel):
     timeout_only: bool = False
     denied_only: bool = False
     sale_mode: Literal["all", "sale", "non_sale"] = "all"
+    cursor: Optional[str] = None
+    limit: int = Field(default=OPERATOR_POUR_PAGE_DEFAULT_LIMIT, ge=1, le=OPERATOR_POUR_PAGE_MAX_LIMIT)
 
 
 class OperatorPourJournalHeader(BaseModel):
@@ -1380,6 +1445,8 @@ class OperatorPourLifecycleItem(BaseModel):
 
 
 class OperatorPourActionPolicySet(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     open_visit: OperatorActionPolicy
     open_guest: OperatorActionPolicy
     open_tap: OperatorActionPolicy
@@ -1391,6 +1458,8 @@ class OperatorPourJournalModel(BaseModel):
     applied_filters: OperatorPourJournalFilterParams
     header: OperatorPourJournalHeader
     items: list[OperatorPourJournalItem] = []
+    has_more: bool = False
+    next_cursor: Optional[str] = None
 
 
 class OperatorPourDetailModel(BaseModel):
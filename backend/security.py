@@ -1,15 +1,22 @@
+import asyncio
+from collections import OrderedDict
+from contextlib import suppress
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+import hmac
 import logging
 import os
+import signal
+import threading
+import time
 from typing import Annotated, Any
 
-from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 
 from fastapi import BackgroundTasks, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 
-from crud import audit_crud
+from audit_queue import AuditLogQueue
 from database import SessionLocal, get_db
 
 
@@ -17,6 +24,7 @@ logger = logging.getLogger(__name__)
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+VERIFIED_TOKEN_CACHE_SIZE = int(os.getenv("VERIFIED_TOKEN_CACHE_SIZE", "256"))
 DEV_ONLY_SECRET_KEY = "dev-only-secret-key-change-in-production"
 PLACEHOLDER_PREFIXES = ("replace-with", "change-me")
 
@@ -122,64 +130,41 @@ def _permissions_for_role(role: str | None) -> set[str]:
     return set(ROLE_PERMISSIONS.get(role, set()))
 
 
-def is_bootstrap_auth_enabled() -> bool:
-    return _env_flag("ENABLE_BOOTSTRAP_AUTH", default=False)
+@dataclass(frozen=True)
+class SecuritySettings:
+    """Auth configuration resolved from the environment once; see reload_security_configuration()."""
 
+    secret_key: str | None
+    secret_key_error: str | None
+    bootstrap_auth_enabled: bool
+    bootstrap_auth_password: str
+    internal_api_keys: frozenset[str]
+    display_api_keys: frozenset[str]
 
-def _get_bootstrap_auth_password() -> str:
+
+def _resolve_bootstrap_auth_password() -> str:
     password = _normalize_token(os.getenv("BOOTSTRAP_AUTH_PASSWORD", ""))
     if _looks_like_placeholder(password):
         return ""
     return password
 
 
-def ensure_bootstrap_auth_available() -> None:
-    if not is_bootstrap_auth_enabled():
-        raise SecurityConfigurationError(
-            "Bootstrap auth is disabled. Set ENABLE_BOOTSTRAP_AUTH=true for local development or controlled pilot use."
-        )
-    if not _get_bootstrap_auth_password():
-        raise SecurityConfigurationError(
-            "ENABLE_BOOTSTRAP_AUTH=true requires BOOTSTRAP_AUTH_PASSWORD to be set to a non-placeholder value."
-        )
-
-
-def get_user(username: str):
-    template = BOOTSTRAP_USERS.get(username)
-    if template is None:
-        return None
-
-    user = dict(template)
-    password = _get_bootstrap_auth_password()
-    if password:
-        user["hashed_password"] = password
-    return user
-
-
-def _get_secret_key() -> str:
+def _resolve_secret_key() -> tuple[str | None, str | None]:
     configured = _normalize_token(os.getenv("SECRET_KEY", ""))
     if configured and configured != DEV_ONLY_SECRET_KEY and not _looks_like_placeholder(configured):
-        return configured
+        return configured, None
 
     if _env_flag("ALLOW_INSECURE_DEV_SECRET_KEY", default=False):
         logger.warning(
             "Using insecure development SECRET_KEY fallback because ALLOW_INSECURE_DEV_SECRET_KEY=true. Do not use this in pilot."
         )
-        return DEV_ONLY_SECRET_KEY
+        return DEV_ONLY_SECRET_KEY, None
 
-    raise SecurityConfigurationError(
+    return None, (
         "SECRET_KEY must be set to a non-placeholder value. Set ALLOW_INSECURE_DEV_SECRET_KEY=true only for local development."
     )
 
 
-def create_access_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, _get_secret_key(), algorithm=ALGORITHM)
-    return encoded_jwt
-
-
 def _get_env_token_set(*, primary_name: str, multi_name: str) -> set[str]:
     keys: set[str] = set()
 
@@ -197,7 +182,7 @@ def _get_env_token_set(*, primary_name: str, multi_name: str) -> set[str]:
     return keys
 
 
-def _get_internal_api_keys() -> set[str]:
+def _resolve_internal_api_keys() -> set[str]:
     keys = _get_env_token_set(primary_name="INTERNAL_API_KEY", multi_name="INTERNAL_API_KEYS")
 
     legacy = _normalize_token(os.getenv("INTERNAL_TOKEN", ""))
@@ -210,11 +195,184 @@ def _get_internal_api_keys() -> set[str]:
     return keys
 
 
-def _get_display_api_keys() -> set[str]:
-    return _get_env_token_set(primary_name="DISPLAY_API_KEY", multi_name="DISPLAY_API_KEYS")
+def _load_security_settings() -> SecuritySettings:
+    secret_key, secret_key_error = _resolve_secret_key()
+    return SecuritySettings(
+        secret_key=secret_key,
+        secret_key_error=secret_key_error,
+        bootstrap_auth_enabled=_env_flag("ENABLE_BOOTSTRAP_AUTH", default=False),
+        bootstrap_auth_password=_resolve_bootstrap_auth_password(),
+        internal_api_keys=frozenset(_resolve_internal_api_keys()),
+        display_api_keys=frozenset(_get_env_token_set(primary_name="DISPLAY_API_KEY", multi_name="DISPLAY_API_KEYS")),
+    )
+
+
+class VerifiedTokenCache:
+    """Small LRU of already verified bearer tokens; an entry never outlives the token's ``exp``."""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max(max_size, 0)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    def get(self, token: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return principal
+
+    def store(self, token: str, *, expires_at: float, principal: dict) -> None:
+        if self.max_size == 0:
+            return
+        with self._lock:
+            self._entries[token] = (expires_at, principal)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_VERIFIED_TOKENS = VerifiedTokenCache(VERIFIED_TOKEN_CACHE_SIZE)
+_settings: SecuritySettings | None = None
+_settings_lock = threading.Lock()
+
+
+def get_security_settings() -> SecuritySettings:
+    global _settings
+    settings = _settings
+    if settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = _load_security_settings()
+            settings = _settings
+    return settings
+
+
+def reload_security_configuration() -> SecuritySettings:
+    """Re-read secrets and token sets from the environment and forget every verified JWT."""
+    global _settings
+    settings = _load_security_settings()
+    with _settings_lock:
+        _settings = settings
+    _VERIFIED_TOKENS.clear()
+    return settings
+
+
+def _reload_on_signal() -> None:
+    reload_security_configuration()
+    logger.info("Security configuration reloaded on SIGHUP")
+
+
+def install_reload_signal_handler(loop: asyncio.AbstractEventLoop) -> bool:
+    """Reload the auth configuration on SIGHUP (no-op where the signal or the main thread is unavailable).
+
+    The reload runs as an ordinary event-loop callback: a plain ``signal.signal``
+    handler would interrupt the loop thread while a request holds the
+    non-reentrant settings or token-cache lock and deadlock on it.
+    """
+    reload_signal = getattr(signal, "SIGHUP", None)
+    if reload_signal is None:
+        return False
+    try:
+        loop.add_signal_handler(reload_signal, _reload_on_signal)
+    except (NotImplementedError, RuntimeError, ValueError):
+        return False
+    return True
+
+
+def remove_reload_signal_handler(loop: asyncio.AbstractEventLoop) -> None:
+    reload_signal = getattr(signal, "SIGHUP", None)
+    if reload_signal is not None:
+        with suppress(NotImplementedError, RuntimeError, ValueError):
+            loop.remove_signal_handler(reload_signal)
+
+
+def constant_time_equals(received: str | None, expected: str | None) -> bool:
+    if received is None or expected is None:
+        return False
+    return hmac.compare_digest(received.encode("utf-8"), expected.encode("utf-8"))
+
+
+def _matches_any_token(received: str, allowed_tokens: frozenset[str]) -> bool:
+    # Сравниваем со всеми токенами, чтобы время ответа не зависело от того, какой из них совпал.
+    matched = False
+    for token in allowed_tokens:
+        matched |= constant_time_equals(received, token)
+    return matched
+
+
+def is_bootstrap_auth_enabled() -> bool:
+    return get_security_settings().bootstrap_auth_enabled
+
+
+def _get_bootstrap_auth_password() -> str:
+    return get_security_settings().bootstrap_auth_password
+
+
+def ensure_bootstrap_auth_available() -> None:
+    if not is_bootstrap_auth_enabled():
+        raise SecurityConfigurationError(
+            "Bootstrap auth is disabled. Set ENABLE_BOOTSTRAP_AUTH=true for local development or controlled pilot use."
+        )
+    if not _get_bootstrap_auth_password():
+        raise SecurityConfigurationError(
+            "ENABLE_BOOTSTRAP_AUTH=true requires BOOTSTRAP_AUTH_PASSWORD to be set to a non-placeholder value."
+        )
+
+
+def get_user(username: str):
+    template = BOOTSTRAP_USERS.get(username)
+    if template is None:
+        return None
+
+    user = dict(template)
+    password = _get_bootstrap_auth_password()
+    if password:
+        user["hashed_password"] = password
+    return user
+
+
+def _get_secret_key() -> str:
+    settings = get_security_settings()
+    if settings.secret_key is None:
+        raise SecurityConfigurationError(settings.secret_key_error)
+    return settings.secret_key
+
+
+def _jwt():
+    # python-jose тянет backend cryptography (~30 мс импорта), а нужен только при выдаче и проверке токенов.
+    from jose import jwt
+
+    return jwt
+
+
+def create_access_token(data: dict):
+    to_encode = data.copy()
+    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire})
+    encoded_jwt = _jwt().encode(to_encode, _get_secret_key(), algorithm=ALGORITHM)
+    return encoded_jwt
+
+
+def _get_internal_api_keys() -> frozenset[str]:
+    return get_security_settings().internal_api_keys
+
+
+def _get_display_api_keys() -> frozenset[str]:
+    return get_security_settings().display_api_keys
 
 
 def validate_security_configuration() -> None:
+    reload_security_configuration()
     _get_secret_key()
     if is_bootstrap_auth_enabled():
         ensure_bootstrap_auth_available()
@@ -239,6 +397,10 @@ def validate_security_configuration() -> None:
     )
 
 
+# SessionLocal резолвится при каждой записи, чтобы тесты могли подменить фабрику сессий.
+AUDIT_LOG_QUEUE = AuditLogQueue(lambda: SessionLocal())
+
+
 def audit_log_task_wrapper(
     actor_id: str,
     action: str,
@@ -246,18 +408,13 @@ def audit_log_task_wrapper(
     target_id: str | None = None,
     details: dict[str, Any] | None = None,
 ):
-    db = SessionLocal()
-    try:
-        audit_crud.create_audit_log_entry(
-            db=db,
-            actor_id=actor_id,
-            action=action,
-            target_entity=target_entity,
-            target_id=target_id,
-            details=details,
-        )
-    finally:
-        db.close()
+    AUDIT_LOG_QUEUE.submit(
+        actor_id=actor_id,
+        action=action,
+        target_entity=target_entity,
+        target_id=target_id,
+        details=details,
+    )
 
 
 def _credentials_exception() -> HTTPException:
@@ -274,8 +431,14 @@ def _authenticate_bearer_user(token: str | None) -> dict:
     if token is None:
         raise credentials_exception
 
+    cached = _VERIFIED_TOKENS.get(token)
+    if cached is not None:
+        return {**cached, "permissions": list(cached["permissions"])}
+
+    from jose import JWTError
+
     try:
-        payload = jwt.decode(token, _get_secret_key(), algorithms=[ALGORITHM])
+        payload = _jwt().decode(token, _get_secret_key(), algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -294,12 +457,16 @@ def _authenticate_bearer_user(token: str | None) -> dict:
     if not permission_set:
         permission_set = _permissions_for_role(role)
 
-    return {
+    principal = {
         "username": username,
         "full_name": user.get("full_name"),
         "role": role,
         "permissions": sorted(permission_set),
     }
+    expires_at = payload.get("exp")
+    if isinstance(expires_at, (int, float)):
+        _VERIFIED_TOKENS.store(token, expires_at=float(expires_at), principal=principal)
+    return {**principal, "permissions": list(principal["permissions"])}
 
 
 def _maybe_schedule_audit_log(
@@ -321,7 +488,7 @@ def _authenticate_named_token(
     *,
     request: Request,
     header_name: str,
-    allowed_tokens: set[str],
+    allowed_tokens: frozenset[str],
     actor_id: str,
     warning_message: str,
 ) -> dict | None:
@@ -329,7 +496,7 @@ def _authenticate_named_token(
     if not received_token:
         return None
 
-    if received_token in allowed_tokens:
+    if _matches_any_token(received_token, allowed_tokens):
         return {"username": actor_id}
 
     logger.warning(warning_message, request.url.path)
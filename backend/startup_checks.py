@@ -1,14 +1,20 @@
+import argparse
 import logging
+import os
+from pathlib import Path
 from urllib.parse import urlsplit, urlunsplit
 
-from alembic.config import Config
-from alembic.runtime.migration import MigrationContext
-from alembic.script import ScriptDirectory
-from sqlalchemy import text
-from sqlalchemy.engine import Engine
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
 from sqlalchemy.exc import SQLAlchemyError
 
 
+BACKEND_DIR = Path(__file__).resolve().parent
+MIGRATIONS_DIR = BACKEND_DIR / "alembic" / "versions"
+MIGRATION_HEAD_PATH = BACKEND_DIR / "migration_head.py"
+ALEMBIC_VERSION_TABLE = "alembic_version"
+
+
 def redact_database_url(database_url: str | None) -> str:
     if not database_url:
         return "<missing>"
@@ -26,6 +32,66 @@ def redact_database_url(database_url: str | None) -> str:
     return urlunsplit((parts.scheme, hostname, parts.path, parts.query, parts.fragment))
 
 
+def _migration_files() -> tuple[str, ...]:
+    return tuple(sorted(path.name for path in MIGRATIONS_DIR.glob("*.py")))
+
+
+def _script_head_revisions() -> tuple[str, ...]:
+    # Alembic (~100 мс импорта и разбор всех миграций) нужен только без встроенной головы.
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    alembic_config = Config(str(BACKEND_DIR / "alembic.ini"))
+    return tuple(ScriptDirectory.from_config(alembic_config).get_heads())
+
+
+def get_head_revisions() -> tuple[str, ...]:
+    """Alembic heads embedded at build time; falls back to the migration scripts when missing or stale."""
+    try:
+        import migration_head
+    except ImportError:
+        return _script_head_revisions()
+    # Список файлов сверяется дёшево: новая миграция без перегенерации не должна пройти как актуальная.
+    if tuple(migration_head.MIGRATION_FILES) != _migration_files():
+        logging.getLogger("startup").warning(
+            "migration_head.py is stale; run `python startup_checks.py --write-migration-head`"
+        )
+        return _script_head_revisions()
+    return tuple(migration_head.ALEMBIC_HEADS)
+
+
+def write_migration_head(path: Path = MIGRATION_HEAD_PATH) -> tuple[str, ...]:
+    heads = _script_head_revisions()
+    files = _migration_files()
+    lines = [
+        "# Generated by `python startup_checks.py --write-migration-head` (also run in the Docker build).",
+        "# Do not edit by hand; regenerate after adding a migration.",
+        "",
+        f"ALEMBIC_HEADS = {heads!r}",
+        "",
+        "MIGRATION_FILES = (",
+        *(f"    {name!r}," for name in files),
+        ")",
+        "",
+    ]
+    path.write_text("\n".join(lines), encoding="utf-8")
+    return heads
+
+
+def get_current_revisions(connection: Connection) -> tuple[str, ...]:
+    if not inspect(connection).has_table(ALEMBIC_VERSION_TABLE):
+        return ()
+    return tuple(
+        sorted(row[0] for row in connection.execute(text(f"SELECT version_num FROM {ALEMBIC_VERSION_TABLE}")))
+    )
+
+
+def is_database_at_head(engine: Engine) -> bool:
+    with engine.connect() as connection:
+        current_revisions = get_current_revisions(connection)
+    return bool(current_revisions) and set(current_revisions) == set(get_head_revisions())
+
+
 def verify_database_ready(engine: Engine, database_url: str | None) -> None:
     logger = logging.getLogger("startup")
     safe_database_url = redact_database_url(database_url)
@@ -37,7 +103,7 @@ def verify_database_ready(engine: Engine, database_url: str | None) -> None:
     try:
         with engine.connect() as connection:
             connection.execute(text("select 1"))
-            current_revision = MigrationContext.configure(connection).get_current_revision()
+            current_revisions = get_current_revisions(connection)
     except SQLAlchemyError as exc:
         logger.error(
             "Database startup check failed: DATABASE_URL=%s error=%s",
@@ -46,10 +112,10 @@ def verify_database_ready(engine: Engine, database_url: str | None) -> None:
         )
         raise RuntimeError("Database is not reachable") from exc
 
-    alembic_config = Config("alembic.ini")
-    head_revisions = ScriptDirectory.from_config(alembic_config).get_heads()
+    head_revisions = get_head_revisions()
+    current_revision = ",".join(current_revisions)
 
-    if current_revision not in head_revisions:
+    if not current_revisions or set(current_revisions) != set(head_revisions):
         logger.error(
             "Database migration check failed: DATABASE_URL=%s current_revision=%s heads=%s",
             safe_database_url,
@@ -63,3 +129,41 @@ def verify_database_ready(engine: Engine, database_url: str | None) -> None:
         safe_database_url,
         current_revision,
     )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Migration head helpers for the Docker build and entrypoint.")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument(
+        "--write-migration-head",
+        action="store_true",
+        help="Embed the current Alembic heads into migration_head.py.",
+    )
+    group.add_argument(
+        "--check-head",
+        action="store_true",
+        help="Exit 0 when DATABASE_URL is already at the migration head (entrypoint skips `alembic upgrade`).",
+    )
+    args = parser.parse_args()
+
+    if args.write_migration_head:
+        heads = write_migration_head()
+        print(f"[startup_checks] embedded alembic heads: {','.join(heads)}")
+        return 0
+
+    from sqlalchemy import create_engine
+
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        return 1
+    engine = create_engine(database_url)
+    try:
+        return 0 if is_database_at_head(engine) else 1
+    except SQLAlchemyError:
+        return 1
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
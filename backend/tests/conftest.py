@@ -16,12 +16,15 @@ os.environ["SECRET_KEY"] = "test-suite-secret-key"
 os.environ["INTERNAL_API_KEY"] = "demo-secret-key"
 os.environ["ENABLE_BOOTSTRAP_AUTH"] = "true"
 os.environ["BOOTSTRAP_AUTH_PASSWORD"] = "fake_password"
+# Аудит пишется сразу: фоновый писатель делил бы с запросом единственное соединение in-memory SQLite
+os.environ["AUDIT_LOG_FLUSH_INTERVAL_MS"] = "0"
 
 # Импортируем ключевые компоненты нашего приложения
 import main
 import security
 from main import app
 from database import Base, get_db, DATABASE_URL
+from crud import card_access_crud, display_crud
 
 # =============================================================================
 # === Секция 1: Конфигурация тестовой среды и фикстуры Pytest ===
@@ -92,6 +95,14 @@ def client(db_session: Session): # Добавляем зависимость о
     with TestClient(app) as c:
         yield c
 
+@pytest.fixture(autouse=True)
+def _reload_security_configuration():
+    # Конфигурация безопасности читается из окружения один раз; после monkeypatch её нужно перечитать.
+    security.reload_security_configuration()
+    yield
+    security.reload_security_configuration()
+
+
 @pytest.fixture(scope="function")
 def context():
     return {}
@@ -100,6 +111,9 @@ def context():
 def db_session():
     # Создаем все таблицы перед началом теста
     Base.metadata.create_all(bind=engine)
+    # Идентификаторы кранов повторяются между тестами, кэш снимков дисплея не должен их пережить
+    display_crud.DISPLAY_SNAPSHOT_CACHE.clear()
+    card_access_crud.CARD_ACCESS_INDEX.clear()
     db = TestingSessionLocal()
     try:
         yield db
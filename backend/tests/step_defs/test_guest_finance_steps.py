@@ -234,7 +234,7 @@ def check_card_status_in_db(db_session: Session, card_uid: str, expected_status:
     Шаг проверки: находит карту по UID и проверяет, что ее статус изменился на ожидаемый.
     """
     # Находим карту в БД по ее уникальному UID
-    db_card = db_session.query(Card).filter(Card.card_uid == card_uid).one()
+    db_card = db_session.query(Card).filter(Card.card_uid == models.canonical_card_uid(card_uid)).one()
 
     print(f"[THEN] Проверка статуса карты '{card_uid}'. Ожидаемый: '{expected_status}', Фактический: '{db_card.status}'.")
     assert db_card.status == expected_status, "Статус карты в базе данных не был обновлен."
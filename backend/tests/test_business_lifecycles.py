@@ -163,3 +163,95 @@ def test_guest_and_finance_lifecycle(client):
     assert final_guest_response.status_code == 200
     # Сравниваем как float для надежности
     assert float(final_guest_response.json()["balance"]) == topup_amount
+
+
+def test_guest_history_pages_unified_ledger_with_running_balance(client, db_session):
+    """
+    История гостя читается одним запросом по объединённому журналу:
+    страницы по курсору без пропусков и повторов, баланс после каждой операции.
+    """
+    import uuid
+    from datetime import datetime, timedelta, timezone
+    from decimal import Decimal
+
+    import models
+
+    login_response = client.post("/api/token", data={"username": "admin", "password": "fake_password"})
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    assert client.post("/api/shifts/open", headers=headers).status_code in (200, 409)
+
+    guest_id = client.post(
+        "/api/guests/",
+        headers=headers,
+        json={
+            "last_name": "Ledger",
+            "first_name": "Lena",
+            "phone_number": "+15557654321",
+            "date_of_birth": "1991-03-14",
+            "id_document": "PASSPORT 654321",
+        },
+    ).json()["guest_id"]
+    card_uid = "A1B2C3D4"
+    assert client.post("/api/cards/", headers=headers, json={"card_uid": card_uid}).status_code == 201
+    assert client.post(f"/api/guests/{guest_id}/cards", headers=headers, json={"card_uid": card_uid}).status_code == 200
+    visit_response = client.post("/api/visits/open", headers=headers, json={"guest_id": guest_id, "card_uid": card_uid})
+    assert visit_response.status_code == 200
+
+    # Пополнения пишутся с серверным временем и могут совпасть до секунды — курсор должен это пережить.
+    for amount in (100, 40, 25):
+        assert client.post(
+            f"/api/guests/{guest_id}/topup", headers=headers, json={"amount": amount, "payment_method": "cash"}
+        ).status_code == 200
+    assert client.post(
+        f"/api/guests/{guest_id}/refund", headers=headers, json={"amount": 15, "payment_method": "cash"}
+    ).status_code == 200
+
+    beverage = models.Beverage(name="Ledger Stout", sell_price_per_liter=Decimal("400.00"))
+    keg = models.Keg(beverage=beverage, initial_volume_ml=30000, current_volume_ml=30000, purchase_price=Decimal("90.00"))
+    tap = models.Tap(display_name="Ledger Tap", keg=keg)
+    db_session.add_all([beverage, keg, tap])
+    db_session.flush()
+    guest = db_session.get(models.Guest, uuid.UUID(guest_id))
+    poured_at = datetime.now(timezone.utc) - timedelta(days=1)
+    for index in range(3):
+        db_session.add(
+            models.Pour(
+                client_tx_id=f"ledger-pour-{index}",
+                guest_id=guest.guest_id,
+                card_uid=card_uid,
+                tap_id=tap.tap_id,
+                keg_id=keg.keg_id,
+                volume_ml=100,
+                amount_charged=Decimal("10.00"),
+                price_per_ml_at_pour=Decimal("0.1000"),
+                poured_at=poured_at,
+            )
+        )
+        guest.balance -= Decimal("10.00")
+    db_session.commit()
+
+    full = client.get(f"/api/guests/{guest_id}/history", headers=headers, params={"limit": 500}).json()
+    assert full["has_more"] is False
+    items = full["history"]
+    assert [item["type"] for item in items].count("pour") == 3
+    assert "visit_card_issue" in {item["type"] for item in items}
+    assert Decimal(items[0]["balance_after"]) == Decimal(str(guest.balance))
+    for newer, older in zip(items, items[1:]):
+        assert Decimal(older["balance_after"]) == Decimal(newer["balance_after"]) - Decimal(newer["amount"])
+    assert Decimal(items[-1]["balance_after"]) == Decimal(items[-1]["amount"])
+
+    paged = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get(f"/api/guests/{guest_id}/history", headers=headers, params=params).json()
+        paged.extend(page["history"])
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            break
+    assert paged == items
+
+    invalid = client.get(f"/api/guests/{guest_id}/history", headers=headers, params={"cursor": "broken"})
+    assert invalid.status_code == 422
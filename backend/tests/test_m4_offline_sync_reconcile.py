@@ -1,7 +1,13 @@
+from datetime import datetime, timezone
 from decimal import Decimal
+import threading
 import uuid
 
+import pytest
+
 import models
+import schemas
+from conftest import TestingSessionLocal, USE_POSTGRES
 
 
 def _login(client):
@@ -546,3 +552,141 @@ def test_sync_conflict_returns_409_and_audits(client):
     audit_resp = client.get("/api/audit/", headers=headers)
     assert audit_resp.status_code == 200
     assert any(log["action"] == "sync_conflict" for log in audit_resp.json())
+
+
+def test_balance_changes_are_posted_to_ledger_with_snapshots(client, db_session, monkeypatch):
+    from crud import balance_ledger_crud
+
+    monkeypatch.setenv("BALANCE_SNAPSHOT_INTERVAL", "2")
+    headers, guest_id, visit_id, tap_id = _prepare_active_visit(client, suffix="92009", card_uid="CARD-M4-009")
+    for short_id, volume_ml in (("L92001", 200), ("L92002", 0)):
+        auth = client.post(
+            "/api/visits/authorize-pour",
+            headers=headers,
+            json={"card_uid": "CARD-M4-009", "tap_id": tap_id},
+        )
+        assert auth.status_code == 200
+        if volume_ml:
+            sync_resp = client.post(
+                "/api/sync/pours",
+                headers={"X-Internal-Token": "demo-secret-key"},
+                json={
+                    "pours": [
+                        {
+                            "client_tx_id": "m4-ledger-009",
+                            "card_uid": "CARD-M4-009",
+                            "tap_id": tap_id,
+                            "short_id": short_id,
+                            "duration_ms": 4000,
+                            "volume_ml": volume_ml,
+                            "price_cents": 0,
+                        }
+                    ]
+                },
+            )
+            assert sync_resp.json()["results"][0]["status"] == "accepted"
+        else:
+            rec = client.post(
+                f"/api/visits/{visit_id}/reconcile-pour",
+                headers=headers,
+                json={
+                    "tap_id": tap_id,
+                    "short_id": short_id,
+                    "volume_ml": 100,
+                    "amount": "50.00",
+                    "duration_ms": 3000,
+                    "reason": "sync_timeout",
+                    "comment": "ledger",
+                },
+            )
+            assert rec.status_code == 200
+    refund = client.post(f"/api/guests/{guest_id}/refund", headers=headers, json={"amount": 30, "payment_method": "cash"})
+    assert refund.status_code == 200
+
+    guest_uuid = uuid.UUID(guest_id)
+    entries = (
+        db_session.query(models.GuestBalanceLedgerEntry)
+        .filter(models.GuestBalanceLedgerEntry.guest_id == guest_uuid)
+        .order_by(models.GuestBalanceLedgerEntry.sequence)
+        .all()
+    )
+    assert [(entry.sequence, entry.kind, entry.contra_account) for entry in entries] == [
+        (1, "top-up", "payment:cash"),
+        (2, "pour", "sales"),
+        (3, "pour", "sales"),
+        (4, "refund", "payment:cash"),
+    ]
+    assert [entry.amount for entry in entries] == [Decimal("500.00"), Decimal("-100.00"), Decimal("-50.00"), Decimal("-30.00")]
+    snapshots = db_session.query(models.GuestBalanceSnapshot).filter(models.GuestBalanceSnapshot.guest_id == guest_uuid).all()
+    assert sorted((snapshot.sequence, snapshot.balance) for snapshot in snapshots) == [
+        (2, Decimal("400.00")),
+        (4, Decimal("320.00")),
+    ]
+
+    guest = db_session.get(models.Guest, guest_uuid)
+    db_session.refresh(guest)
+    assert balance_ledger_crud.get_ledger_balance(db_session, guest_uuid) == guest.balance == Decimal("320.00")
+    assert balance_ledger_crud.get_guest_balance_at(db_session, guest_uuid, datetime.now(timezone.utc)) == Decimal("320.00")
+    assert balance_ledger_crud.get_guest_balance_at(db_session, guest_uuid, datetime(2000, 1, 1, tzinfo=timezone.utc)) == 0
+    assert balance_ledger_crud.verify_balance_ledger(db_session) == []
+
+    shift_id = client.get("/api/shifts/current", headers=headers).json()["shift"]["id"]
+    totals = client.get(f"/api/shifts/{shift_id}/reports/x", headers=headers).json()["totals"]
+    assert totals["topup_amount_cents"] == 50000
+    assert totals["refund_amount_cents"] == 3000
+
+    # Правка баланса в обход журнала должна всплыть в проверке.
+    guest.balance = Decimal("999.00")
+    db_session.commit()
+    drifts = balance_ledger_crud.verify_balance_ledger(db_session)
+    assert [(drift.guest_id, drift.ledger_balance) for drift in drifts] == [(guest_uuid, Decimal("320.00"))]
+
+
+@pytest.mark.skipif(not USE_POSTGRES, reason="row-level concurrency needs Postgres (TEST_USE_POSTGRES=1)")
+def test_concurrent_balance_postings_for_one_guest_get_distinct_sequences(client, db_session):
+    from crud import balance_ledger_crud, transaction_crud
+
+    _headers, guest_id, _visit_id, _tap_id = _prepare_active_visit(client, suffix="92010", card_uid="CARD-M4-010")
+    guest_uuid = uuid.UUID(guest_id)
+    first, second = TestingSessionLocal(), TestingSessionLocal()
+    errors = []
+    second_posted = threading.Event()
+
+    def topup_second():
+        try:
+            transaction_crud.create_topup_transaction(
+                second, guest_uuid, schemas.TopUpRequest(amount=Decimal("20.00"), payment_method="card")
+            )
+            second_posted.set()
+        except Exception as exc:  # pragma: no cover - surfaced below
+            errors.append(exc)
+            second.rollback()
+
+    try:
+        # Первая транзакция держит гостя, как параллельная синхронизация налива.
+        guest = balance_ledger_crud.lock_guest(first, guest_uuid)
+        guest.balance -= Decimal("10.00")
+        balance_ledger_crud.post_balance_entry(
+            first, guest, amount=Decimal("-10.00"), kind="pour", contra_account=balance_ledger_crud.CONTRA_SALES
+        )
+        first.flush()
+        worker = threading.Thread(target=topup_second)
+        worker.start()
+        assert not second_posted.wait(0.5)
+        first.commit()
+        worker.join(timeout=10)
+        assert not worker.is_alive()
+    finally:
+        first.close()
+        second.close()
+
+    assert errors == []
+    entries = (
+        db_session.query(models.GuestBalanceLedgerEntry)
+        .filter(models.GuestBalanceLedgerEntry.guest_id == guest_uuid)
+        .order_by(models.GuestBalanceLedgerEntry.sequence)
+        .all()
+    )
+    assert [(entry.sequence, entry.kind) for entry in entries] == [(1, "top-up"), (2, "pour"), (3, "top-up")]
+    assert balance_ledger_crud.get_ledger_balance(db_session, guest_uuid) == Decimal("510.00")
+    assert balance_ledger_crud.verify_balance_ledger(db_session) == []
@@ -1,7 +1,12 @@
 from datetime import date, timedelta
+import threading
 import uuid
 
+import pytest
+
 import models
+from crud import rollup_crud
+from conftest import TestingSessionLocal, USE_POSTGRES
 
 
 def _login(client):
@@ -247,3 +252,145 @@ def test_z_report_date_range_listing(client):
         assert "generated_at" in item
         assert "total_volume_ml" in item
         assert "total_amount_cents" in item
+
+
+def test_x_report_reads_hourly_rollups_and_consistency_check_repairs_drift(client, db_session):
+    headers = _login(client)
+    shift_id = _open_shift(client, headers)
+    _create_synced_pour_for_open_shift(client, headers, suffix="94201")
+
+    shift = db_session.query(models.Shift).filter(models.Shift.id == uuid.UUID(shift_id)).one()
+    shift.opened_at = shift.opened_at - timedelta(hours=5)
+    pour = db_session.query(models.Pour).filter(models.Pour.client_tx_id == "m5-report-sync-94201").one()
+    for hours_ago, sync_status in ((1, "synced"), (2, "reconciled"), (3, "pending_sync"), (4, "synced")):
+        db_session.add(
+            models.Pour(
+                client_tx_id=f"m5-rollup-{hours_ago}",
+                guest_id=pour.guest_id,
+                card_uid=pour.card_uid,
+                visit_id=pour.visit_id,
+                tap_id=pour.tap_id,
+                keg_id=pour.keg_id,
+                volume_ml=100,
+                amount_charged=pour.amount_charged / 2,
+                price_per_ml_at_pour=pour.price_per_ml_at_pour,
+                sync_status=sync_status,
+                poured_at=pour.poured_at - timedelta(hours=hours_ago, minutes=10),
+            )
+        )
+    db_session.commit()
+    assert db_session.query(models.PourHourlyRollup).count() >= 3
+
+    payload = client.get(f"/api/shifts/{shift_id}/reports/x", headers=headers).json()
+    assert payload["totals"]["pours_count"] == 5
+    assert payload["totals"]["total_volume_ml"] == 600
+    assert payload["totals"]["total_amount_cents"] == 30000
+    assert payload["totals"]["pending_sync_count"] == 1
+    assert payload["totals"]["reconciled_count"] == 1
+    assert payload["by_tap"][0]["pours_count"] == 5
+
+    db_session.query(models.Pour).filter(models.Pour.client_tx_id == "m5-rollup-4").delete(
+        synchronize_session=False
+    )
+    db_session.commit()
+
+    consistency = client.get("/api/reports/pour-rollups/consistency", headers=headers)
+    assert consistency.status_code == 200
+    assert consistency.json()["consistent"] is False
+    assert {item["field"] for item in consistency.json()["mismatches"]} >= {"pours_count", "volume_ml"}
+
+    rebuild = client.post("/api/reports/pour-rollups/rebuild", headers=headers)
+    assert rebuild.status_code == 200
+    assert rebuild.json()["repaired"] is True
+    assert client.get("/api/reports/pour-rollups/consistency", headers=headers).json()["consistent"] is True
+
+    payload = client.get(f"/api/shifts/{shift_id}/reports/x", headers=headers).json()
+    assert payload["totals"]["pours_count"] == 4
+    assert payload["totals"]["total_volume_ml"] == 500
+
+
+def _rollup_clone(pour, suffix: str, **overrides):
+    values = dict(
+        client_tx_id=f"m5-rollup-{suffix}",
+        guest_id=pour.guest_id,
+        card_uid=pour.card_uid,
+        visit_id=pour.visit_id,
+        tap_id=pour.tap_id,
+        keg_id=pour.keg_id,
+        volume_ml=100,
+        amount_charged=pour.amount_charged / 2,
+        price_per_ml_at_pour=pour.price_per_ml_at_pour,
+        sync_status="synced",
+        poured_at=pour.poured_at,
+    )
+    values.update(overrides)
+    return models.Pour(**values)
+
+
+def test_pour_rollups_follow_updates_moves_and_deletes_incrementally(client, db_session):
+    headers = _login(client)
+    _open_shift(client, headers)
+    _create_synced_pour_for_open_shift(client, headers, suffix="94202")
+    pour = db_session.query(models.Pour).filter(models.Pour.client_tx_id == "m5-report-sync-94202").one()
+
+    moved = _rollup_clone(pour, "moved", sync_status="pending_sync", poured_at=pour.poured_at - timedelta(hours=2))
+    dropped = _rollup_clone(pour, "dropped", poured_at=pour.poured_at - timedelta(hours=2))
+    db_session.add_all([moved, dropped])
+    db_session.commit()
+
+    moved.sync_status = "reconciled"
+    moved.volume_ml = 150
+    moved.poured_at = pour.poured_at - timedelta(hours=3)
+    db_session.delete(dropped)
+    db_session.commit()
+
+    report = rollup_crud.verify_pour_rollups(db_session)
+    assert report.consistent is True, report.mismatches
+    moved_bucket = db_session.get(
+        models.PourHourlyRollup, (rollup_crud.bucket_start_for(moved.poured_at), moved.tap_id)
+    )
+    assert (moved_bucket.pours_count, moved_bucket.volume_ml, moved_bucket.reconciled_count) == (1, 150, 1)
+
+
+@pytest.mark.skipif(not USE_POSTGRES, reason="row-level concurrency needs Postgres (TEST_USE_POSTGRES=1)")
+def test_concurrent_pours_in_one_rollup_bucket_both_commit(client, db_session):
+    headers = _login(client)
+    _open_shift(client, headers)
+    _create_synced_pour_for_open_shift(client, headers, suffix="94203")
+    pour = db_session.query(models.Pour).filter(models.Pour.client_tx_id == "m5-report-sync-94203").one()
+    poured_at = pour.poured_at - timedelta(hours=6)
+
+    first, second = TestingSessionLocal(), TestingSessionLocal()
+    errors = []
+    second_flushed = threading.Event()
+
+    def flush_second():
+        try:
+            second.add(_rollup_clone(pour, "concurrent-2", poured_at=poured_at))
+            # Блокируется на строке агрегата, пока первая транзакция не завершится.
+            second.flush()
+            second_flushed.set()
+            second.commit()
+        except Exception as exc:  # pragma: no cover - surfaced below
+            errors.append(exc)
+            second.rollback()
+
+    try:
+        # Ни одна транзакция не видит наливов другой: обе начинают с пустого часа.
+        first.add(_rollup_clone(pour, "concurrent-1", poured_at=poured_at))
+        first.flush()
+        worker = threading.Thread(target=flush_second)
+        worker.start()
+        assert not second_flushed.wait(0.5)
+        first.commit()
+        worker.join(timeout=10)
+        assert not worker.is_alive()
+    finally:
+        first.close()
+        second.close()
+
+    assert errors == []
+    bucket = db_session.get(models.PourHourlyRollup, (rollup_crud.bucket_start_for(poured_at), pour.tap_id))
+    assert bucket.pours_count == 2
+    assert bucket.volume_ml == 200
+    assert rollup_crud.verify_pour_rollups(db_session).consistent is True
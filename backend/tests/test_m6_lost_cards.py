@@ -1,6 +1,9 @@
 import json
 
+from sqlalchemy import delete, event
+
 import models
+from crud import card_access_crud, card_crud
 
 
 def _login(client):
@@ -353,3 +356,81 @@ def test_resolve_unknown_card_returns_empty_payload(client):
     assert body["lookup_outcome"] == "unknown_card"
     assert body["recommended_action"] == "issue_on_open_visit"
     assert body["allowed_next_actions"] == ["issue_on_open_visit"]
+
+
+def test_card_uids_are_stored_canonical_and_resolved_in_one_query(client, db_session):
+    headers, guest_id, visit_id, _, _ = _prepare_active_visit_with_tap(
+        client, suffix="96008", card_uid="  CARD-M6-008 "
+    )
+    report = client.post(
+        f"/api/visits/{visit_id}/report-lost-card",
+        headers=headers,
+        json={"reason": "guest_reported_loss"},
+    )
+    assert report.status_code == 200
+
+    assert db_session.query(models.Card).filter(models.Card.card_uid == "card-m6-008").one()
+    assert db_session.query(models.LostCard).filter(models.LostCard.card_uid == "card-m6-008").one()
+    db_session.expire_all()
+
+    statements = []
+
+    def _record(_conn, _cursor, statement, *_args):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        body = card_crud.resolve_card(db_session, "Card-M6-008")
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+    assert len(statements) == 1
+    assert body["card_uid"] == "card-m6-008"
+    assert body["lookup_outcome"] == "active_blocked_lost_card"
+    assert str(body["active_visit"]["visit_id"]) == visit_id
+    assert str(body["guest"]["guest_id"]) == guest_id
+    assert body["lost_card"]["reason"] == "guest_reported_loss"
+
+
+def test_card_access_index_answers_from_memory_and_follows_commits(client, db_session):
+    headers, _, visit_id, _, _ = _prepare_active_visit_with_tap(
+        client, suffix="96009", card_uid="CARD-M6-009"
+    )
+    warm = card_access_crud.get_card_access(db_session, "card-m6-009")
+    assert warm.is_lost is False
+    assert str(warm.active_visit.visit_id) == visit_id
+
+    statements = []
+
+    def _record(_conn, _cursor, statement, *_args):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        cached = card_access_crud.get_card_access(db_session, "card-m6-009")
+        unknown = card_access_crud.get_card_access(db_session, "card-m6-unknown")
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    assert statements == []
+    assert cached == warm
+    assert unknown.is_lost is False and unknown.active_visit is None
+
+    report = client.post(
+        f"/api/visits/{visit_id}/report-lost-card",
+        headers=headers,
+        json={"reason": "guest_reported_loss"},
+    )
+    assert report.status_code == 200
+    reported = card_access_crud.get_card_access(db_session, "card-m6-009")
+    assert reported.is_lost is True
+    assert reported.active_visit.operational_status == "active_blocked_lost_card"
+    assert card_access_crud.verify_card_access_index(db_session) == 0
+
+    # Core DELETE обходит хуки сессии, как запись из другого процесса; самопроверка должна это заметить.
+    db_session.execute(delete(models.LostCard).where(models.LostCard.card_uid == "card-m6-009"))
+    db_session.commit()
+    assert card_access_crud.get_card_access(db_session, "card-m6-009").is_lost is True
+    assert card_access_crud.verify_card_access_index(db_session) == 1
+    assert card_access_crud.get_card_access(db_session, "card-m6-009").is_lost is False
@@ -1,8 +1,18 @@
+import importlib.util
 import json
-from datetime import date, datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import String, cast
+from sqlalchemy.dialects import postgresql
 
 import models
+import schemas
+import security
+from crud import operator_crud
 from operator_stream import operator_stream_hub
 
 
@@ -180,7 +190,7 @@ def _seed_closed_timeout_visit(db_session):
 
 def _seed_operator_pour_extras(db_session):
     now = datetime.now(timezone.utc)
-    visit = db_session.query(models.Visit).filter(models.Visit.card_uid == "04AB7815CD6B80").first()
+    visit = db_session.query(models.Visit).filter(models.Visit.card_uid == "04ab7815cd6b80").first()
     tap = db_session.query(models.Tap).filter(models.Tap.tap_id == 1).first()
     keg = db_session.query(models.Keg).first()
     assert visit is not None
@@ -425,6 +435,163 @@ def test_operator_pours_return_unified_journal_filters_and_detail(client, db_ses
     assert detail_payload["safe_actions"]["open_tap"]["allowed"] is True
 
 
+def test_operator_pours_keyset_pages_cover_merged_journal(client, db_session, monkeypatch):
+    from crud import operator_crud
+
+    _seed_operator_fixture(db_session)
+    _seed_operator_pour_extras(db_session)
+    guest = db_session.query(models.Guest).first()
+    card = db_session.query(models.Card).first()
+    visit = db_session.query(models.Visit).first()
+    tap = db_session.query(models.Tap).filter(models.Tap.tap_id == 1).first()
+    keg = db_session.query(models.Keg).first()
+    shared_at = datetime.now(timezone.utc)
+    for index in range(7):
+        db_session.add(
+            models.Pour(
+                client_tx_id=f"operator-page-{index}",
+                guest=guest,
+                card=card,
+                card_uid=card.card_uid,
+                visit=visit,
+                tap=tap,
+                keg=keg,
+                volume_ml=100,
+                amount_charged=Decimal("70.00"),
+                price_per_ml_at_pour=Decimal("0.7000"),
+                duration_ms=1000,
+                sync_status="synced",
+                poured_at=shared_at,
+                authorized_at=shared_at,
+                synced_at=shared_at,
+            )
+        )
+    db_session.commit()
+    monkeypatch.setattr(operator_crud, "OPERATOR_POUR_SOURCE_BATCH", 2)
+    headers = _auth_headers(client, "shift_lead")
+
+    full = client.get("/api/operator/pours", headers=headers).json()
+    assert schemas.OperatorPourJournalModel.model_validate(full).items[0].pour_ref == full["items"][0]["pour_ref"]
+    assert full["has_more"] is False
+    assert full["next_cursor"] is None
+
+    paged_refs = []
+    cursor = None
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/api/operator/pours", params=params, headers=headers)
+        assert page.status_code == 200
+        payload = page.json()
+        assert len(payload["items"]) <= 3
+        paged_refs.extend(item["pour_ref"] for item in payload["items"])
+        cursor = payload["next_cursor"]
+        if not payload["has_more"]:
+            break
+
+    assert len(paged_refs) == len(set(paged_refs))
+    assert paged_refs == [item["pour_ref"] for item in full["items"]]
+    assert len(paged_refs) == 11
+
+    invalid = client.get("/api/operator/pours", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert invalid.status_code == 422
+
+
+def test_operator_pours_show_pour_time_but_page_by_sync_time(client, db_session):
+    _seed_operator_fixture(db_session)
+    guest = db_session.query(models.Guest).first()
+    card = db_session.query(models.Card).first()
+    visit = db_session.query(models.Visit).first()
+    tap = db_session.query(models.Tap).filter(models.Tap.tap_id == 1).first()
+    keg = db_session.query(models.Keg).first()
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    offline_poured_at = now - timedelta(minutes=2)
+    online_poured_at = now - timedelta(minutes=1)
+    pours = {}
+    for name, poured_at, synced_at in (
+        ("offline", offline_poured_at, now),
+        ("online", online_poured_at, online_poured_at),
+    ):
+        pours[name] = models.Pour(
+            client_tx_id=f"operator-time-{name}",
+            guest=guest,
+            card=card,
+            card_uid=card.card_uid,
+            visit=visit,
+            tap=tap,
+            keg=keg,
+            volume_ml=100,
+            amount_charged=Decimal("70.00"),
+            price_per_ml_at_pour=Decimal("0.7000"),
+            duration_ms=1000,
+            sync_status="synced",
+            poured_at=poured_at,
+            authorized_at=poured_at,
+            synced_at=synced_at,
+        )
+        db_session.add(pours[name])
+    db_session.commit()
+    headers = _auth_headers(client, "shift_lead")
+
+    journal = []
+    cursor = None
+    while True:
+        params = {"limit": 1, **({"cursor": cursor} if cursor else {})}
+        payload = client.get("/api/operator/pours", params=params, headers=headers).json()
+        journal.extend(payload["items"])
+        cursor = payload["next_cursor"]
+        if not payload["has_more"]:
+            break
+
+    position = {item["pour_id"]: index for index, item in enumerate(journal) if item["pour_id"]}
+    offline = journal[position[str(pours["offline"].pour_id)]]
+    online = journal[position[str(pours["online"].pour_id)]]
+    # The offline pour is journaled when it synced, but still shows when it was poured.
+    assert position[offline["pour_id"]] < position[online["pour_id"]]
+    assert datetime.fromisoformat(offline["occurred_at"]) == offline_poured_at
+    assert datetime.fromisoformat(online["occurred_at"]) == online_poured_at
+
+
+def test_operator_reads_answer_if_none_match_with_304_and_compress_large_bodies(client, db_session):
+    _seed_operator_fixture(db_session)
+    headers = _auth_headers(client, "shift_lead")
+
+    first = client.get("/api/operator/taps", headers={**headers, "Accept-Encoding": "gzip"})
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert first.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in first.headers["vary"].lower()
+
+    # ETag считается по несжатому телу, поэтому не зависит от Accept-Encoding.
+    plain = client.get("/api/operator/taps", headers={**headers, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["etag"] == etag
+    assert plain.json() == first.json()
+
+    not_modified = client.get("/api/operator/taps", headers={**headers, "If-None-Match": f'"other", {etag}'})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+
+    tap = db_session.query(models.Tap).filter(models.Tap.tap_id == 1).first()
+    tap.display_name = "Renamed tap"
+    db_session.commit()
+    changed = client.get("/api/operator/taps", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+    journal = client.get("/api/operator/pours", headers={**headers, "Accept-Encoding": "identity"})
+    assert journal.headers["content-length"] == str(len(journal.content))
+    repeated = client.get("/api/operator/pours", headers={**headers, "If-None-Match": journal.headers["etag"]})
+    assert repeated.status_code == 304
+
+    # Ошибки и ответы вне операторского API не получают ETag.
+    assert "etag" not in client.get("/api/operator/taps/999", headers=headers).headers
+    assert "etag" not in client.get("/", headers=headers).headers
+
+
 def test_operator_search_returns_grouped_results_across_operator_entities(client, db_session):
     _seed_operator_fixture(db_session)
     headers = _auth_headers(client, "shift_lead")
@@ -457,6 +624,27 @@ def test_operator_search_returns_grouped_results_across_operator_entities(client
     assert card_groups["cards"]["items"][0]["route"] == "cards-guests"
 
 
+def test_operator_search_clauses_match_trigram_index_expressions():
+    from crud import operator_crud
+
+    migration_path = Path(__file__).resolve().parents[1] / "alembic" / "versions" / "0017_operator_search_trgm.py"
+    spec = importlib.util.spec_from_file_location("operator_search_trgm", migration_path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    compiled = " ".join(
+        str(clause.compile(dialect=postgresql.dialect()))
+        for clause in (
+            operator_crud._pour_search_clause("%x%"),
+            operator_crud._search_like(models.Visit.card_uid, "%x%"),
+            operator_crud._search_like(cast(models.Visit.visit_id, String), "%x%"),
+            operator_crud._search_like(models.Card.card_uid, "%x%"),
+        )
+    )
+    for _index_name, table_name, expression in migration.SEARCH_INDEXES:
+        assert expression in compiled.replace(f"{table_name}.", "")
+
+
 def test_operator_system_health_returns_mode_queue_and_blocked_actions(client, db_session):
     _seed_operator_fixture(db_session)
     headers = _auth_headers(client, "shift_lead")
@@ -544,3 +732,29 @@ def test_operator_stream_ticket_and_websocket_emit_invalidations(client, db_sess
         assert invalidation["entity_id"] == "visit-123"
         assert invalidation["severity"] == "warning"
         assert invalidation["reason"] == "test_invalidation"
+
+
+def test_action_policies_are_compiled_once_per_role_and_context():
+    shift_lead = {"username": "lead", "permissions": sorted(security.ROLE_PERMISSIONS["shift_lead"])}
+    operator = {"username": "op", "permissions": sorted(security.ROLE_PERMISSIONS["operator"])}
+
+    first = operator_crud._tap_action_policies(shift_lead)
+    assert operator_crud._tap_action_policies(dict(shift_lead)) is first
+    assert first.stop.allowed is True
+    denied = operator_crud._tap_action_policies(operator)
+    assert denied is not first
+    assert denied.stop.allowed is False
+    assert denied.stop.disabled_reason == "Requires permission: taps_control"
+    with pytest.raises(ValidationError):
+        first.stop.allowed = False
+
+    active = operator_crud._compiled_session_action_policies(
+        operator_crud._permissions(shift_lead), is_active=True, has_card=True, is_blocked_lost=False
+    )
+    closed = operator_crud._compiled_session_action_policies(
+        operator_crud._permissions(shift_lead), is_active=False, has_card=True, is_blocked_lost=False
+    )
+    assert active.close.allowed is True
+    assert closed.close.allowed is False
+    assert closed.close.disabled_reason == "Session is already closed."
+    assert closed.force_unlock.confirm_required is True
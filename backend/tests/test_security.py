@@ -1,3 +1,18 @@
+import asyncio
+import os
+import signal
+import threading
+import time
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+import models
+import security
+from audit_queue import AuditLogQueue
+
+
 def test_unauthorized_access_to_protected_route(client):
     response = client.get('/api/kegs/')
     assert response.status_code == 401
@@ -38,6 +53,7 @@ def test_controller_register_requires_internal_auth(client):
 
 def test_login_is_disabled_when_bootstrap_auth_is_disabled(client, monkeypatch):
     monkeypatch.setenv('ENABLE_BOOTSTRAP_AUTH', 'false')
+    security.reload_security_configuration()
     response = client.post('/api/token', data={'username': 'admin', 'password': 'fake_password'})
     assert response.status_code == 503
     assert 'Bootstrap auth is disabled' in response.json()['detail']
@@ -45,6 +61,7 @@ def test_login_is_disabled_when_bootstrap_auth_is_disabled(client, monkeypatch):
 
 def test_internal_token_with_quotes_is_accepted_on_internal_route(client, monkeypatch):
     monkeypatch.setenv('INTERNAL_API_KEY', '"demo-secret-key"')
+    security.reload_security_configuration()
     response = client.post('/api/controllers/flow-events', headers={'X-Internal-Token': 'demo-secret-key'}, json=_flow_event_payload())
     assert response.status_code == 202
 
@@ -52,5 +69,119 @@ def test_internal_token_with_quotes_is_accepted_on_internal_route(client, monkey
 def test_demo_internal_token_still_works_on_internal_route_when_enabled(client, monkeypatch):
     monkeypatch.setenv('INTERNAL_API_KEY', 'my-prod-key')
     monkeypatch.setenv('ALLOW_LEGACY_DEMO_INTERNAL_TOKEN', 'true')
+    security.reload_security_configuration()
     response = client.post('/api/controllers/flow-events', headers={'X-Internal-Token': 'demo-secret-key'}, json=_flow_event_payload())
     assert response.status_code == 202
+
+
+def test_audit_queue_batches_rows_drops_overflow_and_flushes_on_stop(client, db_session):
+    engine = db_session.get_bind()
+    audit_queue = AuditLogQueue(sessionmaker(bind=engine), max_size=3, batch_size=10, flush_interval_ms=60000)
+    audit_queue.start()
+    accepted = [audit_queue.submit(actor_id="admin", action=f"POST_/api/test/{index}") for index in range(4)]
+    assert accepted == [True, True, True, False]
+    metrics = audit_queue.get_metrics()
+    assert metrics["depth"] == 3
+    assert metrics["dropped"] == 1
+
+    inserts = []
+
+    def _record(_conn, _cursor, statement, *_args):
+        if statement.startswith("INSERT INTO audit_logs"):
+            inserts.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        audit_queue.stop()
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+    assert len(inserts) == 1
+    actions = {row.action for row in db_session.query(models.AuditLog).filter(models.AuditLog.action.like("POST_/api/test/%"))}
+    assert actions == {"POST_/api/test/0", "POST_/api/test/1", "POST_/api/test/2"}
+    assert audit_queue.get_metrics() == {
+        "depth": 0,
+        "max_size": 3,
+        "enqueued": 3,
+        "written": 3,
+        "dropped": 1,
+        "failed": 0,
+        "batches": 1,
+    }
+
+    login = client.post("/api/token", data={"username": "admin", "password": "fake_password"})
+    response = client.get(
+        "/api/system/audit-queue",
+        headers={"Authorization": f"Bearer {login.json()['access_token']}"},
+    )
+    assert response.status_code == 200
+    assert set(response.json()) == {"depth", "max_size", "enqueued", "written", "dropped", "failed", "batches"}
+
+
+def test_bearer_tokens_are_verified_once_and_forgotten_on_reload(client, monkeypatch):
+    login = client.post('/api/token', data={'username': 'operator', 'password': 'fake_password'})
+    headers = {'Authorization': f"Bearer {login.json()['access_token']}"}
+
+    decoded = []
+    jose_jwt = security._jwt()
+    real_decode = jose_jwt.decode
+
+    def _counting_decode(*args, **kwargs):
+        decoded.append(args[0])
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(jose_jwt, 'decode', _counting_decode)
+    for _ in range(3):
+        response = client.get('/api/me', headers=headers)
+        assert response.status_code == 200
+        assert response.json()['role'] == 'operator'
+    assert len(decoded) == 1
+
+    monkeypatch.setenv('SECRET_KEY', 'rotated-secret-key')
+    security.reload_security_configuration()
+    assert client.get('/api/me', headers=headers).status_code == 401
+    assert len(decoded) == 2
+
+
+def test_verified_token_cache_drops_expired_and_least_recent_entries(monkeypatch):
+    cache = security.VerifiedTokenCache(max_size=2)
+    now = 1_000_000.0
+    monkeypatch.setattr(security.time, 'time', lambda: now)
+    cache.store('a', expires_at=now + 60, principal={'username': 'a'})
+    cache.store('b', expires_at=now + 1, principal={'username': 'b'})
+    assert cache.get('a') == {'username': 'a'}
+    cache.store('c', expires_at=now + 60, principal={'username': 'c'})
+    assert cache.get('b') is None
+
+    now += 120
+    assert cache.get('a') is None
+    assert cache.get('c') is None
+
+
+def test_token_comparison_accepts_exact_matches_only():
+    assert security.constant_time_equals('demo-secret-key', 'demo-secret-key')
+    assert not security.constant_time_equals('demo-secret-key', 'demo-secret-kez')
+    assert not security.constant_time_equals(None, 'demo-secret-key')
+    assert security._matches_any_token('токен', frozenset({'other', 'токен'}))
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGHUP"), reason="SIGHUP is not available on this platform")
+def test_sighup_reload_runs_as_event_loop_callback(monkeypatch):
+    reloads = []
+    monkeypatch.setattr(security, "reload_security_configuration", lambda: reloads.append(threading.current_thread()))
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        assert security.install_reload_signal_handler(loop) is True
+        try:
+            # Запрос держит блокировку настроек: перечитывание должно дождаться его, а не прервать.
+            with security._settings_lock:
+                os.kill(os.getpid(), signal.SIGHUP)
+                time.sleep(0.05)
+                assert reloads == []
+            await asyncio.sleep(0.05)
+        finally:
+            security.remove_reload_signal_handler(loop)
+
+    asyncio.run(scenario())
+    assert reloads == [threading.main_thread()]
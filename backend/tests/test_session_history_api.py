@@ -1,3 +1,12 @@
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import event
+
+import models
+from crud import visit_crud
+
+
 
 def _login(client):
     response = client.post('/api/token', data={'username': 'admin', 'password': 'fake_password'})
@@ -82,3 +91,107 @@ def test_session_history_detail_returns_display_context_placeholder_when_not_sav
     payload = detail_resp.json()
     assert payload['display_context']['available'] is False
     assert 'не был сохранён' in payload['display_context']['note']
+
+
+def _seed_history_visits(db_session, count: int):
+    now = datetime.now(timezone.utc)
+    beverage = models.Beverage(name='History Lager', sell_price_per_liter=Decimal('500.00'))
+    keg = models.Keg(beverage=beverage, initial_volume_ml=50000, current_volume_ml=50000, purchase_price=Decimal('1000.00'))
+    tap = models.Tap(tap_id=1, display_name='Tap 1', status='active', keg=keg)
+    db_session.add(tap)
+    visits = []
+    for index in range(count):
+        guest = models.Guest(
+            last_name=f'Batch{index}',
+            first_name='Guest',
+            phone_number=f'+7999100{index:04d}',
+            date_of_birth=date(1990, 1, 1),
+            id_document=f'BATCH-{index}',
+            balance=Decimal('100.00'),
+        )
+        card = models.Card(card_uid=f'BATCH-CARD-{index}', status='assigned_to_visit')
+        visit = models.Visit(
+            guest=guest,
+            card=card,
+            card_uid=card.card_uid,
+            status='closed' if index % 2 else 'active',
+            operational_status='closed_ok' if index % 2 else 'active_assigned',
+            opened_at=now - timedelta(minutes=30 + index),
+            closed_at=now - timedelta(minutes=5) if index % 2 else None,
+            closed_reason='guest_checkout' if index % 2 else None,
+        )
+        db_session.add(visit)
+        db_session.flush()
+        db_session.add(
+            models.Pour(
+                client_tx_id=f'batch-{index}',
+                guest=guest,
+                card=card,
+                card_uid=card.card_uid,
+                visit=visit,
+                tap=tap,
+                keg=keg,
+                volume_ml=100 + index,
+                amount_charged=Decimal('50.00'),
+                price_per_ml_at_pour=Decimal('0.5000'),
+                duration_ms=1000,
+                sync_status='pending_sync' if index % 3 == 0 else 'synced',
+                poured_at=now - timedelta(minutes=20),
+                authorized_at=now - timedelta(minutes=21),
+                synced_at=now - timedelta(minutes=19),
+                short_id=f'BT{index:04d}',
+            )
+        )
+        if index % 2 == 0:
+            db_session.add(
+                models.AuditLog(
+                    actor_id='controller',
+                    action='card_in_use_on_other_tap',
+                    target_entity='Visit',
+                    target_id=str(visit.visit_id),
+                    details='{"requested_tap_id": 2, "active_tap_id": 1}',
+                )
+            )
+        if index % 4 == 1:
+            db_session.add(
+                models.NonSaleFlow(
+                    event_id=f'batch-flow-{index}',
+                    tap=tap,
+                    keg=keg,
+                    volume_ml=40,
+                    accounted_volume_ml=40,
+                    duration_ms=500,
+                    flow_category='closed_valve_flow',
+                    session_state='idle',
+                    reason='flow_without_session',
+                    short_id=f'BT{index:04d}',
+                    last_seen_at=now - timedelta(minutes=10),
+                )
+            )
+        visits.append(visit)
+    db_session.commit()
+    return visits
+
+
+def test_session_history_batch_builder_matches_per_visit_items(db_session):
+    _seed_history_visits(db_session, 12)
+    visits = db_session.query(models.Visit).order_by(models.Visit.opened_at.desc()).all()
+    expected = [visit_crud._build_session_history_item(db_session, visit).model_dump() for visit in visits]
+    assert any(item['contains_non_sale_flow'] for item in expected)
+    assert any(item['has_incident'] for item in expected)
+    db_session.expire_all()
+
+    statements = []
+
+    def _count(*_args, **_kwargs):
+        statements.append(1)
+
+    engine = db_session.get_bind()
+    event.listen(engine, 'before_cursor_execute', _count)
+    try:
+        items = visit_crud.get_session_history(db_session)
+    finally:
+        event.remove(engine, 'before_cursor_execute', _count)
+
+    assert [item.model_dump() for item in items] == expected
+    assert len(statements) <= 4
@@ -0,0 +1,87 @@
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import migration_head
+import startup_checks
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+# Холодный импорт main в CI-контейнере; локально он около 1 с.
+DEFAULT_STARTUP_IMPORT_BUDGET_MS = 2500
+LAZY_STARTUP_MODULES = ("alembic", "jose")
+
+
+def _sqlite_engine(tmp_path, revisions):
+    engine = create_engine(f"sqlite:///{tmp_path / 'startup.db'}")
+    if revisions is not None:
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+            for revision in revisions:
+                connection.execute(text("INSERT INTO alembic_version (version_num) VALUES (:revision)"), {"revision": revision})
+    return engine
+
+
+def test_embedded_migration_head_matches_alembic_scripts():
+    # Упал — выполните `python startup_checks.py --write-migration-head` и закоммитьте migration_head.py.
+    assert tuple(migration_head.ALEMBIC_HEADS) == startup_checks._script_head_revisions()
+    assert tuple(migration_head.MIGRATION_FILES) == startup_checks._migration_files()
+    assert startup_checks.get_head_revisions() == tuple(migration_head.ALEMBIC_HEADS)
+
+
+def test_verify_database_ready_compares_with_embedded_head(tmp_path):
+    head = migration_head.ALEMBIC_HEADS[0]
+    url = f"sqlite:///{tmp_path / 'startup.db'}"
+
+    at_head = _sqlite_engine(tmp_path, [head])
+    startup_checks.verify_database_ready(at_head, url)
+    assert startup_checks.is_database_at_head(at_head) is True
+    at_head.dispose()
+
+    (tmp_path / "startup.db").unlink()
+    behind = _sqlite_engine(tmp_path, ["0001_m1_baseline"])
+    with pytest.raises(RuntimeError, match="not migrated"):
+        startup_checks.verify_database_ready(behind, url)
+    assert startup_checks.is_database_at_head(behind) is False
+    behind.dispose()
+
+    (tmp_path / "startup.db").unlink()
+    empty = _sqlite_engine(tmp_path, None)
+    with pytest.raises(RuntimeError, match="not migrated"):
+        startup_checks.verify_database_ready(empty, url)
+    empty.dispose()
+
+
+def test_stale_embedded_head_falls_back_to_alembic_scripts(monkeypatch):
+    monkeypatch.setattr(migration_head, "MIGRATION_FILES", migration_head.MIGRATION_FILES[:-1])
+    monkeypatch.setattr(migration_head, "ALEMBIC_HEADS", ("stale_head",))
+    assert startup_checks.get_head_revisions() == startup_checks._script_head_revisions()
+
+
+def test_main_import_stays_within_startup_budget(tmp_path):
+    budget_ms = int(os.getenv("STARTUP_IMPORT_BUDGET_MS", str(DEFAULT_STARTUP_IMPORT_BUDGET_MS)))
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'import.db'}"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)$", line)
+        if match:
+            timings[match.group(3)] = int(match.group(1))
+
+    assert timings["main"] / 1000 <= budget_ms, f"import main took {timings['main'] / 1000:.0f} ms (budget {budget_ms} ms)"
+    loaded_lazy = sorted(
+        name for name in timings if any(name == lazy or name.startswith(f"{lazy}.") for lazy in LAZY_STARTUP_MODULES)
+    )
+    assert loaded_lazy == [], f"modules meant to load on first use were imported at startup: {loaded_lazy[:5]}"
@@ -1,7 +1,16 @@
+import hashlib
+import io
+import os
+import threading
+import time
 from datetime import date
 from decimal import Decimal
 
+from sqlalchemy import event
+
+import media_storage
 import models
+import security
 
 
 ONE_PIXEL_PNG = (
@@ -20,6 +29,7 @@ def _auth_headers(client):
 
 def _display_headers(monkeypatch, token="display-secret"):
     monkeypatch.setenv("DISPLAY_API_KEY", token)
+    security.reload_security_configuration()
     return {"X-Display-Token": token}
 
 
@@ -465,3 +475,293 @@ def test_admin_content_workflow_updates_snapshot_with_media_and_tap_overrides(cl
     assert snapshot["copy"]["fallback_subtitle"] == "Скоро подключим новый сорт"
     assert snapshot["copy"]["maintenance_title"] == "Идет обслуживание"
     assert snapshot["copy"]["maintenance_subtitle"] == "Пожалуйста, подождите"
+
+
+def test_display_snapshot_cache_answers_304_without_sql_and_invalidates_on_mutations(client, db_session, monkeypatch):
+    headers = _display_headers(monkeypatch)
+    admin_headers = _auth_headers(client)
+
+    beverage = models.Beverage(name="Cached Lager", sell_price_per_liter=Decimal("500.00"))
+    keg = models.Keg(
+        beverage=beverage,
+        initial_volume_ml=30000,
+        current_volume_ml=30000,
+        purchase_price=Decimal("1000.00"),
+        status="in_use",
+    )
+    tap = models.Tap(display_name="Tap Cached", status="active", keg=keg)
+    other_tap = models.Tap(display_name="Tap Other", status="active")
+    emergency_state = models.SystemState(key="emergency_stop_enabled", value="false")
+    db_session.add_all([beverage, keg, tap, other_tap, emergency_state])
+    db_session.commit()
+    snapshot_url = f"/api/display/taps/{tap.tap_id}/snapshot"
+
+    first = client.get(snapshot_url, headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    engine = db_session.get_bind()
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record_statement)
+    try:
+        cached = client.get(snapshot_url, headers={**headers, "If-None-Match": etag})
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+    assert cached.status_code == 304
+    assert statements == []
+
+    other_config = client.put(
+        f"/api/taps/{other_tap.tap_id}/display-config",
+        headers=admin_headers,
+        json={"enabled": False},
+    )
+    assert other_config.status_code == 200
+    assert client.get(snapshot_url, headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    beverage_update = client.put(
+        f"/api/beverages/{beverage.beverage_id}",
+        headers=admin_headers,
+        json={"display_brand_name": "Fresh Brand"},
+    )
+    assert beverage_update.status_code == 200
+    renamed = client.get(snapshot_url, headers={**headers, "If-None-Match": etag})
+    assert renamed.status_code == 200
+    assert renamed.json()["presentation"]["brand_name"] == "Fresh Brand"
+
+    emergency = client.post(
+        "/api/system/emergency_stop",
+        headers=admin_headers,
+        json={"value": "true"},
+    )
+    assert emergency.status_code == 200
+    stopped = client.get(snapshot_url, headers={**headers, "If-None-Match": renamed.headers["etag"]})
+    assert stopped.status_code == 200
+    assert stopped.json()["service_flags"]["emergency_stop"] is True
+
+
+def test_display_snapshot_batch_returns_only_changed_taps_from_one_query(client, db_session, monkeypatch):
+    headers = _display_headers(monkeypatch)
+
+    beverage = models.Beverage(name="Batch Lager", sell_price_per_liter=Decimal("500.00"))
+    taps = []
+    for index in range(3):
+        keg = models.Keg(
+            beverage=beverage,
+            initial_volume_ml=30000,
+            current_volume_ml=30000,
+            purchase_price=Decimal("1000.00"),
+            status="in_use",
+        )
+        taps.append(models.Tap(display_name=f"Batch Tap {index}", status="active", keg=keg))
+    emergency_state = models.SystemState(key="emergency_stop_enabled", value="false")
+    db_session.add_all([beverage, *taps, emergency_state])
+    db_session.commit()
+    tap_ids = [tap.tap_id for tap in taps]
+
+    engine = db_session.get_bind()
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record_statement)
+    try:
+        full = client.post("/api/display/snapshots", headers=headers, json={})
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+    assert full.status_code == 200
+    payload = full.json()
+    assert [item["tap"]["tap_id"] for item in payload["snapshots"]] == tap_ids
+    assert payload["unchanged_tap_ids"] == []
+    assert "copy" in payload["snapshots"][0]
+    assert sum(1 for statement in statements if "FROM taps LEFT OUTER JOIN" in statement) == 1
+
+    versions = {str(item["tap"]["tap_id"]): item["content_version"] for item in payload["snapshots"]}
+    single = client.get(f"/api/display/taps/{tap_ids[0]}/snapshot", headers=headers)
+    assert single.headers["etag"] == f'"{versions[str(tap_ids[0])]}"'
+
+    taps[1].display_name = "Batch Tap Renamed"
+    db_session.commit()
+
+    delta = client.post(
+        "/api/display/snapshots",
+        headers=headers,
+        json={"tap_ids": [*tap_ids, 999], "known_versions": versions},
+    )
+    assert delta.status_code == 200
+    delta_payload = delta.json()
+    assert [item["tap"]["display_name"] for item in delta_payload["snapshots"]] == ["Batch Tap Renamed"]
+    assert delta_payload["unchanged_tap_ids"] == [tap_ids[0], tap_ids[2]]
+    assert delta_payload["missing_tap_ids"] == [999]
+
+
+def test_display_snapshot_long_poll_wakes_on_change_and_times_out_with_304(client, db_session, monkeypatch):
+    headers = _display_headers(monkeypatch)
+
+    tap = models.Tap(display_name="Tap Long Poll", status="active")
+    emergency_state = models.SystemState(key="emergency_stop_enabled", value="false")
+    db_session.add_all([tap, emergency_state])
+    db_session.commit()
+    changes_url = f"/api/display/taps/{tap.tap_id}/snapshot/changes"
+
+    first = client.get(changes_url, headers=headers, params={"timeout_seconds": 0})
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    unchanged = client.get(changes_url, headers={**headers, "If-None-Match": etag}, params={"timeout_seconds": 0.2})
+    assert unchanged.status_code == 304
+    assert unchanged.headers["etag"] == etag
+
+    result = {}
+
+    def wait_for_change():
+        started = time.monotonic()
+        result["response"] = client.get(
+            changes_url,
+            headers={**headers, "If-None-Match": etag},
+            params={"timeout_seconds": 10},
+        )
+        result["elapsed"] = time.monotonic() - started
+
+    waiter = threading.Thread(target=wait_for_change)
+    waiter.start()
+    time.sleep(0.3)
+    tap.display_name = "Tap Long Poll Renamed"
+    db_session.commit()
+    waiter.join(timeout=10)
+
+    assert result["response"].status_code == 200
+    assert result["response"].json()["tap"]["display_name"] == "Tap Long Poll Renamed"
+    assert result["elapsed"] < 5
+
+
+def test_media_upload_streams_to_disk_and_content_serves_width_variants(client, monkeypatch, tmp_path):
+    headers = _auth_headers(client)
+    display_headers = _display_headers(monkeypatch)
+    monkeypatch.setenv("MEDIA_STORAGE_ROOT", str(tmp_path))
+    monkeypatch.setenv("MEDIA_UPLOAD_MAX_BYTES", str(len(ONE_PIXEL_PNG) + 10))
+    monkeypatch.setattr(media_storage, "UPLOAD_CHUNK_BYTES", 16)
+
+    too_large = client.post(
+        "/api/media-assets",
+        headers=headers,
+        files={"file": ("big.png", ONE_PIXEL_PNG + b"\x00" * 64, "image/png")},
+        data={"kind": "background"},
+    )
+    assert too_large.status_code == 422
+    assert list(tmp_path.iterdir()) == []
+
+    uploaded = _upload_media_asset(client, headers, "background", "hero.png")
+    assert uploaded["checksum_sha256"] == hashlib.sha256(ONE_PIXEL_PNG).hexdigest()
+    assert [path.name for path in tmp_path.iterdir()] == [uploaded["storage_key"]]
+
+    content_url = f"/api/media-assets/{uploaded['asset_id']}/content"
+    variant_bytes = b"variant-720"
+    (tmp_path / media_storage.variant_storage_key(uploaded["storage_key"], 720)).write_bytes(variant_bytes)
+
+    variant = client.get(content_url, headers=display_headers, params={"width": 600})
+    assert variant.status_code == 200
+    assert variant.content == variant_bytes
+    assert variant.headers["etag"] == f'"{uploaded["checksum_sha256"]}-w720"'
+
+    original = client.get(content_url, headers=display_headers, params={"width": 1000})
+    assert original.content == ONE_PIXEL_PNG
+    assert original.headers["etag"] == f'"{uploaded["checksum_sha256"]}"'
+
+    partial = client.get(content_url, headers={**display_headers, "Range": "bytes=0-7"})
+    assert partial.status_code == 206
+    assert partial.content == ONE_PIXEL_PNG[:8]
+
+
+def test_media_upload_rejects_oversized_dimensions_and_defers_variants(client, monkeypatch, tmp_path):
+    from api import display as display_api
+
+    headers = _auth_headers(client)
+    monkeypatch.setenv("MEDIA_STORAGE_ROOT", str(tmp_path))
+    monkeypatch.setenv("MEDIA_UPLOAD_MAX_PIXELS", "1000000")
+    scheduled = []
+    monkeypatch.setattr(display_api, "generate_variants", lambda *args, **kwargs: scheduled.append((args, kwargs)))
+
+    # Заголовок объявляет 2000x2000: отказ должен прийти до декодирования.
+    huge = ONE_PIXEL_PNG[:16] + (2000).to_bytes(4, "big") + (2000).to_bytes(4, "big") + ONE_PIXEL_PNG[24:]
+    rejected = client.post(
+        "/api/media-assets",
+        headers=headers,
+        files={"file": ("huge.png", huge, "image/png")},
+        data={"kind": "background"},
+    )
+    assert rejected.status_code == 422
+    assert "pixels" in rejected.json()["detail"]
+    assert list(tmp_path.iterdir()) == []
+    assert scheduled == []
+
+    uploaded = _upload_media_asset(client, headers, "background", "hero.png")
+    assert scheduled == [((uploaded["storage_key"],), {"mime_type": "image/png", "width": 1})]
+
+
+def test_media_reupload_of_orphaned_file_renews_its_gc_grace_period(monkeypatch, tmp_path):
+    monkeypatch.setenv("MEDIA_STORAGE_ROOT", str(tmp_path))
+    storage_key = f"{hashlib.sha256(ONE_PIXEL_PNG).hexdigest()}.png"
+    orphan = tmp_path / storage_key
+    orphan.write_bytes(ONE_PIXEL_PNG)
+    old_mtime = time.time() - 7200
+    os.utime(orphan, (old_mtime, old_mtime))
+
+    saved = media_storage.save_upload(
+        io.BytesIO(ONE_PIXEL_PNG), filename="again.png", content_type="image/png", kind="logo"
+    )
+
+    assert saved["storage_key"] == storage_key
+    assert saved["deduplicated"] is True
+    assert orphan.stat().st_mtime > old_mtime + 3600
+    assert [path.name for path in tmp_path.iterdir()] == [storage_key]
+
+
+def test_media_store_deduplicates_uploads_counts_references_and_collects_orphans(client, monkeypatch, tmp_path):
+    headers = _auth_headers(client)
+    monkeypatch.setenv("MEDIA_STORAGE_ROOT", str(tmp_path))
+
+    first = _upload_media_asset(client, headers, "background", "first.png")
+    second = _upload_media_asset(client, headers, "logo", "second.png")
+    assert first["asset_id"] != second["asset_id"]
+    assert first["storage_key"] == second["storage_key"] == f"{hashlib.sha256(ONE_PIXEL_PNG).hexdigest()}.png"
+    assert [path.name for path in tmp_path.iterdir()] == [first["storage_key"]]
+
+    beverage = client.post(
+        "/api/beverages/",
+        headers=headers,
+        json={"name": "Dedup Lager", "brewery": "Dedup", "style": "Lager", "abv": "4.5", "sell_price_per_liter": "500.00"},
+    )
+    assert beverage.status_code == 201
+    assigned = client.put(
+        f"/api/beverages/{beverage.json()['beverage_id']}",
+        headers=headers,
+        json={"background_asset_id": first["asset_id"]},
+    )
+    assert assigned.status_code == 200
+
+    listed = {item["asset_id"]: item for item in client.get("/api/media-assets", headers=headers).json()}
+    assert listed[first["asset_id"]]["reference_count"] == 1
+    assert listed[second["asset_id"]]["reference_count"] == 0
+
+    orphan = tmp_path / "orphan.png"
+    orphan.write_bytes(ONE_PIXEL_PNG)
+    fresh_orphan = tmp_path / "fresh.png"
+    fresh_orphan.write_bytes(ONE_PIXEL_PNG)
+    old_mtime = time.time() - 7200
+    os.utime(orphan, (old_mtime, old_mtime))
+
+    preview = client.post("/api/media-assets/gc", headers=headers)
+    assert preview.status_code == 200
+    assert preview.json()["dry_run"] is True
+    assert preview.json()["deleted_files"] == ["orphan.png"]
+    assert orphan.exists()
+
+    collected = client.post("/api/media-assets/gc", headers=headers, params={"dry_run": False})
+    assert collected.status_code == 200
+    assert collected.json()["freed_bytes"] == len(ONE_PIXEL_PNG)
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([first["storage_key"], "fresh.png"])
@@ -5,6 +5,7 @@ from pathlib import Path
 DEFAULT_SERVER_URL = "http://cybeer-hub:8000"
 DEFAULT_DEVICE_ENV_PATH = "/etc/beer-tap/device.env"
 DEFAULT_DISPLAY_RUNTIME_PATH = "/run/beer-tap/display-runtime.json"
+DEFAULT_DISPLAY_RUNTIME_SHM_PATH = "/run/beer-tap/display-runtime.shm"
 PLACEHOLDER_PREFIXES = ("replace-with", "change-me")
 
 
@@ -74,6 +75,9 @@ PIN_RELAY = _get_int_setting("PIN_RELAY", 18)
 PIN_FLOW_SENSOR = _get_int_setting("PIN_FLOW_SENSOR", 17)
 FLOW_SENSOR_K_FACTOR = float(_get_setting("FLOW_SENSOR_K_FACTOR", "7.5"))
 DISPLAY_RUNTIME_PATH = _get_setting("DISPLAY_RUNTIME_PATH", DEFAULT_DISPLAY_RUNTIME_PATH)
+DISPLAY_RUNTIME_SHM_PATH = _get_setting("DISPLAY_RUNTIME_SHM_PATH", DEFAULT_DISPLAY_RUNTIME_SHM_PATH)
+DISPLAY_RUNTIME_HEARTBEAT_SECONDS = float(_get_setting("DISPLAY_RUNTIME_HEARTBEAT_SECONDS", "1.0"))
+DISPLAY_REFRESH_HZ = float(_get_setting("DISPLAY_REFRESH_HZ", "5"))
 
 INTERNAL_TOKEN = normalize_token(
     _get_setting(
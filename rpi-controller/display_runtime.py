@@ -1,17 +1,88 @@
 import json
+import logging
 import os
 import tempfile
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 
-from config import DISPLAY_RUNTIME_PATH, TAP_ID
+from config import (
+    DISPLAY_REFRESH_HZ,
+    DISPLAY_RUNTIME_HEARTBEAT_SECONDS,
+    DISPLAY_RUNTIME_PATH,
+    DISPLAY_RUNTIME_SHM_PATH,
+    TAP_ID,
+)
+from runtime_channel import HEADER, RuntimeChannelWriter
+
+
+LOGGER = logging.getLogger(__name__)
+SHM_DISABLED_VALUES = {"off", "none", "disabled"}
+# Fields that only move the counters on screen; changes to anything else are published at once.
+PROGRESS_FIELDS = frozenset({"current_volume_ml", "current_cost_cents", "projected_remaining_balance_cents"})
+METRICS_WINDOW_SECONDS = 60.0
 
 
 class DisplayRuntimePublisher:
-    def __init__(self, *, tap_id: int = TAP_ID, output_path: str = DISPLAY_RUNTIME_PATH):
+    def __init__(
+        self,
+        *,
+        tap_id: int = TAP_ID,
+        output_path: str = DISPLAY_RUNTIME_PATH,
+        shm_path: str | None = DISPLAY_RUNTIME_SHM_PATH,
+        heartbeat_seconds: float = DISPLAY_RUNTIME_HEARTBEAT_SECONDS,
+        refresh_hz: float = DISPLAY_REFRESH_HZ,
+        time_source=None,
+    ):
         self.tap_id = tap_id
         self.output_path = Path(output_path)
         self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.heartbeat_seconds = heartbeat_seconds
+        self.min_progress_interval_seconds = 1.0 / refresh_hz if refresh_hz > 0 else 0.0
+        self._time_source = time_source or time.monotonic
+        self._last_payload: dict | None = None
+        self._last_snapshot: dict | None = None
+        self._last_published_at = 0.0
+        self._metrics_window_started_at = self._time_source()
+        self._window_metrics = {"publishes": 0, "bytes_written": 0, "suppressed": 0}
+        self._last_window_metrics = dict(self._window_metrics)
+        self._channel: RuntimeChannelWriter | None = None
+        if shm_path and shm_path.strip().lower() not in SHM_DISABLED_VALUES:
+            try:
+                self._channel = RuntimeChannelWriter(shm_path)
+            except OSError:
+                LOGGER.warning("Display runtime shared memory unavailable at %s; using %s", shm_path, self.output_path, exc_info=True)
+
+    def _should_publish(self, payload: dict, now: float) -> bool:
+        if self._last_payload is None:
+            return True
+        elapsed = now - self._last_published_at
+        if elapsed >= self.heartbeat_seconds:
+            return True
+        changed_fields = {key for key, value in payload.items() if self._last_payload.get(key) != value}
+        if not changed_fields:
+            return False
+        if changed_fields <= PROGRESS_FIELDS:
+            return elapsed >= self.min_progress_interval_seconds
+        return True
+
+    def _roll_metrics_window(self, now: float) -> None:
+        if now - self._metrics_window_started_at < METRICS_WINDOW_SECONDS:
+            return
+        self._last_window_metrics = self._window_metrics
+        self._window_metrics = {"publishes": 0, "bytes_written": 0, "suppressed": 0}
+        self._metrics_window_started_at = now
+        LOGGER.debug(
+            "Display runtime publishes=%s bytes_written=%s suppressed=%s in the last minute",
+            self._last_window_metrics["publishes"],
+            self._last_window_metrics["bytes_written"],
+            self._last_window_metrics["suppressed"],
+        )
+
+    def get_metrics(self) -> dict:
+        """Publishes, bytes written and suppressed updates for the current and the previous minute."""
+        self._roll_metrics_window(self._time_source())
+        return {"current_minute": dict(self._window_metrics), "previous_minute": dict(self._last_window_metrics)}
 
     def publish(
         self,
@@ -28,7 +99,8 @@ class DisplayRuntimePublisher:
         projected_remaining_balance_cents: int | None = None,
         session_short_id: str | None = None,
     ) -> dict:
-        snapshot = {
+        """Publish when a field changes or the heartbeat is due; counter-only updates are capped at the refresh rate."""
+        payload = {
             "schema_version": 1,
             "tap_id": self.tap_id,
             "phase": phase,
@@ -42,18 +114,40 @@ class DisplayRuntimePublisher:
             "current_cost_cents": int(current_cost_cents or 0),
             "projected_remaining_balance_cents": projected_remaining_balance_cents,
             "session_short_id": session_short_id,
-            "updated_at": datetime.now(timezone.utc).isoformat(),
         }
+        now = self._time_source()
+        self._roll_metrics_window(now)
+        if not self._should_publish(payload, now):
+            self._window_metrics["suppressed"] += 1
+            return self._last_snapshot
+
+        updated_at = datetime.now(timezone.utc)
+        if self._channel is not None:
+            # The record carries updated_at in its header, so an unchanged payload is not rewritten.
+            encoded = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            changed = self._channel.write(encoded, updated_at=updated_at.timestamp())
+            bytes_written = HEADER.size + (len(encoded) if changed else 0)
+        else:
+            serialized = json.dumps(
+                {**payload, "updated_at": updated_at.isoformat()},
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+            with tempfile.NamedTemporaryFile(
+                mode="w",
+                encoding="utf-8",
+                dir=str(self.output_path.parent),
+                delete=False,
+            ) as temp_file:
+                temp_file.write(serialized)
+                temp_path = Path(temp_file.name)
+
+            os.replace(temp_path, self.output_path)
+            bytes_written = len(serialized.encode("utf-8"))
 
-        serialized = json.dumps(snapshot, ensure_ascii=False, separators=(",", ":"))
-        with tempfile.NamedTemporaryFile(
-            mode="w",
-            encoding="utf-8",
-            dir=str(self.output_path.parent),
-            delete=False,
-        ) as temp_file:
-            temp_file.write(serialized)
-            temp_path = Path(temp_file.name)
-
-        os.replace(temp_path, self.output_path)
-        return snapshot
+        self._last_payload = payload
+        self._last_snapshot = {**payload, "updated_at": updated_at.isoformat()}
+        self._last_published_at = now
+        self._window_metrics["publishes"] += 1
+        self._window_metrics["bytes_written"] += bytes_written
+        return self._last_snapshot
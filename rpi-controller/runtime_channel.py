@@ -0,0 +1,72 @@
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+
+
+# Layout of the shared runtime record; tap-display-agent/runtime_channel.py reads the same layout.
+#   magic, layout version, reserved, seq, payload_version, updated_at (unix seconds), payload length
+# ``seq`` is odd while a write is in progress (seqlock); ``payload_version`` changes only with the payload,
+# so the reader re-parses JSON only when a field actually changed.
+MAGIC = b"BTRT"
+LAYOUT_VERSION = 1
+HEADER = struct.Struct("<4sHHQQdI4x")
+RECORD_SIZE = 4096
+MAX_PAYLOAD_BYTES = RECORD_SIZE - HEADER.size
+
+
+class RuntimeChannelWriter:
+    """Single-writer shared-memory record for the display runtime snapshot."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, RECORD_SIZE)
+            self._buffer = mmap.mmap(fd, RECORD_SIZE)
+        finally:
+            os.close(fd)
+        self._seq = 0
+        self._payload_version = 0
+        self._payload = b""
+        # payload_version 0 means "nothing published yet"; later versions start from the clock so a
+        # restarted controller never repeats a version the reader has cached.
+        self._write_header(updated_at=0.0)
+        self._payload_version = time.time_ns()
+
+    def _write_header(self, *, updated_at: float) -> None:
+        header = HEADER.pack(
+            MAGIC,
+            LAYOUT_VERSION,
+            0,
+            self._seq,
+            self._payload_version,
+            updated_at,
+            len(self._payload),
+        )
+        # seq goes last and on its own: a reader that sees the final even seq must
+        # also see the payload_version and length written for it.
+        self._buffer[:8] = header[:8]
+        self._buffer[16 : HEADER.size] = header[16:]
+        self._buffer[8:16] = header[8:16]
+
+    def write(self, payload: bytes, *, updated_at: float) -> bool:
+        """Store ``payload`` and refresh ``updated_at``; returns whether the payload bytes changed."""
+        if len(payload) > MAX_PAYLOAD_BYTES:
+            raise ValueError(f"runtime payload of {len(payload)} bytes exceeds {MAX_PAYLOAD_BYTES}")
+
+        changed = payload != self._payload
+        self._seq += 1
+        self._buffer[8:16] = struct.pack("<Q", self._seq)
+        if changed:
+            self._payload = payload
+            self._payload_version += 1
+            self._buffer[HEADER.size : HEADER.size + len(payload)] = payload
+        self._seq += 1
+        self._write_header(updated_at=updated_at)
+        return changed
+
+    def close(self) -> None:
+        self._buffer.close()
@@ -0,0 +1,130 @@
+import json
+
+from display_runtime import DisplayRuntimePublisher
+from runtime_channel import HEADER, MAGIC, RuntimeChannelWriter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+def _read_record(path):
+    raw = path.read_bytes()
+    magic, _, _, seq, payload_version, updated_at, length = HEADER.unpack_from(raw, 0)
+    payload = json.loads(raw[HEADER.size:HEADER.size + length])
+    return magic, seq, payload_version, updated_at, payload
+
+
+def test_publisher_writes_shared_record_and_bumps_version_only_on_change(tmp_path):
+    shm_path = tmp_path / "display-runtime.shm"
+    json_path = tmp_path / "display-runtime.json"
+    clock = FakeClock()
+    publisher = DisplayRuntimePublisher(
+        tap_id=3, output_path=str(json_path), shm_path=str(shm_path), time_source=clock.monotonic
+    )
+
+    publisher.publish(phase="pouring", card_present=True, current_volume_ml=120)
+    magic, seq, first_version, first_updated_at, payload = _read_record(shm_path)
+    assert magic == MAGIC
+    assert seq % 2 == 0
+    assert payload["phase"] == "pouring"
+    assert payload["current_volume_ml"] == 120
+    assert "updated_at" not in payload
+    assert not json_path.exists()
+
+    clock.now += 1.5
+    publisher.publish(phase="pouring", card_present=True, current_volume_ml=120)
+    _, _, same_version, heartbeat_updated_at, _ = _read_record(shm_path)
+    assert same_version == first_version
+    assert heartbeat_updated_at >= first_updated_at
+
+    clock.now += 0.5
+    publisher.publish(phase="pouring", card_present=True, current_volume_ml=180)
+    _, _, next_version, _, payload = _read_record(shm_path)
+    assert next_version == first_version + 1
+    assert payload["current_volume_ml"] == 180
+
+
+class RecordingBuffer:
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.writes = []
+
+    def __setitem__(self, key, value):
+        self.writes.append((key.start, key.stop))
+        self.buffer[key] = value
+
+
+def test_writer_stores_seq_after_the_header_fields_it_guards(tmp_path):
+    writer = RuntimeChannelWriter(tmp_path / "display-runtime.shm")
+    recording = RecordingBuffer(writer._buffer)
+    writer._buffer = recording
+
+    writer.write(b'{"phase": "pouring"}', updated_at=1.0)
+
+    # odd seq, payload, header fields, then the final even seq on its own
+    assert recording.writes[0] == (8, 16)
+    assert recording.writes[-1] == (8, 16)
+    assert (16, HEADER.size) in recording.writes[1:-1]
+    _, _, _, seq, _, updated_at, length = HEADER.unpack_from(recording.buffer, 0)
+    assert seq == 2
+    assert (updated_at, length) == (1.0, len(b'{"phase": "pouring"}'))
+    recording.buffer.close()
+
+
+def test_publisher_falls_back_to_json_file_when_shared_memory_is_disabled(tmp_path):
+    json_path = tmp_path / "display-runtime.json"
+    publisher = DisplayRuntimePublisher(tap_id=3, output_path=str(json_path), shm_path="off")
+
+    snapshot = publisher.publish(phase="idle")
+
+    assert json.loads(json_path.read_text(encoding="utf-8")) == snapshot
+    assert not (tmp_path / "display-runtime.shm").exists()
+
+
+def test_publisher_suppresses_repeats_and_rate_limits_volume_updates(tmp_path):
+    clock = FakeClock()
+    json_path = tmp_path / "display-runtime.json"
+    publisher = DisplayRuntimePublisher(
+        tap_id=3,
+        output_path=str(json_path),
+        shm_path="off",
+        heartbeat_seconds=1.0,
+        refresh_hz=5,
+        time_source=clock.monotonic,
+    )
+
+    first = publisher.publish(phase="idle")
+    clock.now += 0.1
+    assert publisher.publish(phase="idle") is first
+
+    clock.now += 0.05
+    publisher.publish(phase="pouring", card_present=True, current_volume_ml=10)
+    for volume in (20, 30, 40):
+        clock.now += 0.05
+        publisher.publish(phase="pouring", card_present=True, current_volume_ml=volume)
+    assert json.loads(json_path.read_text(encoding="utf-8"))["current_volume_ml"] == 10
+
+    clock.now += 0.1
+    publisher.publish(phase="pouring", card_present=True, current_volume_ml=50)
+    assert json.loads(json_path.read_text(encoding="utf-8"))["current_volume_ml"] == 50
+
+    clock.now += 0.01
+    publisher.publish(phase="finished", card_present=True, current_volume_ml=55)
+    assert json.loads(json_path.read_text(encoding="utf-8"))["phase"] == "finished"
+
+    clock.now += 1.0
+    heartbeat = publisher.publish(phase="finished", card_present=True, current_volume_ml=55)
+    assert heartbeat is not first
+
+    metrics = publisher.get_metrics()["current_minute"]
+    assert metrics["publishes"] == 5
+    assert metrics["suppressed"] == 4
+    assert metrics["bytes_written"] > 0
+
+    clock.now += 60
+    assert publisher.get_metrics()["previous_minute"]["publishes"] == 5
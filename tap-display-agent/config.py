@@ -6,6 +6,8 @@ from urllib.parse import urljoin
 
 DEFAULT_DEVICE_ENV_PATH = "/etc/beer-tap/device.env"
 DEFAULT_RUNTIME_PATH = "/run/beer-tap/display-runtime.json"
+DEFAULT_RUNTIME_SHM_PATH = "/run/beer-tap/display-runtime.shm"
+RUNTIME_SHM_DISABLED_VALUES = {"off", "none", "disabled"}
 DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / "cache"
 DEFAULT_CLIENT_DIST_DIR = Path(__file__).resolve().parent.parent / "tap-display-client" / "dist"
 PLACEHOLDER_PREFIXES = ("replace-with", "change-me")
@@ -60,6 +62,12 @@ class AgentConfig:
     runtime_stale_after_seconds: int
     host: str
     port: int
+    long_poll_seconds: int = 10
+    asset_width: int = 1080
+    asset_cache_max_bytes: int = 200 * 1024 * 1024
+    state_flush_seconds: int = 60
+    runtime_shm_path: Path | None = None
+    asset_workers: int = 2
 
     @classmethod
     def load(cls) -> "AgentConfig":
@@ -75,6 +83,8 @@ class AgentConfig:
         if _looks_like_placeholder(display_token):
             raise ValueError("DISPLAY_API_KEY must be configured for tap-display-agent.")
 
+        runtime_shm_path = get_value("DISPLAY_RUNTIME_SHM_PATH", DEFAULT_RUNTIME_SHM_PATH)
+
         return cls(
             tap_id=int(get_value("TAP_ID", "1")),
             backend_url=get_value("SERVER_URL", "http://127.0.0.1:8000").rstrip("/"),
@@ -88,6 +98,14 @@ class AgentConfig:
             runtime_stale_after_seconds=int(get_value("DISPLAY_AGENT_RUNTIME_STALE_AFTER_SECONDS", "3")),
             host=get_value("DISPLAY_AGENT_HOST", "127.0.0.1"),
             port=int(get_value("DISPLAY_AGENT_PORT", "18181")),
+            long_poll_seconds=int(get_value("DISPLAY_AGENT_LONG_POLL_SECONDS", "10")),
+            asset_width=int(get_value("DISPLAY_AGENT_ASSET_WIDTH", "1080")),
+            asset_cache_max_bytes=int(get_value("DISPLAY_AGENT_ASSET_CACHE_MAX_BYTES", str(200 * 1024 * 1024))),
+            state_flush_seconds=int(get_value("DISPLAY_AGENT_STATE_FLUSH_SECONDS", "60")),
+            asset_workers=int(get_value("DISPLAY_AGENT_ASSET_WORKERS", "2")),
+            runtime_shm_path=(
+                None if runtime_shm_path.strip().lower() in RUNTIME_SHM_DISABLED_VALUES else Path(runtime_shm_path)
+            ),
         )
 
     def build_backend_url(self, path: str) -> str:
@@ -1,10 +1,16 @@
+import asyncio
+import json
 import logging
+import time
+import uuid
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, HTMLResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel, Field
+from starlette.datastructures import Headers
 
 from config import AgentConfig
 from service import DisplayAgentService
@@ -14,6 +20,44 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 
 CONFIG = AgentConfig.load()
 SERVICE = DisplayAgentService(CONFIG)
+RUNTIME_STREAM_TICK_SECONDS = 0.1
+RUNTIME_STREAM_HEARTBEAT_SECONDS = 1.0
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """Serves ``name.br``/``name.gz`` written at build time and marks hashed Vite assets immutable."""
+
+    async def get_response(self, path: str, scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code != 200 or not isinstance(response, FileResponse):
+            return response
+
+        cache_control = IMMUTABLE_CACHE_CONTROL if path.startswith("assets/") else REVALIDATE_CACHE_CONTROL
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            compressed_path = Path(f"{response.path}{suffix}")
+            if encoding in accept_encoding and compressed_path.is_file():
+                return FileResponse(
+                    compressed_path,
+                    media_type=response.media_type,
+                    headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding", "Cache-Control": cache_control},
+                )
+        response.headers["Cache-Control"] = cache_control
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+
+class PrefetchAsset(BaseModel):
+    asset_id: uuid.UUID
+    checksum_sha256: str = Field(pattern=r"^[0-9a-f]{64}$")
+    content_url: str | None = None
+
+
+class PrefetchRequest(BaseModel):
+    assets: list[PrefetchAsset] = Field(max_length=32)
 
 
 @asynccontextmanager
@@ -34,12 +78,17 @@ def get_health():
         "status": "ok",
         "tap_id": CONFIG.tap_id,
         "backend_link_lost": SERVICE.is_backend_link_lost(),
+        "state_writes": SERVICE.get_write_stats(),
     }
 
 
 @app.get("/local/display/bootstrap")
-def get_bootstrap():
-    return SERVICE.get_bootstrap_payload()
+def get_bootstrap(request: Request):
+    etag, body = SERVICE.get_bootstrap_document()
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @app.get("/local/display/runtime")
@@ -47,16 +96,51 @@ def get_runtime():
     return SERVICE.read_runtime_payload()
 
 
+@app.get("/local/display/runtime/stream")
+async def stream_runtime(request: Request):
+    """Server-sent events with the runtime payload: pushed on change, repeated as a heartbeat."""
+
+    async def events():
+        last_serialized = None
+        last_sent_at = 0.0
+        while not await request.is_disconnected():
+            serialized = json.dumps(SERVICE.read_runtime_payload(), ensure_ascii=False, separators=(",", ":"))
+            now = time.monotonic()
+            if serialized != last_serialized or now - last_sent_at >= RUNTIME_STREAM_HEARTBEAT_SECONDS:
+                yield f"data: {serialized}\n\n"
+                last_serialized = serialized
+                last_sent_at = now
+            await asyncio.sleep(RUNTIME_STREAM_TICK_SECONDS)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/local/display/assets/prefetch", status_code=202)
+def prefetch_assets(payload: PrefetchRequest):
+    """Warm the cache with assets an upcoming keg will use, e.g. the media of the next beverage."""
+    assets = [asset.model_dump(mode="json", exclude_none=True) for asset in payload.assets]
+    try:
+        queued_asset_ids = SERVICE.prefetch_assets(assets)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return {"queued_asset_ids": queued_asset_ids}
+
+
 @app.get("/local/display/assets/{asset_id}")
-def get_cached_asset(asset_id: str):
+def get_cached_asset(asset_id: str, v: str | None = None):
     asset_path = SERVICE.get_asset_path(asset_id)
     if asset_path is None:
         raise HTTPException(status_code=404, detail="Cached asset not found")
-    return FileResponse(asset_path)
+    # Snapshot URLs carry ?v=<checksum>; the cached file name embeds the same checksum.
+    is_versioned = bool(v) and asset_path.name.startswith(f"{asset_id}-{v}")
+    return FileResponse(
+        asset_path,
+        headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL if is_versioned else REVALIDATE_CACHE_CONTROL},
+    )
 
 
 if CONFIG.client_dist_dir.exists():
-    app.mount("/display", StaticFiles(directory=CONFIG.client_dist_dir, html=True), name="display")
+    app.mount("/display", PrecompressedStaticFiles(directory=CONFIG.client_dist_dir, html=True), name="display")
 else:
     @app.get("/display")
     def display_not_built():
@@ -0,0 +1,85 @@
+import json
+import mmap
+import os
+import struct
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+
+# Must match rpi-controller/runtime_channel.py, which owns the record and is its only writer.
+MAGIC = b"BTRT"
+LAYOUT_VERSION = 1
+HEADER = struct.Struct("<4sHHQQdI4x")
+RECORD_SIZE = 4096
+READ_ATTEMPTS = 8
+
+
+class RuntimeChannelReader:
+    """Reads the controller's shared runtime record, re-parsing JSON only when the payload changed."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._buffer: mmap.mmap | None = None
+        self._inode: int | None = None
+        self._payload_version: int | None = None
+        self._payload: dict[str, Any] | None = None
+
+    def _open(self) -> mmap.mmap | None:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self._close()
+            return None
+        if self._buffer is not None and stat.st_ino == self._inode:
+            return self._buffer
+        self._close()
+        if stat.st_size < RECORD_SIZE:
+            return None
+        with open(self.path, "rb") as handle:
+            self._buffer = mmap.mmap(handle.fileno(), RECORD_SIZE, access=mmap.ACCESS_READ)
+        self._inode = stat.st_ino
+        return self._buffer
+
+    def _close(self) -> None:
+        if self._buffer is not None:
+            self._buffer.close()
+        self._buffer = None
+        self._inode = None
+        self._payload_version = None
+        self._payload = None
+
+    def _read_header(self) -> tuple[int, int, float, int] | None:
+        buffer = self._open()
+        if buffer is None:
+            return None
+        magic, layout_version, _, seq, payload_version, updated_at, length = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or layout_version != LAYOUT_VERSION or payload_version == 0:
+            return None
+        return seq, payload_version, updated_at, length
+
+    def read(self) -> dict[str, Any] | None:
+        """Return the latest runtime snapshot with ``updated_at``, or ``None`` when no writer has published yet."""
+        for _ in range(READ_ATTEMPTS):
+            record = self._read_header()
+            if record is None:
+                return None
+            seq, payload_version, updated_at, length = record
+            if seq % 2:
+                continue
+            raw_payload = None
+            if payload_version != self._payload_version:
+                raw_payload = bytes(self._buffer[HEADER.size : HEADER.size + length])
+            if struct.unpack_from("<Q", self._buffer, 8)[0] != seq:
+                continue
+            if raw_payload is not None:
+                try:
+                    self._payload = json.loads(raw_payload)
+                except ValueError:
+                    # Torn read that slipped past the seq check: retry rather than fall back to the stale file.
+                    continue
+                self._payload_version = payload_version
+            snapshot = dict(self._payload)
+            snapshot["updated_at"] = datetime.fromtimestamp(updated_at, timezone.utc).isoformat()
+            return snapshot
+        return None
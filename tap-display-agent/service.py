@@ -1,21 +1,38 @@
+import hashlib
 import json
 import logging
 import os
+import re
 import tempfile
 import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from copy import deepcopy
 from dataclasses import dataclass, field
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any
-from urllib.parse import urlsplit
+from urllib.parse import urlencode, urlsplit
 
 import requests
 
 from config import AgentConfig
+from runtime_channel import RuntimeChannelReader
 
 
 LOGGER = logging.getLogger("tap_display_agent")
+REQUEST_TIMEOUT_SECONDS = 10
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+# A long-poll has to return before the link is reported lost for lack of a recent success.
+LONG_POLL_LINK_MARGIN_SECONDS = 5
+WRITE_STATS_WINDOW_SECONDS = 3600
+ASSET_RETRY_BASE_SECONDS = 5
+ASSET_RETRY_MAX_SECONDS = 300
+THEME_ASSET_KEYS = ("background_asset", "logo_asset")
+# In-flight downloads; never evicted by the cache prune.
+PARTIAL_DOWNLOAD_PREFIX = ".partial-"
+SHA256_HEX_PATTERN = re.compile(r"[0-9a-f]{64}")
 
 
 def _utcnow() -> datetime:
@@ -32,7 +49,8 @@ def _parse_iso_datetime(raw_value: str | None) -> datetime | None:
         return None
 
 
-def _atomic_write_json(path: Path, payload: dict[str, Any]) -> None:
+def _atomic_write_json(path: Path, payload: dict[str, Any]) -> int:
+    """Replace ``path`` atomically and return the number of bytes written."""
     path.parent.mkdir(parents=True, exist_ok=True)
     serialized = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
     with tempfile.NamedTemporaryFile(
@@ -44,6 +62,25 @@ def _atomic_write_json(path: Path, payload: dict[str, Any]) -> None:
         temp_file.write(serialized)
         temp_path = Path(temp_file.name)
     os.replace(temp_path, path)
+    return len(serialized.encode("utf-8"))
+
+
+def _theme_assets(snapshot: dict[str, Any] | None) -> list[dict[str, Any]]:
+    theme = (snapshot or {}).get("theme") or {}
+    return [theme[asset_key] for asset_key in THEME_ASSET_KEYS if theme.get(asset_key)]
+
+
+def _is_missing_route(response: Any) -> bool:
+    if response.status_code == 405:
+        return True
+    if response.status_code != 404:
+        return False
+    try:
+        payload = response.json()
+    except ValueError:
+        return False
+    # An unknown tap is also a 404, but with its own detail message.
+    return isinstance(payload, dict) and payload.get("detail") == "Not Found"
 
 
 @dataclass
@@ -54,6 +91,7 @@ class AgentState:
     last_poll_at: str | None = None
     consecutive_failures: int = 0
     asset_files: dict[str, str] = field(default_factory=dict)
+    asset_retry_queue: dict[str, dict[str, Any]] = field(default_factory=dict)
 
 
 class DisplayAgentService:
@@ -64,12 +102,36 @@ class DisplayAgentService:
         self._lock = threading.Lock()
         self._stop_event = threading.Event()
         self._thread: threading.Thread | None = None
+        self._long_poll_available = True
         self.cache_dir = config.cache_dir
         self.snapshot_cache_path = self.cache_dir / "snapshot.json"
         self.state_cache_path = self.cache_dir / "state.json"
         self.assets_dir = self.cache_dir / "assets"
         self.assets_dir.mkdir(parents=True, exist_ok=True)
+        self._runtime_channel = RuntimeChannelReader(config.runtime_shm_path) if config.runtime_shm_path else None
+        self._bootstrap_cache: tuple[tuple[Any, ...], str, bytes] | None = None
+        # The backend snapshot as received; ``state.snapshot`` is its copy resolved against the local asset cache.
+        self._source_snapshot: dict[str, Any] | None = None
+        self._snapshot_revision = 0
+        self._active_asset_ids: set[str] = set()
+        self._prefetch_asset_ids: set[str] = set()
+        self._asset_downloads: dict[str, Future] = {}
+        self._asset_executor = ThreadPoolExecutor(
+            max_workers=max(config.asset_workers, 1),
+            thread_name_prefix="display-agent-asset",
+        )
+        self._runtime_lock = threading.Lock()
+        self._runtime_file_key: tuple[int, int] | None = None
+        self._runtime_file_payload: dict[str, Any] | None = None
         self.state = AgentState()
+        # What is already on disk: the snapshot is rewritten only for a new etag, poll timestamps
+        # are flushed at most every ``state_flush_seconds``.
+        self._persisted_snapshot_etag: str | None = None
+        self._persisted_durable_state: dict[str, Any] | None = None
+        self._persisted_state_at = 0.0
+        self._write_window_started_at = time.monotonic()
+        self._bytes_written_in_window = 0
+        self._bytes_written_last_window = 0
         self._load_cached_state()
 
     def _load_cached_state(self) -> None:
@@ -83,30 +145,84 @@ class DisplayAgentService:
                     last_poll_at=raw_state.get("last_poll_at"),
                     consecutive_failures=int(raw_state.get("consecutive_failures") or 0),
                     asset_files=dict(raw_state.get("asset_files") or {}),
+                    asset_retry_queue=dict(raw_state.get("asset_retry_queue") or {}),
                 )
             except (OSError, ValueError, TypeError):
                 LOGGER.exception("Failed to load cached display-agent state")
+            else:
+                self._persisted_durable_state = self._durable_state_locked()
+                self._persisted_state_at = time.monotonic()
 
         if self.snapshot_cache_path.exists():
             try:
-                self.state.snapshot = json.loads(self.snapshot_cache_path.read_text(encoding="utf-8"))
+                self._source_snapshot = json.loads(self.snapshot_cache_path.read_text(encoding="utf-8"))
             except (OSError, ValueError):
                 LOGGER.exception("Failed to load cached snapshot")
+            else:
+                if any(str(asset.get("content_url", "")).startswith("/local/") for asset in _theme_assets(self._source_snapshot)):
+                    # Older agents cached the locally resolved copy; drop the etag so the backend resends the original.
+                    self.state.etag = None
+                self._persisted_snapshot_etag = self.state.etag
+                self._active_asset_ids = {str(asset["asset_id"]) for asset in _theme_assets(self._source_snapshot)}
+                self.state.snapshot, missing_assets = self._resolve_snapshot(self._source_snapshot)
+                for asset in missing_assets:
+                    self.state.asset_retry_queue.setdefault(
+                        str(asset["asset_id"]),
+                        {"asset": asset, "attempts": 0, "next_attempt_at": None},
+                    )
+
+    def _durable_state_locked(self) -> dict[str, Any]:
+        return {
+            "etag": self.state.etag,
+            "asset_files": dict(self.state.asset_files),
+            "asset_retry_queue": deepcopy(self.state.asset_retry_queue),
+        }
 
-    def _persist_state(self) -> None:
+    def _record_bytes_written(self, byte_count: int) -> None:
+        now = time.monotonic()
         with self._lock:
-            snapshot = deepcopy(self.state.snapshot)
+            if now - self._write_window_started_at >= WRITE_STATS_WINDOW_SECONDS:
+                self._bytes_written_last_window = self._bytes_written_in_window
+                self._bytes_written_in_window = 0
+                self._write_window_started_at = now
+            self._bytes_written_in_window += byte_count
+
+    def get_write_stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "bytes_written_current_hour": self._bytes_written_in_window,
+                "bytes_written_previous_hour": self._bytes_written_last_window,
+            }
+
+    def _persist_state(self, *, force: bool = False) -> None:
+        """Write only what changed: the snapshot per etag, state.json on etag/asset changes or on the flush interval."""
+        now = time.monotonic()
+        with self._lock:
+            snapshot = None
+            if self._source_snapshot is not None and self.state.etag != self._persisted_snapshot_etag:
+                snapshot = deepcopy(self._source_snapshot)
+                snapshot_etag = self.state.etag
+            durable_state = self._durable_state_locked()
+            flush_due = now - self._persisted_state_at >= self.config.state_flush_seconds
+            write_state = force or flush_due or durable_state != self._persisted_durable_state
             state_payload = {
                 "etag": self.state.etag,
                 "last_success_at": self.state.last_success_at,
                 "last_poll_at": self.state.last_poll_at,
                 "consecutive_failures": self.state.consecutive_failures,
-                "asset_files": dict(self.state.asset_files),
+                "asset_files": durable_state["asset_files"],
+                "asset_retry_queue": durable_state["asset_retry_queue"],
             }
 
         if snapshot is not None:
-            _atomic_write_json(self.snapshot_cache_path, snapshot)
-        _atomic_write_json(self.state_cache_path, state_payload)
+            self._record_bytes_written(_atomic_write_json(self.snapshot_cache_path, snapshot))
+            with self._lock:
+                self._persisted_snapshot_etag = snapshot_etag
+        if write_state:
+            self._record_bytes_written(_atomic_write_json(self.state_cache_path, state_payload))
+            with self._lock:
+                self._persisted_durable_state = durable_state
+                self._persisted_state_at = now
 
     def start(self) -> None:
         if self._thread and self._thread.is_alive():
@@ -118,25 +234,189 @@ class DisplayAgentService:
         self._stop_event.set()
         if self._thread and self._thread.is_alive():
             self._thread.join(timeout=2)
+        self._asset_executor.shutdown(wait=False, cancel_futures=True)
+        self._persist_state(force=True)
+
+    def _long_poll_wait_seconds(self) -> int:
+        if not self._long_poll_available:
+            return 0
+        link_budget = self.config.backend_lost_after_seconds - LONG_POLL_LINK_MARGIN_SECONDS
+        return max(min(self.config.long_poll_seconds, link_budget), 0)
 
     def _poll_loop(self) -> None:
         while not self._stop_event.is_set():
-            self.poll_once()
+            self._retry_due_assets()
+            wait_seconds = self._long_poll_wait_seconds()
+            if wait_seconds > 0:
+                # The backend answers as soon as the snapshot changes, so the next wait starts right away;
+                # failures fall through to the regular poll interval.
+                if self.poll_once(wait_seconds=wait_seconds):
+                    continue
+            else:
+                self.poll_once()
             self._stop_event.wait(self.config.poll_interval_seconds)
 
-    def _rewrite_local_asset_urls(self, snapshot: dict[str, Any]) -> dict[str, Any]:
+    def _asset_target_name(self, asset: dict[str, Any]) -> str:
+        asset_id = str(asset["asset_id"])
+        checksum = asset.get("checksum_sha256", asset_id)
+        suffix = Path(urlsplit(asset.get("content_url") or "").path).suffix or ".bin"
+        width_tag = f"-w{self.config.asset_width}" if self.config.asset_width > 0 else ""
+        return f"{asset_id}-{checksum}{width_tag}{suffix}"
+
+    def _asset_target_path(self, asset: dict[str, Any]) -> Path | None:
+        """Cache file for ``asset``; ``None`` if its id or checksum would put it outside ``assets_dir``."""
+        target_path = self.assets_dir / self._asset_target_name(asset)
+        if target_path.resolve().parent != self.assets_dir.resolve():
+            return None
+        return target_path
+
+    def _is_backend_url(self, url: str) -> bool:
+        source, backend = urlsplit(url), urlsplit(self.config.backend_url)
+        return (source.scheme, source.netloc) == (backend.scheme, backend.netloc)
+
+    def _validate_prefetch_asset(self, asset: dict[str, Any]) -> dict[str, Any]:
+        """Prefetch requests come from the local network: only backend media assets by UUID are accepted."""
+        asset_id = str(uuid.UUID(str(asset["asset_id"])))
+        checksum = str(asset.get("checksum_sha256") or "")
+        if not SHA256_HEX_PATTERN.fullmatch(checksum):
+            raise ValueError(f"checksum_sha256 must be a hex SHA-256 digest for asset {asset_id}")
+        content_path = f"/api/media-assets/{asset_id}/content"
+        content_url = asset.get("content_url") or content_path
+        if content_url != content_path and not self._is_backend_url(content_url):
+            raise ValueError(f"content_url must point at the backend for asset {asset_id}")
+        return {"asset_id": asset_id, "checksum_sha256": checksum, "content_url": content_url}
+
+    def _resolve_snapshot(self, snapshot: dict[str, Any]) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+        """Point theme assets at the local cache; assets not cached yet become ``None`` placeholders and are returned."""
         resolved = deepcopy(snapshot)
         theme = resolved.get("theme") or {}
-        for asset_key in ("background_asset", "logo_asset"):
+        missing: list[dict[str, Any]] = []
+        for asset_key in THEME_ASSET_KEYS:
             asset = theme.get(asset_key)
             if not asset:
                 continue
             asset_id = str(asset["asset_id"])
-            if self.get_asset_path(asset_id) is None:
+            target_path = self._asset_target_path(asset)
+            if target_path is None:
+                LOGGER.warning("Ignoring display asset outside the cache asset_id=%s", asset_id)
                 theme[asset_key] = None
                 continue
+            target_name = target_path.name
+            if not target_path.exists():
+                missing.append(dict(asset))
+                theme[asset_key] = None
+                continue
+            with self._lock:
+                self.state.asset_files[asset_id] = target_name
             asset["content_url"] = f"/local/display/assets/{asset_id}?v={asset.get('checksum_sha256', '')}"
-        return resolved
+        return resolved, missing
+
+    def _refresh_resolved_snapshot(self) -> None:
+        with self._lock:
+            source_snapshot = self._source_snapshot
+        if source_snapshot is None:
+            return
+        resolved_snapshot, _ = self._resolve_snapshot(source_snapshot)
+        with self._lock:
+            if self._source_snapshot is source_snapshot:
+                self.state.snapshot = resolved_snapshot
+                self._snapshot_revision += 1
+
+    def schedule_asset_download(self, asset: dict[str, Any]) -> bool:
+        """Queue ``asset`` on the download pool; returns ``False`` if it is already being fetched."""
+        asset_id = str(asset["asset_id"])
+        with self._lock:
+            pending = self._asset_downloads.get(asset_id)
+            if pending is not None and not pending.done():
+                return False
+            self._asset_downloads[asset_id] = self._asset_executor.submit(self._fetch_asset, dict(asset))
+        return True
+
+    def _fetch_asset(self, asset: dict[str, Any]) -> None:
+        asset_id = str(asset["asset_id"])
+        if self._download_asset(asset):
+            with self._lock:
+                self.state.asset_retry_queue.pop(asset_id, None)
+            self._prune_asset_cache()
+            self._refresh_resolved_snapshot()
+        else:
+            with self._lock:
+                previous = self.state.asset_retry_queue.get(asset_id) or {}
+                same_version = (previous.get("asset") or {}).get("checksum_sha256") == asset.get("checksum_sha256")
+                attempts = int(previous.get("attempts") or 0) + 1 if same_version else 1
+                delay = min(ASSET_RETRY_BASE_SECONDS * 2 ** (attempts - 1), ASSET_RETRY_MAX_SECONDS)
+                self.state.asset_retry_queue[asset_id] = {
+                    "asset": asset,
+                    "attempts": attempts,
+                    "next_attempt_at": (_utcnow() + timedelta(seconds=delay)).isoformat(),
+                }
+        self._persist_state()
+
+    def _retry_due_assets(self) -> None:
+        now = _utcnow()
+        due_assets = []
+        with self._lock:
+            wanted = self._active_asset_ids | self._prefetch_asset_ids
+            for asset_id, entry in list(self.state.asset_retry_queue.items()):
+                if asset_id not in wanted:
+                    self.state.asset_retry_queue.pop(asset_id, None)
+                    continue
+                next_attempt_at = _parse_iso_datetime(entry.get("next_attempt_at"))
+                if next_attempt_at is None or next_attempt_at <= now:
+                    due_assets.append(entry["asset"])
+        for asset in due_assets:
+            self.schedule_asset_download(asset)
+
+    def prefetch_assets(self, assets: list[dict[str, Any]]) -> list[str]:
+        """Download assets ahead of the snapshot that will use them; returns the asset ids queued now.
+
+        Raises ``ValueError`` before queueing anything if an asset is not a backend media asset.
+        """
+        assets = [self._validate_prefetch_asset(asset) for asset in assets]
+        queued = []
+        for asset in assets:
+            asset_id = asset["asset_id"]
+            with self._lock:
+                self._prefetch_asset_ids.add(asset_id)
+            if (self.assets_dir / self._asset_target_name(asset)).exists():
+                continue
+            if self.schedule_asset_download(asset):
+                queued.append(asset_id)
+        return queued
+
+    def wait_for_asset_downloads(self, timeout: float | None = None) -> None:
+        with self._lock:
+            pending = list(self._asset_downloads.values())
+        wait(pending, timeout=timeout)
+
+    def _asset_source_url(self, source_url: str) -> str:
+        if source_url.startswith("/"):
+            source_url = self.config.build_backend_url(source_url)
+        if self.config.asset_width > 0:
+            separator = "&" if urlsplit(source_url).query else "?"
+            source_url = f"{source_url}{separator}{urlencode({'width': self.config.asset_width})}"
+        return source_url
+
+    def _stream_to_file(self, response: Any, target_path: Path) -> str:
+        """Write the body to ``target_path`` through a temp file and return its SHA-256."""
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(
+            dir=str(target_path.parent),
+            prefix=PARTIAL_DOWNLOAD_PREFIX,
+            delete=False,
+        ) as temp_file:
+            temp_path = Path(temp_file.name)
+            try:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                    if chunk:
+                        digest.update(chunk)
+                        temp_file.write(chunk)
+            except BaseException:
+                temp_file.close()
+                temp_path.unlink(missing_ok=True)
+                raise
+        os.replace(temp_path, target_path)
+        return digest.hexdigest()
 
     def _download_asset(self, asset: dict[str, Any]) -> bool:
         asset_id = str(asset["asset_id"])
@@ -144,23 +424,36 @@ class DisplayAgentService:
         if not source_url:
             return False
 
-        if source_url.startswith("/"):
-            source_url = self.config.build_backend_url(source_url)
-
         checksum = asset.get("checksum_sha256", asset_id)
-        suffix = Path(urlsplit(source_url).path).suffix or ".bin"
-        target_name = f"{asset_id}-{checksum}{suffix}"
-        target_path = self.assets_dir / target_name
+        target_path = self._asset_target_path(asset)
+        if target_path is None:
+            LOGGER.warning("Refusing to cache display asset outside the cache asset_id=%s", asset_id)
+            return False
+        target_name = target_path.name
+        source_url = self._asset_source_url(source_url)
         if target_path.exists():
+            self._touch_asset(target_path)
             with self._lock:
                 self.state.asset_files[asset_id] = target_name
             return True
 
         try:
-            response = self.session.get(source_url, headers=self._backend_headers, timeout=10)
-            response.raise_for_status()
-            with target_path.open("wb") as output:
-                output.write(response.content)
+            response = self.session.get(
+                source_url,
+                # The display token is only for the backend, never for a third-party asset host.
+                headers=self._backend_headers if self._is_backend_url(source_url) else {},
+                timeout=REQUEST_TIMEOUT_SECONDS,
+                stream=True,
+            )
+            try:
+                response.raise_for_status()
+                downloaded_checksum = self._stream_to_file(response, target_path)
+                # Variants carry a "-w<width>" ETag; only the original can be checked against the snapshot.
+                if response.headers.get("ETag") == f'"{checksum}"' and downloaded_checksum != checksum:
+                    target_path.unlink(missing_ok=True)
+                    raise OSError(f"checksum mismatch for asset {asset_id}")
+            finally:
+                response.close()
         except (OSError, requests.RequestException):
             LOGGER.warning("Failed to cache display asset asset_id=%s source_url=%s", asset_id, source_url, exc_info=True)
             with self._lock:
@@ -171,8 +464,56 @@ class DisplayAgentService:
             self.state.asset_files[asset_id] = target_name
         return True
 
-    def poll_once(self) -> None:
-        snapshot_url = self.config.build_backend_url(f"/api/display/taps/{self.config.tap_id}/snapshot")
+    @staticmethod
+    def _touch_asset(path: Path) -> None:
+        """Bump the mtime so the LRU prune sees the file as recently used."""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _prune_asset_cache(self) -> None:
+        """Forget assets neither the snapshot nor a prefetch uses and evict least recently used files over the limit."""
+        with self._lock:
+            wanted = self._active_asset_ids | self._prefetch_asset_ids
+            for asset_id in set(self.state.asset_files) - wanted:
+                self.state.asset_files.pop(asset_id, None)
+            protected = set(self.state.asset_files.values())
+
+        max_bytes = self.config.asset_cache_max_bytes
+        if max_bytes <= 0:
+            return
+
+        entries = []
+        for path in self.assets_dir.iterdir():
+            if path.name.startswith(PARTIAL_DOWNLOAD_PREFIX):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if path.is_file():
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total_bytes <= max_bytes:
+                break
+            if path.name in protected:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                LOGGER.warning("Failed to evict cached display asset path=%s", path, exc_info=True)
+                continue
+            total_bytes -= size
+
+    def poll_once(self, *, wait_seconds: int = 0) -> bool:
+        """Fetch the snapshot; with ``wait_seconds`` the backend holds the request until it changes."""
+        snapshot_path = f"/api/display/taps/{self.config.tap_id}/snapshot"
+        if wait_seconds > 0:
+            snapshot_path = f"{snapshot_path}/changes?timeout_seconds={wait_seconds}"
+        snapshot_url = self.config.build_backend_url(snapshot_path)
         headers = dict(self._backend_headers)
 
         with self._lock:
@@ -180,37 +521,45 @@ class DisplayAgentService:
                 headers["If-None-Match"] = self.state.etag
 
         try:
-            response = self.session.get(snapshot_url, headers=headers, timeout=10)
+            response = self.session.get(snapshot_url, headers=headers, timeout=REQUEST_TIMEOUT_SECONDS + wait_seconds)
             polled_at = _utcnow().isoformat()
+            if wait_seconds > 0 and _is_missing_route(response):
+                LOGGER.info("Backend has no snapshot long-poll endpoint; falling back to interval polling")
+                self._long_poll_available = False
+                return self.poll_once()
             if response.status_code == 304:
                 with self._lock:
                     self.state.last_poll_at = polled_at
                     self.state.last_success_at = polled_at
                     self.state.consecutive_failures = 0
                 self._persist_state()
-                return
+                return True
 
             response.raise_for_status()
             payload = response.json()
-            for asset_key in ("background_asset", "logo_asset"):
-                asset = ((payload.get("theme") or {}).get(asset_key))
-                if asset:
-                    self._download_asset(asset)
-
-            resolved_snapshot = self._rewrite_local_asset_urls(payload)
+            # Apply the snapshot right away; missing assets show placeholders until the pool fetches them.
+            resolved_snapshot, missing_assets = self._resolve_snapshot(payload)
             with self._lock:
+                self._source_snapshot = payload
+                self._active_asset_ids = {str(asset["asset_id"]) for asset in _theme_assets(payload)}
+                self._snapshot_revision += 1
                 self.state.snapshot = resolved_snapshot
                 self.state.etag = response.headers.get("ETag") or f'"{payload.get("content_version", "")}"'
                 self.state.last_poll_at = polled_at
                 self.state.last_success_at = polled_at
                 self.state.consecutive_failures = 0
             self._persist_state()
+            self._prune_asset_cache()
+            for asset in missing_assets:
+                self.schedule_asset_download(asset)
+            return True
         except requests.RequestException:
             LOGGER.exception("Snapshot poll failed")
             with self._lock:
                 self.state.last_poll_at = _utcnow().isoformat()
                 self.state.consecutive_failures += 1
             self._persist_state()
+            return False
 
     def get_asset_path(self, asset_id: str) -> Path | None:
         with self._lock:
@@ -220,6 +569,7 @@ class DisplayAgentService:
         candidate = self.assets_dir / filename
         if not candidate.exists():
             return None
+        self._touch_asset(candidate)
         return candidate
 
     def is_backend_link_lost(self) -> bool:
@@ -236,21 +586,12 @@ class DisplayAgentService:
         elapsed = (_utcnow() - parsed_success).total_seconds()
         return elapsed > self.config.backend_lost_after_seconds
 
-    def read_runtime_payload(self) -> dict[str, Any]:
-        runtime: dict[str, Any]
-        if self.config.runtime_path.exists():
-            try:
-                runtime = json.loads(self.config.runtime_path.read_text(encoding="utf-8"))
-            except (OSError, ValueError):
-                runtime = {
-                    "schema_version": 1,
-                    "tap_id": self.config.tap_id,
-                    "phase": "blocked",
-                    "reason_code": "controller_runtime_stale",
-                    "card_present": False,
-                }
-        else:
-            runtime = {
+    def _read_runtime_file(self) -> dict[str, Any]:
+        """Parse the runtime JSON file, reusing the last result while its mtime and size are unchanged."""
+        try:
+            stat = self.config.runtime_path.stat()
+        except OSError:
+            return {
                 "schema_version": 1,
                 "tap_id": self.config.tap_id,
                 "phase": "idle",
@@ -260,6 +601,34 @@ class DisplayAgentService:
                 "current_cost_cents": 0,
             }
 
+        file_key = (stat.st_mtime_ns, stat.st_size)
+        if file_key == self._runtime_file_key and self._runtime_file_payload is not None:
+            return dict(self._runtime_file_payload)
+        try:
+            runtime = json.loads(self.config.runtime_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {
+                "schema_version": 1,
+                "tap_id": self.config.tap_id,
+                "phase": "blocked",
+                "reason_code": "controller_runtime_stale",
+                "card_present": False,
+            }
+        self._runtime_file_key = file_key
+        self._runtime_file_payload = runtime
+        return dict(runtime)
+
+    def read_runtime_payload(self) -> dict[str, Any]:
+        with self._runtime_lock:
+            runtime = None
+            if self._runtime_channel is not None:
+                try:
+                    runtime = self._runtime_channel.read()
+                except (OSError, ValueError):
+                    LOGGER.warning("Failed to read display runtime shared memory", exc_info=True)
+            if runtime is None:
+                runtime = self._read_runtime_file()
+
         runtime_updated_at = _parse_iso_datetime(runtime.get("updated_at"))
         controller_runtime_stale = False
         if runtime_updated_at is not None:
@@ -283,18 +652,44 @@ class DisplayAgentService:
     def get_bootstrap_payload(self) -> dict[str, Any]:
         with self._lock:
             snapshot = deepcopy(self.state.snapshot)
-            last_success_at = self.state.last_success_at
-            last_poll_at = self.state.last_poll_at
-            consecutive_failures = self.state.consecutive_failures
 
         return {
             "tap_id": self.config.tap_id,
             "snapshot": snapshot,
             "backend": {
                 "link_lost": self.is_backend_link_lost(),
-                "last_success_at": last_success_at,
-                "last_poll_at": last_poll_at,
-                "consecutive_failures": consecutive_failures,
                 "has_cached_snapshot": snapshot is not None,
             },
         }
+
+    def get_bootstrap_document(self) -> tuple[str, bytes]:
+        """Return ``(etag, json_bytes)`` for the bootstrap payload, serialized once per distinct state.
+
+        Poll timestamps and failure counters change on every poll, so they stay out of the document
+        (the runtime payload's ``health`` carries them) and a quiet snapshot keeps answering 304.
+        """
+        link_lost = self.is_backend_link_lost()
+        with self._lock:
+            # The snapshot is replaced, never mutated, so holding a reference is enough.
+            snapshot = self.state.snapshot
+            key = (self.state.etag, self._snapshot_revision, link_lost)
+            cached = self._bootstrap_cache
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2]
+
+        body = json.dumps(
+            {
+                "tap_id": self.config.tap_id,
+                "snapshot": snapshot,
+                "backend": {
+                    "link_lost": link_lost,
+                    "has_cached_snapshot": snapshot is not None,
+                },
+            },
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        with self._lock:
+            self._bootstrap_cache = (key, etag, body)
+        return etag, body
@@ -1,11 +1,15 @@
+import hashlib
 import importlib.util
 import json
+import os
 import sys
 import types
 from urllib.parse import urlsplit
 from datetime import datetime, timezone
 from pathlib import Path
 
+import pytest
+
 
 def _load_agent_modules():
     agent_dir = Path(__file__).resolve().parent
@@ -53,6 +57,13 @@ class FakeResponse:
     def json(self):
         return self._payload
 
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
     def raise_for_status(self):
         if self.status_code >= 400:
             raise DummyRequestException(f"http_{self.status_code}")
@@ -65,13 +76,23 @@ class FakeSession:
         self.background_bytes = background_bytes
         self.logo_bytes = logo_bytes
         self.snapshot_request_headers = []
+        self.snapshot_request_urls = []
+        self.missing_long_poll_route = False
+        self.media_assets = {}
+        self.requests = []
 
-    def get(self, url, headers=None, timeout=10):
-        del timeout
+    def get(self, url, headers=None, timeout=10, stream=False):
+        del timeout, stream
         path = urlsplit(url).path
         request_headers = headers or {}
+        self.requests.append((url, dict(request_headers)))
+
+        if path.endswith("/snapshot/changes") and self.missing_long_poll_route:
+            self.snapshot_request_urls.append(url)
+            return FakeResponse(status_code=404, payload={"detail": "Not Found"})
 
         if path.startswith("/api/display/taps/"):
+            self.snapshot_request_urls.append(url)
             self.snapshot_request_headers.append(dict(request_headers))
             if request_headers.get("If-None-Match") == self.etag:
                 return FakeResponse(status_code=304, headers={"ETag": self.etag})
@@ -87,14 +108,14 @@ class FakeSession:
         if path.endswith("/logo/content"):
             return FakeResponse(status_code=200, content=self.logo_bytes)
 
+        if path in self.media_assets:
+            return FakeResponse(status_code=200, content=self.media_assets[path])
+
         raise AssertionError(f"Unexpected URL requested: {url}")
 
 
-def test_display_agent_polls_snapshot_caches_assets_and_reads_runtime(tmp_path):
-    runtime_path = tmp_path / "display-runtime.json"
-    cache_dir = tmp_path / "cache"
-    etag = '"content-v2"'
-    snapshot_payload = {
+def _snapshot_payload():
+    return {
         "tap": {
             "tap_id": 7,
             "enabled": True,
@@ -127,13 +148,15 @@ def test_display_agent_polls_snapshot_caches_assets_and_reads_runtime(tmp_path):
         "content_version": "content-v2",
     }
 
+
+def _build_service(tmp_path, *, etag='"content-v2"'):
     service = DisplayAgentService(
         AgentConfig(
             tap_id=7,
             backend_url="http://backend.local",
             display_token="display-secret",
-            runtime_path=runtime_path,
-            cache_dir=cache_dir,
+            runtime_path=tmp_path / "display-runtime.json",
+            cache_dir=tmp_path / "cache",
             client_dist_dir=tmp_path / "dist",
             poll_interval_seconds=5,
             backend_lost_after_seconds=15,
@@ -144,13 +167,21 @@ def test_display_agent_polls_snapshot_caches_assets_and_reads_runtime(tmp_path):
         )
     )
     service.session = FakeSession(
-        snapshot_payload=snapshot_payload,
+        snapshot_payload=_snapshot_payload(),
         etag=etag,
         background_bytes=b"background-bytes",
         logo_bytes=b"logo-bytes",
     )
+    return service
+
+
+def test_display_agent_polls_snapshot_caches_assets_and_reads_runtime(tmp_path):
+    runtime_path = tmp_path / "display-runtime.json"
+    etag = '"content-v2"'
+    service = _build_service(tmp_path, etag=etag)
 
     service.poll_once()
+    service.wait_for_asset_downloads(timeout=5)
 
     assert service.state.etag == etag
     assert service.state.snapshot["theme"]["background_asset"]["content_url"].startswith("/local/display/assets/background")
@@ -184,3 +215,280 @@ def test_display_agent_polls_snapshot_caches_assets_and_reads_runtime(tmp_path):
     assert payload["runtime"]["current_volume_ml"] == 320
     assert payload["health"]["backend_link_lost"] is False
     assert payload["health"]["controller_runtime_stale"] is False
+
+
+def test_display_agent_long_polls_and_falls_back_to_interval_polling(tmp_path):
+    etag = '"content-v2"'
+    service = _build_service(tmp_path, etag=etag)
+
+    assert service._long_poll_wait_seconds() == 10
+    assert service.poll_once(wait_seconds=10) is True
+    assert service.poll_once(wait_seconds=10) is True
+    assert service.session.snapshot_request_urls[1].endswith("/api/display/taps/7/snapshot/changes?timeout_seconds=10")
+    assert service.session.snapshot_request_headers[1]["If-None-Match"] == etag
+
+    service.session.missing_long_poll_route = True
+    assert service.poll_once(wait_seconds=10) is True
+    assert service.session.snapshot_request_urls[-1].endswith("/api/display/taps/7/snapshot")
+    assert service._long_poll_wait_seconds() == 0
+
+
+def test_display_agent_streams_sized_assets_and_rejects_checksum_mismatch(tmp_path):
+    service = _build_service(tmp_path)
+    good_bytes = b"original-background"
+    requested = []
+
+    class AssetSession:
+        def get(self, url, headers=None, timeout=10, stream=False):
+            requested.append((url, stream))
+            return FakeResponse(status_code=200, headers={"ETag": '"%s"' % hashlib.sha256(good_bytes).hexdigest()}, content=good_bytes)
+
+    service.session = AssetSession()
+    good_asset = {
+        "asset_id": "background",
+        "checksum_sha256": hashlib.sha256(good_bytes).hexdigest(),
+        "content_url": "/api/media-assets/background/content",
+    }
+    assert service._download_asset(good_asset) is True
+    assert requested[0] == ("http://backend.local/api/media-assets/background/content?width=1080", True)
+    assert service.get_asset_path("background").read_bytes() == good_bytes
+
+    tampered_asset = {**good_asset, "asset_id": "logo", "checksum_sha256": "0" * 64}
+    requested_before = len(requested)
+
+    class TamperedSession(AssetSession):
+        def get(self, url, headers=None, timeout=10, stream=False):
+            requested.append((url, stream))
+            return FakeResponse(status_code=200, headers={"ETag": '"%s"' % ("0" * 64)}, content=good_bytes)
+
+    service.session = TamperedSession()
+    assert service._download_asset(tampered_asset) is False
+    assert len(requested) == requested_before + 1
+    assert service.get_asset_path("logo") is None
+    assert sorted(path.name for path in service.assets_dir.iterdir()) == [service.state.asset_files["background"]]
+
+
+def test_display_agent_evicts_least_recently_used_assets_over_cache_limit(tmp_path):
+    service = _build_service(tmp_path)
+    service.config.asset_cache_max_bytes = 64
+    stale_old = service.assets_dir / "old-stale-w1080.png"
+    stale_recent = service.assets_dir / "recent-stale-w1080.png"
+    stale_old.write_bytes(b"x" * 40)
+    stale_recent.write_bytes(b"y" * 10)
+    os.utime(stale_old, (1_000, 1_000))
+    service.state.asset_files["retired"] = stale_recent.name
+
+    assert service.poll_once() is True
+    service.wait_for_asset_downloads(timeout=5)
+
+    assert "retired" not in service.state.asset_files
+    assert set(service.state.asset_files) == {"background", "logo"}
+    remaining = sorted(path.name for path in service.assets_dir.iterdir())
+    assert stale_old.name not in remaining
+    assert stale_recent.name in remaining
+    assert service.get_asset_path("background").read_bytes() == b"background-bytes"
+
+
+def test_display_agent_skips_disk_writes_for_unchanged_polls_and_flushes_on_stop(tmp_path):
+    service = _build_service(tmp_path)
+
+    assert service.poll_once() is True
+    service.wait_for_asset_downloads(timeout=5)
+    first_write = service.get_write_stats()["bytes_written_current_hour"]
+    assert first_write > 0
+    snapshot_mtime = service.snapshot_cache_path.stat().st_mtime_ns
+    state_mtime = service.state_cache_path.stat().st_mtime_ns
+
+    for _ in range(3):
+        assert service.poll_once() is True
+    service.session.get = lambda *args, **kwargs: (_ for _ in ()).throw(DummyRequestException("offline"))
+    assert service.poll_once() is False
+
+    assert service.get_write_stats()["bytes_written_current_hour"] == first_write
+    assert service.snapshot_cache_path.stat().st_mtime_ns == snapshot_mtime
+    assert service.state_cache_path.stat().st_mtime_ns == state_mtime
+
+    service.stop()
+
+    persisted = json.loads(service.state_cache_path.read_text(encoding="utf-8"))
+    assert persisted["consecutive_failures"] == 1
+    assert persisted["last_poll_at"] == service.state.last_poll_at
+    assert service.get_write_stats()["bytes_written_current_hour"] > first_write
+
+
+def _write_runtime_record(path, *, seq, payload_version, updated_at, payload):
+    runtime_channel = sys.modules["runtime_channel"]
+    encoded = json.dumps(payload).encode("utf-8")
+    record = bytearray(runtime_channel.RECORD_SIZE)
+    runtime_channel.HEADER.pack_into(
+        record, 0, runtime_channel.MAGIC, runtime_channel.LAYOUT_VERSION, 0, seq, payload_version, updated_at, len(encoded)
+    )
+    record[runtime_channel.HEADER.size:runtime_channel.HEADER.size + len(encoded)] = encoded
+    path.write_bytes(bytes(record))
+
+
+def test_display_agent_reads_runtime_from_shared_memory_and_falls_back_to_json_file(tmp_path):
+    service = _build_service(tmp_path)
+    shm_path = tmp_path / "display-runtime.shm"
+    service._runtime_channel = service_module.RuntimeChannelReader(shm_path)
+    service.config.runtime_path.write_text(json.dumps({"phase": "idle", "card_present": False}), encoding="utf-8")
+
+    assert service.read_runtime_payload()["runtime"]["phase"] == "idle"
+
+    now = datetime.now(timezone.utc).timestamp()
+    _write_runtime_record(
+        shm_path, seq=2, payload_version=1, updated_at=now, payload={"phase": "pouring", "current_volume_ml": 240}
+    )
+    payload = service.read_runtime_payload()
+    assert payload["runtime"]["phase"] == "pouring"
+    assert payload["runtime"]["current_volume_ml"] == 240
+    assert payload["health"]["controller_runtime_stale"] is False
+
+    # Only updated_at moved: the cached parse is reused, the timestamp is taken from the header.
+    _write_runtime_record(shm_path, seq=4, payload_version=1, updated_at=now - 60, payload={"phase": "ignored"})
+    payload = service.read_runtime_payload()
+    assert payload["runtime"]["phase"] == "pouring"
+    assert payload["health"]["controller_runtime_stale"] is True
+
+    # A write in progress (odd seq) is never returned half-done.
+    _write_runtime_record(shm_path, seq=5, payload_version=2, updated_at=now, payload={"phase": "finished"})
+    assert service.read_runtime_payload()["runtime"]["phase"] == "idle"
+
+
+def test_display_agent_retries_torn_shared_memory_payload_instead_of_file_fallback(tmp_path, monkeypatch):
+    runtime_channel = sys.modules["runtime_channel"]
+    service = _build_service(tmp_path)
+    shm_path = tmp_path / "display-runtime.shm"
+    service._runtime_channel = service_module.RuntimeChannelReader(shm_path)
+    service.config.runtime_path.write_text(json.dumps({"phase": "idle"}), encoding="utf-8")
+    now = datetime.now(timezone.utc).timestamp()
+    _write_runtime_record(shm_path, seq=2, payload_version=1, updated_at=now, payload={"phase": "pouring"})
+
+    real_loads = runtime_channel.json.loads
+    attempts = []
+
+    def torn_once(raw):
+        attempts.append(raw)
+        if len(attempts) == 1:
+            raise ValueError("truncated payload")
+        return real_loads(raw)
+
+    monkeypatch.setattr(runtime_channel.json, "loads", torn_once)
+
+    assert service.read_runtime_payload()["runtime"]["phase"] == "pouring"
+    assert len(attempts) == 2
+
+
+def test_display_agent_memoizes_bootstrap_bytes_per_state(tmp_path):
+    service = _build_service(tmp_path)
+    service.poll_once()
+    service.wait_for_asset_downloads(timeout=5)
+
+    etag, body = service.get_bootstrap_document()
+    assert json.loads(body) == service.get_bootstrap_payload()
+    again_etag, again_body = service.get_bootstrap_document()
+    assert again_etag == etag
+    assert again_body is body
+
+    # The kiosk revalidates every few seconds; a poll that finds no change must keep answering 304.
+    polled_at = service.state.last_poll_at
+    assert service.poll_once() is True
+    assert service.state.last_poll_at != polled_at
+    after_poll_etag, after_poll_body = service.get_bootstrap_document()
+    assert after_poll_etag == etag
+    assert after_poll_body is body
+
+    service.session.snapshot_payload = {**_snapshot_payload(), "content_version": "content-v3"}
+    service.session.etag = '"content-v3"'
+    service.poll_once()
+    service.wait_for_asset_downloads(timeout=5)
+
+    next_etag, next_body = service.get_bootstrap_document()
+    assert next_etag != etag
+    assert json.loads(next_body)["snapshot"]["content_version"] == "content-v3"
+
+
+def test_display_agent_applies_snapshot_before_assets_and_retries_failed_downloads(tmp_path):
+    service = _build_service(tmp_path)
+    session = service.session
+    original_get = session.get
+    failing = {"logo": True}
+
+    def flaky_get(url, headers=None, timeout=10, stream=False):
+        if urlsplit(url).path.endswith("/logo/content") and failing["logo"]:
+            return FakeResponse(status_code=503)
+        return original_get(url, headers=headers, timeout=timeout, stream=stream)
+
+    session.get = flaky_get
+
+    assert service.poll_once() is True
+    assert service.state.snapshot["presentation"]["name"] == "Smoke Lager"
+    service.wait_for_asset_downloads(timeout=5)
+
+    assert service.state.snapshot["theme"]["background_asset"]["content_url"].startswith("/local/display/assets/background")
+    assert service.state.snapshot["theme"]["logo_asset"] is None
+    retry = service.state.asset_retry_queue["logo"]
+    assert retry["attempts"] == 1
+    assert "asset_retry_queue" in json.loads(service.state_cache_path.read_text(encoding="utf-8"))
+
+    service._retry_due_assets()
+    service.wait_for_asset_downloads(timeout=5)
+    assert service.state.asset_retry_queue["logo"]["attempts"] == 1
+
+    failing["logo"] = False
+    service.state.asset_retry_queue["logo"]["next_attempt_at"] = datetime.now(timezone.utc).isoformat()
+    service._retry_due_assets()
+    service.wait_for_asset_downloads(timeout=5)
+
+    assert "logo" not in service.state.asset_retry_queue
+    assert service.state.snapshot["theme"]["logo_asset"]["content_url"].startswith("/local/display/assets/logo")
+
+    next_keg_id = "6f1c2f0e-8d4b-4c11-9a57-2f7d3c9e1b20"
+    session.media_assets[f"/api/media-assets/{next_keg_id}/content"] = b"next-keg-bytes"
+    prefetched = {
+        "asset_id": next_keg_id,
+        "checksum_sha256": hashlib.sha256(b"next-keg-bytes").hexdigest(),
+    }
+    assert service.prefetch_assets([prefetched]) == [next_keg_id]
+    service.wait_for_asset_downloads(timeout=5)
+    service._prune_asset_cache()
+    assert service.get_asset_path(next_keg_id).read_bytes() == b"next-keg-bytes"
+
+
+def test_display_agent_prefetch_rejects_traversal_and_foreign_urls(tmp_path):
+    service = _build_service(tmp_path)
+    session = service.session
+    checksum = hashlib.sha256(b"payload").hexdigest()
+    asset_id = "6f1c2f0e-8d4b-4c11-9a57-2f7d3c9e1b20"
+
+    rejected = [
+        {"asset_id": "../../escaped", "checksum_sha256": checksum},
+        {"asset_id": asset_id, "checksum_sha256": "../../x"},
+        {"asset_id": asset_id, "checksum_sha256": checksum, "content_url": "http://evil.example/a.sh"},
+        {"asset_id": asset_id, "checksum_sha256": checksum, "content_url": "/api/display/taps/7/snapshot"},
+    ]
+    for asset in rejected:
+        with pytest.raises(ValueError):
+            service.prefetch_assets([asset])
+
+    service.wait_for_asset_downloads(timeout=5)
+    assert session.requests == []
+    assert not service._prefetch_asset_ids
+    assert not any(tmp_path.rglob("*escaped*"))
+
+    # Assets named by the backend snapshot get the same confinement, and the token stays with the backend.
+    assert service._download_asset({
+        "asset_id": "../../escaped",
+        "checksum_sha256": "x",
+        "content_url": "/api/media-assets/background/content",
+    }) is False
+    session.media_assets["/cdn/logo.png"] = b"cdn-bytes"
+    assert service._download_asset({
+        "asset_id": "cdn-logo",
+        "checksum_sha256": "cdn-sha",
+        "content_url": "http://cdn.example/cdn/logo.png",
+    }) is True
+    [(cdn_url, cdn_headers)] = session.requests
+    assert urlsplit(cdn_url).netloc == "cdn.example"
+    assert cdn_headers == {}
+    assert not any(tmp_path.rglob("*escaped*"))
@@ -1,9 +1,45 @@
+import { readdir, readFile, writeFile } from "node:fs/promises";
+import { join } from "node:path";
+import { brotliCompressSync, constants as zlibConstants, gzipSync } from "node:zlib";
 import { defineConfig } from "vite";
 import { svelte } from "@sveltejs/vite-plugin-svelte";
 
+const COMPRESSIBLE = /\.(html|js|css|svg|json)$/;
+
+async function* walk(dir) {
+  for (const entry of await readdir(dir, { withFileTypes: true })) {
+    const path = join(dir, entry.name);
+    if (entry.isDirectory()) yield* walk(path);
+    else yield path;
+  }
+}
+
+// tap-display-agent serves these .br/.gz siblings directly, so the kiosk never waits on runtime compression.
+function precompress() {
+  let outDir;
+  return {
+    name: "precompress",
+    apply: "build",
+    configResolved(config) {
+      outDir = config.build.outDir;
+    },
+    async closeBundle() {
+      for await (const path of walk(outDir)) {
+        if (!COMPRESSIBLE.test(path)) continue;
+        const source = await readFile(path);
+        await writeFile(`${path}.gz`, gzipSync(source, { level: 9 }));
+        await writeFile(
+          `${path}.br`,
+          brotliCompressSync(source, { params: { [zlibConstants.BROTLI_PARAM_QUALITY]: 11 } }),
+        );
+      }
+    },
+  };
+}
+
 export default defineConfig({
   base: "/display/",
-  plugins: [svelte()],
+  plugins: [svelte(), precompress()],
   build: {
     outDir: "dist",
   },